@@ -0,0 +1,34 @@
+prompt = ""
+prompt += """
+Please provide an extremely detailed and specific description of the garment, covering the following categories. For each category, ensure the description is concise (1-2 words or short phrases) and avoid generating full sentences or explanations. Exclude the category names and provide only the values in the specified order, separated by commas.
+
+### Categories to Include (in the given order):
+1. Garment Type: Specify the specific garment type (e.g., bomber jacket, halter dress, hoodie, puffer coat).
+2. Gender: The intended gender for the garment (e.g., man, woman, unisex).
+3. Colour: Specify the dominant colour with its finish or pattern (e.g., "solid black", "navy with white polka dots", "light wash blue").
+4. Fit: Indicate the fit of the garment (e.g., "relaxed fit", "regular fit", "fitted").
+5. Fabric/Material: Specify the primary fabric or material used (e.g., "100% wool", "denim", "silk blend").
+6. Texture: Describe the texture of the fabric (e.g., "smooth", "ribbed", "soft").
+7. Closure Type: Indicate the closure mechanism (e.g., "zippered", "button-down", "drawstring").
+8. Neckline/Collar: Specify the neckline or collar type (e.g., "V-neck", "high collar", "notched collar").
+9. Sleeve Type: Specify the type of sleeves (e.g., "long sleeves", "short sleeves", "puffed sleeves").
+10. Pockets: Indicate the number and type of pockets, if any (e.g., "two side pockets", "no pockets").
+11. Additional Design Features: Highlight any distinctive details (e.g., "ruffled hem", "embroidered logo", "belt loops").
+12. Length: Specify the length of the garment (e.g., "waist-length", "knee-length").
+13. Lining: Indicate if the garment has lining and describe it briefly (e.g., "fully lined", "no lining").
+14. Branding or Logos: Mention visible branding or logos, if applicable (e.g., "small 'Adidas' logo on chest").
+15. Occasion/Use: Specify the occasion or use for which the garment is intended (e.g., "casual wear", "formal wear", "activewear").
+
+### Output Format:
+Provide the description as a single comma-separated list of values. Do not include category names, explanations, or additional commentary. 
+
+### Example Output:
+For a bomber jacket:  
+Bomber jacket, Man, Solid black, Relaxed fit, 100% nylon, Smooth, Zippered, Ribbed collar, Long sleeves, Two zippered pockets, Ribbed cuffs and embroidered logo, Waist-length, Fully lined, Small 'Nike' logo, Casual wear
+
+### Guidelines:
+1. Focus only on features that are visually identifiable from the garment in the image. Exclude unnecessary details or assumptions.  
+2. Avoid including any references to people, backgrounds, or irrelevant details outside the garment itself.  
+3. Ensure the description is accurate and concise, strictly following the order provided.  
+4. Do not generate category names or additional commentary in the output.
+"""
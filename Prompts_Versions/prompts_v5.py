@@ -0,0 +1,34 @@
+prompt = ""
+prompt += """
+Describe the garment in the image for an online product search. Fill in every field of the JSON schema with a short value of 1-4 words taken only from what is visible on the garment itself, ignoring people and background. Put the most specific garment type (e.g. "Bomber jacket", "Halter dress") in "type" and the dominant colour with its finish or pattern (e.g. "Solid black", "Navy with white polka dots") in "colour". Use an empty string for a field that cannot be seen. Do not add any other text.
+"""
+
+# Output keys, in the order of the comma-separated description.
+fields = (
+    "type",
+    "gender",
+    "colour",
+    "fit",
+    "material",
+    "texture",
+    "closure",
+    "neckline",
+    "sleeves",
+    "pockets",
+    "details",
+    "length",
+)
+
+schema = {
+    "name": "garment_description",
+    "strict": True,
+    "schema": {
+        "type": "object",
+        "properties": {
+            **{field: {"type": "string"} for field in fields},
+            "gender": {"type": "string", "enum": ["Man", "Woman", "Unisex"]},
+        },
+        "required": list(fields),
+        "additionalProperties": False,
+    },
+}
@@ -1,21 +1,86 @@
-from fastapi import FastAPI, File, Form, UploadFile, HTTPException, Request
-from fastapi.responses import JSONResponse, HTMLResponse
+from fastapi import (
+    Depends,
+    FastAPI,
+    File,
+    Form,
+    Header,
+    UploadFile,
+    HTTPException,
+    Query,
+    Request,
+)
+from fastapi.responses import (
+    FileResponse,
+    Response,
+    HTMLResponse,
+    JSONResponse,
+    PlainTextResponse,
+)
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 from pathlib import Path
 from services.image_description import ImageDescriptionGenerator
-from services.clip_embeddings import DINOEmbeddingsGenerator
+from services.prompts import DEFAULT_PROMPT_VERSION, get_prompt
+from services.batch_search import BatchQuery, BatchSearch
+from services.caches import EmbeddingCache, SearchCache
+from services.clip_embeddings import INFERENCE_QUEUE_DEPTH, DINOEmbeddingsGenerator
 from services.image_comparator import ImageComparator
+from services.quality_tiers import QualityController, QualityTier, default_tiers
+from services.prewarm import PrewarmCrawler, QueryLog, build_scrapers, read_queries
+from services.dedupe import ProductDeduplicator
+from services.ranking_cascade import CascadeRanker
+from services.retailer_health import RetailerHealth, SourceUnavailableError
+from services.result_store import ResultSet, ResultStore
+from services.speculative_search import SpeculativeSearch
+from services.text_prefilter import TextPrefilter, combine_scores, parse_description
+from services.thumbnails import (
+    CACHE_CONTROL,
+    THUMBNAIL_REQUESTS,
+    ThumbnailService,
+    etag_matches,
+)
 from scrapper.google_scrapper import GoogleShoppingScraper
 from scrapper.amazon_scrapper import AsyncAmazonScraper
+from scrapper.http_scrapper import HTTPScraper
+from scrapper.errors import EmptyListingError
+from utils.download_cache import DownloadCache
+from utils.result_log import ResultLog
 from utils.file_handling import FileHandler
-from utils.api_responses import APIResponse
+from utils.image_ingest import UploadTooLargeError, ingest_upload
+from utils.api_responses import APIResponse, ResponseEncoder
+from utils.metrics import (
+    HTTP_IN_FLIGHT,
+    HTTP_REQUEST_DURATION,
+    HTTP_REQUESTS,
+    PROMETHEUS_CONTENT_TYPE,
+    REGISTRY,
+    begin_request_timing,
+    end_request_timing,
+    format_server_timing,
+    track_stage,
+)
+from utils.logging_config import configure_logging, new_request_id
+from utils.profiling import (
+    RequestProfiler,
+    list_profiles,
+    prune_profiles,
+    resolve_profile_file,
+)
+import functools
 import logging
 import os
+import secrets
+import time
+from typing import List, Optional
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
+# Log records are queued and written by a background thread, as JSON lines
+# unless LOG_FORMAT=text; per-item DEBUG events are sampled.
+configure_logging(
+    level=os.getenv("LOG_LEVEL", "INFO"),
+    json_format=os.getenv("LOG_FORMAT", "json").lower() != "text",
+    debug_sample_every=int(os.getenv("LOG_DEBUG_SAMPLE_EVERY", "10")),
+)
 logger = logging.getLogger(__name__)
 
 # Initialize FastAPI app
@@ -32,22 +97,416 @@ app.add_middleware(
 # Setup directories
 UPLOAD_DIR = Path("uploads")
 FETCHED_IMAGES_DIR = Path("fetched_images")
-IMAGE_DIR = Path("images")
 UPLOAD_DIR.mkdir(exist_ok=True)
 FETCHED_IMAGES_DIR.mkdir(exist_ok=True)
-IMAGE_DIR.mkdir(exist_ok=True)
+# Largest accepted upload. Requests whose Content-Length cannot fit within it
+# are answered with 413 before the multipart body is parsed.
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_MB", "10")) * 1024 * 1024
+# Allowance for the form fields and multipart boundaries around the files.
+FORM_OVERHEAD_BYTES = 64 * 1024
+
+# Per-request profiling is opt-in; without ENABLE_PROFILING no hook is installed.
+PROFILING_ENABLED = os.getenv("ENABLE_PROFILING", "").lower() in ("1", "true", "yes")
+PROFILES_DIR = Path(os.getenv("PROFILES_DIR", "profiles"))
+PROFILES_KEEP = int(os.getenv("PROFILES_KEEP", "20"))
 
 # Initialize services
-logger.info(f"OPENAI_KEY: {os.getenv('OPENAI_KEY')}")
-description_generator = ImageDescriptionGenerator(api_key=os.getenv("OPENAI_KEY"))
-dino_generator = DINOEmbeddingsGenerator()
+# Registered description prompt (services.prompts); a request may pick another
+# with the prompt_version form field.
+description_generator = ImageDescriptionGenerator(
+    api_key=os.getenv("OPENAI_KEY"),
+    base_url=os.getenv("OPENAI_BASE_URL"),
+    prompt_version=os.getenv("DESCRIPTION_PROMPT_VERSION", DEFAULT_PROMPT_VERSION),
+)
+INFERENCE_WORKERS = int(os.getenv("INFERENCE_WORKERS", "1"))
+EMBEDDING_MAX_BATCH = int(os.getenv("EMBEDDING_MAX_BATCH", "16"))
+# Reduced-scale JPEG decoding; set DRAFT_DECODE=0 for exact processor parity.
+DRAFT_DECODE = os.getenv("DRAFT_DECODE", "1").lower() in ("1", "true", "yes")
+dino_generator = DINOEmbeddingsGenerator(
+    max_workers=INFERENCE_WORKERS,
+    max_batch_size=EMBEDDING_MAX_BATCH,
+    draft_decode=DRAFT_DECODE,
+)
 comparator = ImageComparator()
-scraper = GoogleShoppingScraper(save_dir=str(FETCHED_IMAGES_DIR))
-amazon_scrapper = AsyncAmazonScraper(save_dir=str(FETCHED_IMAGES_DIR))
+# Scraped products per query and image embeddings, shared with the
+# pre-warming crawler (in-process or `python -m services.prewarm`).
+CACHE_DIR = Path(os.getenv("CACHE_DIR", "cache"))
+search_cache = SearchCache(
+    CACHE_DIR, ttl_seconds=float(os.getenv("SEARCH_CACHE_TTL_SECONDS", "21600"))
+)
+embedding_cache = EmbeddingCache(
+    CACHE_DIR, max_entries=int(os.getenv("EMBEDDING_CACHE_ENTRIES", "4096"))
+)
+query_log = QueryLog(CACHE_DIR / "queries.jsonl")
+# Candidates kept by the cheap prefilter for DINOv2 ranking; 0 embeds all.
+# Candidates scoring below CASCADE_MIN_SCORE are dropped as clear mismatches.
+cascade = CascadeRanker(
+    dino_generator,
+    comparator,
+    shortlist_size=int(os.getenv("CASCADE_SHORTLIST", "24")),
+    embedding_cache=embedding_cache,
+    min_score=float(os.getenv("CASCADE_MIN_SCORE", "0.35")),
+)
+# Under load, searches drop to fewer candidates and then to a smaller DINOv2
+# loaded alongside the base model; QUALITY_SMALL_MODEL= skips loading it.
+QUALITY_SMALL_MODEL = os.getenv("QUALITY_SMALL_MODEL", "facebook/dinov2-small")
+cascades = {"base": cascade}
+if QUALITY_SMALL_MODEL:
+    cascades["small"] = CascadeRanker(
+        DINOEmbeddingsGenerator(
+            max_workers=INFERENCE_WORKERS,
+            max_batch_size=EMBEDDING_MAX_BATCH,
+            draft_decode=DRAFT_DECODE,
+            model_name=QUALITY_SMALL_MODEL,
+        ),
+        comparator,
+        shortlist_size=cascade.shortlist_size,
+        embedding_cache=embedding_cache,
+        min_score=cascade.min_score,
+    )
+quality = QualityController(
+    default_tiers(bool(QUALITY_SMALL_MODEL), cascade.shortlist_size),
+    queue_depth=INFERENCE_QUEUE_DEPTH.value,
+    degrade_queue=float(os.getenv("QUALITY_DEGRADE_QUEUE", "4")),
+    recover_queue=float(os.getenv("QUALITY_RECOVER_QUEUE", "1")),
+    degrade_latency=float(os.getenv("QUALITY_DEGRADE_LATENCY", "25")),
+    recover_latency=float(os.getenv("QUALITY_RECOVER_LATENCY", "12")),
+    min_dwell_seconds=float(os.getenv("QUALITY_MIN_DWELL_SECONDS", "30")),
+)
+if os.getenv("QUALITY_TIER"):
+    quality.set_override(os.getenv("QUALITY_TIER"))
+# Images within this many dHash bits are treated as one product; -1 disables.
+deduplicator = ProductDeduplicator(
+    max_distance=int(os.getenv("DEDUPE_MAX_DISTANCE", "4"))
+)
+# Skip downloading products whose titles do not match the description.
+text_prefilter = TextPrefilter(
+    min_score=float(os.getenv("TEXT_PREFILTER_MIN_SCORE", "0.3")),
+    min_keep=int(os.getenv("TEXT_PREFILTER_MIN_KEEP", "8")),
+)
+# Weight of the title score in the final ranking; 0 ranks on DINOv2 alone.
+TEXT_SCORE_WEIGHT = float(os.getenv("TEXT_SCORE_WEIGHT", "0.2"))
+# Ranked results, with vectors, kept for paging and "more like this".
+result_store = ResultStore(
+    ttl_seconds=float(os.getenv("RESULTS_TTL_SECONDS", "900")),
+    max_sets=int(os.getenv("RESULTS_MAX_SETS", "256")),
+)
+RESULTS_PAGE_SIZE = int(os.getenv("RESULTS_PAGE_SIZE", "20"))
+# Results link to small thumbnails served from here instead of retailer CDNs.
+thumbnails = ThumbnailService(
+    Path(os.getenv("THUMBNAIL_DIR", "thumbnails")),
+    size=int(os.getenv("THUMBNAIL_SIZE", "320")),
+    quality=int(os.getenv("THUMBNAIL_QUALITY", "80")),
+    extension=os.getenv("THUMBNAIL_FORMAT", "webp").lower(),
+    max_workers=int(os.getenv("THUMBNAIL_WORKERS", "2")),
+    max_bytes=int(os.getenv("THUMBNAIL_MAX_MB", "256")) * 1024 * 1024,
+)
+# Stream the description and start searching once garment type, gender and
+# colour are known; early results with fewer products trigger a full search.
+STREAM_DESCRIPTION = os.getenv("STREAM_DESCRIPTION", "1").lower() in (
+    "1",
+    "true",
+    "yes",
+)
+SPECULATIVE_MIN_RESULTS = int(os.getenv("SPECULATIVE_MIN_RESULTS", "10"))
+# Product images are kept by URL and revalidated with conditional GETs, shared
+# by every scraper (and the pre-warming crawler).
+download_cache = DownloadCache(
+    CACHE_DIR / "downloads",
+    max_bytes=int(float(os.getenv("DOWNLOAD_CACHE_MB", "512")) * 1024 * 1024),
+    fresh_seconds=float(os.getenv("DOWNLOAD_FRESH_SECONDS", "3600")),
+)
+# Scraped products are appended to compressed JSONL segments by a background
+# writer, for analytics and cache warm-up (see utils.result_log.read_results).
+result_log = ResultLog(
+    Path(os.getenv("RESULT_LOG_DIR", str(CACHE_DIR / "results"))),
+    max_queue=int(os.getenv("RESULT_LOG_QUEUE", "1024")),
+    segment_bytes=int(float(os.getenv("RESULT_LOG_SEGMENT_MB", "16")) * 1024 * 1024),
+    max_segments=int(os.getenv("RESULT_LOG_MAX_SEGMENTS", "64")),
+    fsync_interval=float(os.getenv("RESULT_LOG_FSYNC_SECONDS", "1")),
+)
+scraper = GoogleShoppingScraper(
+    save_dir=str(FETCHED_IMAGES_DIR),
+    base_url=os.getenv("GOOGLE_BASE_URL", "https://www.google.com/"),
+    download_cache=download_cache,
+    result_log=result_log,
+)
+amazon_scrapper = AsyncAmazonScraper(
+    save_dir=str(FETCHED_IMAGES_DIR),
+    base_url=os.getenv("AMAZON_BASE_URL", "https://www.amazon.in/"),
+    download_cache=download_cache,
+    result_log=result_log,
+)
+# "http" fetches result pages without a browser and falls back to Selenium
+# only for pages that need JavaScript; "selenium" always drives Chromium.
+SCRAPER_BACKEND = os.getenv("SCRAPER_BACKEND", "http").lower()
+http_scraper = HTTPScraper(
+    save_dir=str(FETCHED_IMAGES_DIR),
+    base_urls={"google": scraper.base_url, "amazon": amazon_scrapper.base_url},
+    fallbacks={"google": scraper, "amazon": amazon_scrapper},
+    download_cache=download_cache,
+    result_log=result_log,
+)
+# A retailer that keeps failing is skipped until a probe succeeds, and its
+# concurrency limit follows how quickly it answers.
+retailer_health = RetailerHealth(
+    ("google", "amazon"),
+    failure_threshold=int(os.getenv("RETAILER_FAILURE_THRESHOLD", "3")),
+    reset_seconds=float(os.getenv("RETAILER_RESET_SECONDS", "30")),
+    max_concurrency=int(os.getenv("RETAILER_MAX_CONCURRENCY", "4")),
+    latency_target=float(os.getenv("RETAILER_LATENCY_TARGET", "15")),
+)
+
+
+async def scrape_retailer(
+    retailer: str,
+    search_term: str,
+    max_results: int,
+    product_filter=None,
+    image_dir: Path = None,
+):
+    """
+    Search a retailer with the configured scraping backend, through its circuit breaker.
+    """
+    if SCRAPER_BACKEND == "http":
+        return await retailer_health.call(
+            retailer,
+            http_scraper.scrape_and_save,
+            search_term,
+            max_results=max_results,
+            retailer=retailer,
+            product_filter=product_filter,
+            save_dir=image_dir,
+        )
+    selenium_scraper = scraper if retailer == "google" else amazon_scrapper
+    return await retailer_health.call(
+        retailer,
+        selenium_scraper.scrape_and_save,
+        search_term,
+        max_results=max_results,
+        product_filter=product_filter,
+        save_dir=image_dir,
+    )
+
+
+async def search_retailers(
+    search_term: str,
+    attributes: dict,
+    tier: QualityTier = None,
+    image_dir: Path = None,
+) -> list:
+    """
+    Scrape Google Shopping and Amazon, skipping titles that do not match the attributes.
+
+    Product images are saved to ``image_dir``, the request's own directory.
+    """
+    tier = tier or quality.tiers[0]
+
+    def title_filter(products):
+        return text_prefilter.filter(products, attributes)
+
+    query_log.record(search_term)
+    cached = search_cache.get(search_term)
+    if cached is not None:
+        with track_stage("search_cache"):
+            return title_filter(cached)
+
+    # Scrape Google Shopping and Amazon; a failing retailer is left out
+    # unless both fail
+    results, errors = [], []
+    for retailer, max_results in (
+        ("google", tier.google_results),
+        ("amazon", tier.amazon_results),
+    ):
+        try:
+            with track_stage(f"scrape_{retailer}"):
+                results.extend(
+                    await scrape_retailer(
+                        retailer,
+                        search_term,
+                        max_results=max_results,
+                        product_filter=title_filter,
+                        image_dir=image_dir,
+                    )
+                )
+        except Exception as e:
+            logger.error("Error scraping %s: %s", retailer, e)
+            errors.append(e)
+
+    if len(errors) == 2:
+        if all(isinstance(e, EmptyListingError) for e in errors):
+            # Counted against both retailers' health, but not a server error.
+            return results
+        unavailable = all(isinstance(e, SourceUnavailableError) for e in errors)
+        raise HTTPException(
+            status_code=503 if unavailable else 500,
+            detail="There was an issue during search. Please try again.",
+        )
+    return results
+
+
+# Multi-garment requests share descriptions, searches and embedding batches.
+BATCH_MAX_IMAGES = int(os.getenv("BATCH_MAX_IMAGES", "8"))
+batch_search = BatchSearch(
+    description_generator,
+    comparator,
+    cascade,
+    deduplicator,
+    search_retailers,
+    search_concurrency=int(os.getenv("BATCH_SEARCH_CONCURRENCY", "2")),
+)
+
+
+# Crawl popular queries while the service is idle; off by default because it
+# drives its own Selenium browsers, which are only created when enabled.
+PREWARM_ENABLED = os.getenv("PREWARM_ENABLED", "").lower() in ("1", "true", "yes")
+prewarm_crawler = None
+if PREWARM_ENABLED:
+    prewarm_crawler = PrewarmCrawler(
+        build_scrapers(
+            CACHE_DIR, scraper.base_url, amazon_scrapper.base_url, download_cache
+        ),
+        dino_generator,
+        search_cache,
+        embedding_cache,
+        queries=read_queries(os.getenv("PREWARM_QUERIES_FILE")),
+        query_log=query_log,
+        mined_queries=int(os.getenv("PREWARM_MINED_QUERIES", "10")),
+        is_busy=lambda: HTTP_IN_FLIGHT.value() > 0,
+        max_load=float(os.getenv("PREWARM_MAX_LOAD", "0.5")),
+        concurrency=int(os.getenv("PREWARM_CONCURRENCY", "1")),
+        interval_seconds=float(os.getenv("PREWARM_INTERVAL", "300")),
+    )
+
 
 # Setup templates
 templates = Jinja2Templates(directory="templates")
 
+# Result responses are encoded with orjson, with rounded scores, an optional
+# ?fields= subset and gzip/brotli above a size threshold. An empty
+# RESPONSE_SCORE_DECIMALS keeps full precision.
+SCORE_DECIMALS = os.getenv("RESPONSE_SCORE_DECIMALS", "4")
+response_encoder = ResponseEncoder(
+    score_decimals=int(SCORE_DECIMALS) if SCORE_DECIMALS else None,
+    min_compress_bytes=int(os.getenv("RESPONSE_COMPRESS_MIN_BYTES", "1024")),
+)
+
+
+def upload_body_limit(path: str) -> Optional[int]:
+    """
+    Return the largest request body accepted by an upload route, or None.
+    """
+    if path == "/process/":
+        return MAX_UPLOAD_BYTES + FORM_OVERHEAD_BYTES
+    if path == "/process/batch/":
+        return BATCH_MAX_IMAGES * MAX_UPLOAD_BYTES + FORM_OVERHEAD_BYTES
+    return None
+
+
+@app.middleware("http")
+async def upload_limit_middleware(request: Request, call_next):
+    """
+    Reject oversized uploads from their Content-Length before the body is read.
+    """
+    limit = upload_body_limit(request.url.path)
+    content_length = request.headers.get("content-length")
+    if limit is not None and content_length and content_length.isdigit():
+        if int(content_length) > limit:
+            limit_mb = MAX_UPLOAD_BYTES / (1024 * 1024)
+            return JSONResponse(
+                status_code=413,
+                content={"detail": f"Upload exceeds the {limit_mb:g} MB limit."},
+            )
+    return await call_next(request)
+
+
+@app.middleware("http")
+async def timing_middleware(request: Request, call_next):
+    """
+    Record request latency and attach per-stage timings as a Server-Timing header.
+    """
+    token = begin_request_timing()
+    HTTP_IN_FLIGHT.inc()
+    start = time.perf_counter()
+    status = "500"
+    try:
+        response = await call_next(request)
+        status = str(response.status_code)
+    finally:
+        total = time.perf_counter() - start
+        HTTP_IN_FLIGHT.dec()
+        timings = end_request_timing(token)
+        route = getattr(request.scope.get("route"), "path", "unmatched")
+        HTTP_REQUESTS.inc(route=route, status=status)
+        HTTP_REQUEST_DURATION.observe(total, route=route)
+        if route == "/process/":
+            quality.observe_latency(total)
+
+    response.headers["Server-Timing"] = format_server_timing(timings, total)
+    return response
+
+
+if PROFILING_ENABLED:
+
+    @app.middleware("http")
+    async def profiling_middleware(request: Request, call_next):
+        """
+        Profile a /process/ request when asked to via the X-Debug-Profile
+        header or the ?profile=1 query flag.
+        """
+        requested = request.headers.get("x-debug-profile") or request.query_params.get(
+            "profile"
+        )
+        if request.url.path != "/process/" or not requested:
+            return await call_next(request)
+        if not RequestProfiler.try_acquire():
+            response = await call_next(request)
+            response.headers["X-Profile-Status"] = "busy"
+            return response
+
+        profiler = RequestProfiler(PROFILES_DIR)
+        profiler.start()
+        try:
+            response = await call_next(request)
+        finally:
+            summary = profiler.stop(request.url.path)
+            prune_profiles(PROFILES_DIR, PROFILES_KEEP)
+        response.headers["X-Profile-Id"] = summary["profile_id"]
+        return response
+
+
+@app.middleware("http")
+async def request_id_middleware(request: Request, call_next):
+    """
+    Tag every log record of a request with its id (X-Request-ID, or a new one).
+    """
+    request_id = new_request_id(request.headers.get("x-request-id"))
+    response = await call_next(request)
+    response.headers["X-Request-ID"] = request_id
+    return response
+
+
+def check_prompt_version(prompt_version: str) -> None:
+    """
+    Reject a request naming an unregistered description prompt version.
+    """
+    if prompt_version:
+        try:
+            get_prompt(prompt_version)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+
+def require_admin(x_admin_token: str = Header(None)) -> None:
+    """
+    Guard admin endpoints with the ADMIN_TOKEN environment variable.
+    """
+    expected = os.getenv("ADMIN_TOKEN")
+    if not expected or not x_admin_token:
+        raise HTTPException(status_code=403, detail="Admin access denied.")
+    if not secrets.compare_digest(x_admin_token, expected):
+        raise HTTPException(status_code=403, detail="Admin access denied.")
+
 
 @app.get("/", response_class=HTMLResponse)
 async def root(request: Request):
@@ -59,89 +518,411 @@ async def root(request: Request):
 
 @app.post("/process/")
 async def process_image(
+    request: Request,
     file: UploadFile = File(...),
     garment_type: str = Form(...),
     garment_layer: str = Form(None),
-) -> JSONResponse:
+    prompt_version: str = Form(None),
+) -> Response:
     """
     Process the uploaded image by generating a description and retrieving similar items.
     """
+    check_prompt_version(prompt_version)
+    # Uploads and product images of this request only; removed when it ends
+    directory_name = FileHandler.new_request_directory_name()
+    upload_dir = FileHandler.create_request_directory(UPLOAD_DIR, directory_name)
+    image_dir = FileHandler.create_request_directory(FETCHED_IMAGES_DIR, directory_name)
     try:
-        # Clean directories before processing
-        FileHandler.clean_directory(UPLOAD_DIR)
-        FileHandler.clean_directory(FETCHED_IMAGES_DIR)
-        FileHandler.clean_directory(IMAGE_DIR)
+        # Pick candidate counts and model from the current load
+        tier = quality.select()
+        tier_cascade = cascades[tier.model]
+        embeddings_generator = tier_cascade.embeddings_generator
 
-        # Save the uploaded file
-        file_path = await FileHandler.save_uploaded_file(file, UPLOAD_DIR)
+        # Stream, decode and normalize the upload once for both model paths
+        try:
+            with track_stage("upload"):
+                upload = await ingest_upload(
+                    file,
+                    upload_dir,
+                    max_bytes=MAX_UPLOAD_BYTES,
+                    preprocessor=embeddings_generator.preprocessor,
+                )
+        except UploadTooLargeError as e:
+            raise HTTPException(status_code=413, detail=str(e))
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        file_path = upload.file_path
 
-        # Generate description using GPT-4 Vision
-        description = await description_generator.generate_description(
-            file_path=file_path, garment_type=garment_type, garment_layer=garment_layer
+        # Generate description using GPT-4 Vision. When streaming, the search
+        # starts from the leading attributes while the rest is generated.
+        speculative = SpeculativeSearch(
+            functools.partial(search_retailers, tier=tier, image_dir=image_dir),
+            min_results=SPECULATIVE_MIN_RESULTS,
         )
+        try:
+            with track_stage("describe"):
+                if STREAM_DESCRIPTION:
+                    description = await description_generator.stream_description(
+                        file_path=file_path,
+                        garment_type=garment_type,
+                        garment_layer=garment_layer,
+                        image_data=upload.description_jpeg,
+                        mime_type="image/jpeg",
+                        on_leading_attributes=speculative.start,
+                        prompt_version=prompt_version,
+                    )
+                else:
+                    description = await description_generator.generate_description(
+                        file_path=file_path,
+                        garment_type=garment_type,
+                        garment_layer=garment_layer,
+                        image_data=upload.description_jpeg,
+                        mime_type="image/jpeg",
+                        prompt_version=prompt_version,
+                    )
 
-        # Generate embeddings for the uploaded image
-        clip_embeddings = await dino_generator.generate_embeddings(file_path)
+            # Generate embeddings for the uploaded image
+            with track_stage("embed_query"):
+                clip_embeddings = await embeddings_generator.embed_crop(upload.crop)
+        except BaseException:
+            speculative.cancel()
+            raise
 
-        # Scrape Google Shopping for similar items
-        try:
-            google_results = await scraper.scrape_and_save(description, max_results=40)
-        except Exception as e:
-            logger.error(f"Error scraping Google Shopping: {e}")
-            raise HTTPException(
-                status_code=500,
-                detail="There was an issue during search. Please try again.",
+        # Reuse the speculative results, re-scoring titles against the full
+        # description, or search with the full description
+        attributes = parse_description(description)
+        with track_stage("search_wait"):
+            google_results, search_outcome = await speculative.resolve(
+                description, attributes
             )
+        if search_outcome == "reused":
+            google_results = text_prefilter.filter(google_results, attributes)
 
-        # Scrape Amazon
-        try:
-            amazon_results = await amazon_scrapper.scrape_and_save(
-                description, max_results=20
-            )
-        except Exception as e:
-            logger.error(f"Error scraping Amazon: {e}")
-            raise HTTPException(
-                status_code=500,
-                detail="There was an issue during search. Please try again.",
-            )
+        # Merge cross-retailer duplicates, prefilter on colour/shape, then
+        # embed and rank the shortlist
+        candidates = [item for item in google_results if item.get("local_image_path")]
+        with track_stage("dedupe"):
+            candidates = await deduplicator.dedupe(candidates)
+        sorted_results = await tier_cascade.rank(
+            clip_embeddings,
+            file_path,
+            candidates,
+            keep_vectors=True,
+            shortlist_size=tier.shortlist_size,
+        )
+        sorted_results = combine_scores(sorted_results, TEXT_SCORE_WEIGHT)
+        with track_stage("thumbnails"):
+            await thumbnails.attach(sorted_results)
 
-        try:
-            google_results.extend(amazon_results)
-        except Exception as e:
-            logger.error(f"Error processing combined results: {e}")
-            raise HTTPException(status_code=500, detail=str(e))
-
-        # Generate vectors for fetched items
-        for item in google_results:
-            if item.get("local_image_path"):
-                item["vectors"] = await dino_generator.generate_embeddings(
-                    item["local_image_path"]
+        # Keep the full ranking and return its first page
+        result_set = result_store.put(
+            description, sorted_results, metadata={"quality_tier": tier.name}
+        )
+        response = APIResponse.success_response(
+            {
+                **result_page(result_set, None, RESULTS_PAGE_SIZE),
+                "sources": retailer_health.status(),
+            },
+            request=request,
+            encoder=response_encoder,
+        )
+        response.headers["X-Quality-Tier"] = tier.name
+        return response
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error("Error processing image: %s", e)
+        raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        FileHandler.remove_directory(upload_dir)
+        FileHandler.remove_directory(image_dir)
+
+
+@app.post("/process/batch/")
+async def process_batch(
+    request: Request,
+    files: List[UploadFile] = File(...),
+    garment_types: List[str] = Form(...),
+    garment_layers: List[str] = Form(None),
+    prompt_version: str = Form(None),
+) -> Response:
+    """
+    Process several uploaded images, one garment each, and return results grouped by image.
+    """
+    if len(files) > BATCH_MAX_IMAGES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {BATCH_MAX_IMAGES} images can be processed per batch.",
+        )
+    garment_layers = garment_layers or [None] * len(files)
+    if len(garment_types) != len(files) or len(garment_layers) != len(files):
+        raise HTTPException(
+            status_code=400,
+            detail="Provide one garment_type (and garment_layer, if any) per file.",
+        )
+    check_prompt_version(prompt_version)
+
+    # Uploads and product images of this request only; removed when it ends
+    directory_name = FileHandler.new_request_directory_name()
+    upload_dir = FileHandler.create_request_directory(UPLOAD_DIR, directory_name)
+    image_dir = FileHandler.create_request_directory(FETCHED_IMAGES_DIR, directory_name)
+    try:
+        tier = quality.select()
+        tier_cascade = cascades[tier.model]
+
+        queries = []
+        with track_stage("upload"):
+            for file, garment_type, garment_layer in zip(
+                files, garment_types, garment_layers
+            ):
+                try:
+                    upload = await ingest_upload(
+                        file,
+                        upload_dir,
+                        max_bytes=MAX_UPLOAD_BYTES,
+                        preprocessor=tier_cascade.embeddings_generator.preprocessor,
+                    )
+                except UploadTooLargeError as e:
+                    raise HTTPException(status_code=413, detail=f"{file.filename}: {e}")
+                except ValueError as e:
+                    raise HTTPException(status_code=400, detail=f"{file.filename}: {e}")
+                queries.append(
+                    BatchQuery(
+                        file_path=upload.file_path,
+                        crop=upload.crop,
+                        garment_type=garment_type,
+                        garment_layer=garment_layer or None,
+                        image_data=upload.description_jpeg,
+                        prompt_version=prompt_version or None,
+                    )
                 )
 
-        # Sort results by similarity
-        sorted_results = await comparator.sort_dicts_by_similarity(
-            clip_embeddings, google_results, cleanup=False
+        batch_results = await batch_search.run(
+            queries,
+            cascade=tier_cascade,
+            search=functools.partial(search_retailers, tier=tier, image_dir=image_dir),
+            shortlist_size=tier.shortlist_size,
         )
 
-        return APIResponse.success_response(
-            {
-                "description": description,
-                "results": sorted_results,
+        items = []
+        for index, (file, query, batch_result) in enumerate(
+            zip(files, queries, batch_results)
+        ):
+            item = {
+                "index": index,
+                "filename": file.filename,
+                "garment_type": query.garment_type,
+                "garment_layer": query.garment_layer,
             }
+            if batch_result.error:
+                item.update(
+                    description=batch_result.description, error=batch_result.error
+                )
+            else:
+                ranked = combine_scores(batch_result.results, TEXT_SCORE_WEIGHT)
+                with track_stage("thumbnails"):
+                    await thumbnails.attach(ranked)
+                result_set = result_store.put(
+                    batch_result.description,
+                    ranked,
+                    metadata={"quality_tier": tier.name},
+                )
+                item.update(result_page(result_set, None, RESULTS_PAGE_SIZE))
+            items.append(item)
+        response = APIResponse.success_response(
+            {
+                "items": items,
+                "quality_tier": tier.name,
+                "sources": retailer_health.status(),
+            },
+            request=request,
+            encoder=response_encoder,
         )
+        response.headers["X-Quality-Tier"] = tier.name
+        return response
 
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.error(f"Error processing image: {e}")
+        logger.error("Error processing batch: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        FileHandler.remove_directory(upload_dir)
+        FileHandler.remove_directory(image_dir)
+
+
+def result_page(result_set: ResultSet, cursor: str, limit: int) -> dict:
+    """
+    Build the response body for one page of a stored result set.
+    """
+    try:
+        results, next_cursor = result_store.page(result_set, cursor, limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {
+        "description": result_set.description,
+        "result_set_id": result_set.id,
+        "results": results,
+        "next_cursor": next_cursor,
+        "total": len(result_set.items),
+        "quality_tier": result_set.metadata.get("quality_tier"),
+    }
+
+
+def get_result_set(result_set_id: str) -> ResultSet:
+    """
+    Look up a live result set or fail with 404.
+    """
+    result_set = result_store.get(result_set_id)
+    if result_set is None:
+        raise HTTPException(status_code=404, detail="Result set not found or expired.")
+    return result_set
+
+
+@app.get("/results/{result_set_id}")
+async def get_results(
+    request: Request,
+    result_set_id: str,
+    cursor: str = Query(None),
+    limit: int = Query(RESULTS_PAGE_SIZE, ge=1, le=100),
+) -> Response:
+    """
+    Page through a stored result set.
+    """
+    result_set = get_result_set(result_set_id)
+    return APIResponse.success_response(
+        result_page(result_set, cursor, limit),
+        request=request,
+        encoder=response_encoder,
+    )
+
+
+@app.post("/results/{result_set_id}/similar/{index}")
+async def more_like_this(
+    request: Request,
+    result_set_id: str,
+    index: int,
+    limit: int = Query(RESULTS_PAGE_SIZE, ge=1, le=100),
+) -> Response:
+    """
+    Re-rank a stored result set by similarity to one of its items, without scraping.
+    """
+    result_set = get_result_set(result_set_id)
+    try:
+        similar = result_store.more_like_this(result_set, index)
+    except IndexError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return APIResponse.success_response(
+        {**result_page(similar, None, limit), "seed": result_set.items[index]},
+        request=request,
+        encoder=response_encoder,
+    )
+
+
+@app.get("/thumbnails/{name}")
+async def get_thumbnail(name: str, if_none_match: str = Header(None)) -> Response:
+    """
+    Serve a result thumbnail; clients revalidate with If-None-Match.
+    """
+    parsed = thumbnails.parse_name(name)
+    if parsed is None:
+        raise HTTPException(status_code=404, detail="Thumbnail not found.")
+    headers = {"ETag": thumbnails.etag(*parsed), "Cache-Control": CACHE_CONTROL}
+    # Only confirm a client's copy of a thumbnail this server can still serve.
+    if etag_matches(if_none_match, headers["ETag"]) and thumbnails.ensure(*parsed):
+        THUMBNAIL_REQUESTS.inc(outcome="not_modified")
+        return Response(status_code=304, headers=headers)
+    file_path = await thumbnails.get(*parsed)
+    if file_path is None:
+        raise HTTPException(status_code=404, detail="Thumbnail not found.")
+    return FileResponse(
+        file_path, media_type=thumbnails.media_type(parsed[1]), headers=headers
+    )
+
+
+@app.on_event("startup")
+async def start_prewarm_crawler() -> None:
+    """
+    Start the scrape result writer and, when enabled, the pre-warming crawler.
+    Request directories left by a process that stopped mid-request are removed.
+    """
+    for directory in (UPLOAD_DIR, FETCHED_IMAGES_DIR):
+        FileHandler.remove_stale_directories(directory, max_age_seconds=3600)
+    result_log.start()
+    if prewarm_crawler is not None:
+        prewarm_crawler.start()
+
+
+@app.on_event("shutdown")
+async def close_http_scraper() -> None:
+    """
+    Stop the pre-warming crawler, close the pooled scraping session, stop
+    the thumbnail workers and flush the scrape result log.
+    """
+    if prewarm_crawler is not None:
+        await prewarm_crawler.stop()
+    await http_scraper.close()
+    thumbnails.close()
+    result_log.stop()
 
 
 # Mount static files
 app.mount("/static", StaticFiles(directory="static"), name="static")
 
 
+@app.get("/metrics")
+async def metrics() -> PlainTextResponse:
+    """
+    Expose pipeline metrics in the Prometheus text format.
+    """
+    return PlainTextResponse(REGISTRY.render(), media_type=PROMETHEUS_CONTENT_TYPE)
+
+
+@app.get("/admin/profiles/", dependencies=[Depends(require_admin)])
+async def get_profiles():
+    """
+    List saved request profiles, newest first.
+    """
+    return {"profiles": list_profiles(PROFILES_DIR)}
+
+
+@app.get("/admin/profiles/{file_name}", dependencies=[Depends(require_admin)])
+async def download_profile(file_name: str) -> FileResponse:
+    """
+    Download a saved profile file (.prof, .collapsed or .json).
+    """
+    file_path = resolve_profile_file(PROFILES_DIR, file_name)
+    if file_path is None:
+        raise HTTPException(status_code=404, detail="Profile not found.")
+    return FileResponse(file_path, filename=file_name)
+
+
+@app.get("/admin/quality/", dependencies=[Depends(require_admin)])
+async def get_quality_tier():
+    """
+    Show the quality tier in use, any override and the load behind it.
+    """
+    return quality.status()
+
+
+@app.post("/admin/quality/", dependencies=[Depends(require_admin)])
+async def set_quality_tier(tier: str = Query(...)):
+    """
+    Pin a quality tier for all searches, or return to automatic selection with tier=auto.
+    """
+    try:
+        quality.set_override(None if tier == "auto" else tier)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return quality.status()
+
+
 @app.get("/health/")
 async def health_check():
     """
     Health check endpoint.
     """
-    return {"status": "ok"}
+    return {"status": "ok", "sources": retailer_health.status()}
@@ -0,0 +1,517 @@
+import argparse
+import asyncio
+import json
+import os
+import random
+import signal
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import aiohttp
+
+from benchmarks.stubs import StubServer
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+
+
+@dataclass
+class RequestRecord:
+    started: float
+    latency: float
+    status: int
+    stages: Dict[str, float] = field(default_factory=dict)
+    error: Optional[str] = None
+
+
+def parse_server_timing(header: Optional[str]) -> Dict[str, float]:
+    """Parse a Server-Timing header into stage durations in seconds.
+
+    Args:
+        header (Optional[str]): Header value, e.g. ``describe;dur=812.3, rank;dur=1.2``.
+
+    Returns:
+        Dict[str, float]: Stage name to duration.
+    """
+    stages: Dict[str, float] = {}
+    if not header:
+        return stages
+    for metric in header.split(","):
+        name, *params = [part.strip() for part in metric.split(";")]
+        for param in params:
+            if param.startswith("dur="):
+                stages[name] = stages.get(name, 0.0) + float(param[4:]) / 1000.0
+    return stages
+
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def summarize(records: List[RequestRecord], duration: float) -> Dict[str, Any]:
+    """Aggregate request records into throughput, latency and error figures.
+
+    Args:
+        records (List[RequestRecord]): Completed requests.
+        duration (float): Wall-clock length of the test in seconds.
+
+    Returns:
+        Dict[str, Any]: Summary statistics.
+    """
+    ok = [record for record in records if record.status == 200]
+    latencies = sorted(record.latency for record in ok)
+    stage_totals: Dict[str, List[float]] = {}
+    for record in ok:
+        for stage, seconds in record.stages.items():
+            stage_totals.setdefault(stage, []).append(seconds)
+    errors: Dict[str, int] = {}
+    for record in records:
+        if record.status != 200:
+            key = record.error or str(record.status)
+            errors[key] = errors.get(key, 0) + 1
+    return {
+        "requests": len(records),
+        "succeeded": len(ok),
+        "error_rate": (len(records) - len(ok)) / len(records) if records else 0.0,
+        "errors": errors,
+        "throughput_rps": len(ok) / duration if duration else 0.0,
+        "latency": {
+            "p50": percentile(latencies, 0.50),
+            "p95": percentile(latencies, 0.95),
+            "p99": percentile(latencies, 0.99),
+            "mean": statistics.fmean(latencies) if latencies else 0.0,
+        },
+        "stages_mean": {
+            stage: statistics.fmean(values)
+            for stage, values in sorted(stage_totals.items())
+        },
+    }
+
+
+def windowed(
+    records: List[RequestRecord], start: float, duration: float, window: float
+) -> List[Dict[str, Any]]:
+    """Summarize records per time window, keyed by request start time."""
+    windows = []
+    offset = 0.0
+    while offset < duration:
+        in_window = [
+            record
+            for record in records
+            if offset <= record.started - start < offset + window
+        ]
+        windows.append({"offset": offset, **summarize(in_window, window)})
+        offset += window
+    return windows
+
+
+class LoadGenerator:
+    def __init__(
+        self,
+        target: str,
+        image: bytes,
+        garment_type: str = "upper",
+        garment_layer: str = "jacket",
+        timeout: float = 300.0,
+    ):
+        """Send multipart uploads to the /process/ endpoint.
+
+        Args:
+            target (str): Base URL of the service, e.g. "http://127.0.0.1:8000".
+            image (bytes): JPEG bytes uploaded with every request.
+            garment_type (str): Value of the garment_type form field.
+            garment_layer (str): Value of the garment_layer form field.
+            timeout (float): Per-request timeout in seconds.
+        """
+        self.url = target.rstrip("/") + "/process/"
+        self.image = image
+        self.garment_type = garment_type
+        self.garment_layer = garment_layer
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+        self.records: List[RequestRecord] = []
+
+    async def _send(self, session: aiohttp.ClientSession) -> None:
+        form = aiohttp.FormData()
+        form.add_field(
+            "file", self.image, filename="upload.jpg", content_type="image/jpeg"
+        )
+        form.add_field("garment_type", self.garment_type)
+        form.add_field("garment_layer", self.garment_layer)
+        started = time.perf_counter()
+        try:
+            async with session.post(self.url, data=form) as response:
+                await response.read()
+                self.records.append(
+                    RequestRecord(
+                        started=started,
+                        latency=time.perf_counter() - started,
+                        status=response.status,
+                        stages=parse_server_timing(
+                            response.headers.get("Server-Timing")
+                        ),
+                    )
+                )
+        except Exception as e:
+            self.records.append(
+                RequestRecord(
+                    started=started,
+                    latency=time.perf_counter() - started,
+                    status=0,
+                    error=type(e).__name__,
+                )
+            )
+
+    async def run_closed_loop(self, concurrency: int, duration: float) -> float:
+        """Keep ``concurrency`` requests in flight for ``duration`` seconds.
+
+        Returns:
+            float: Start time of the test (perf_counter).
+        """
+        start = time.perf_counter()
+        deadline = start + duration
+        connector = aiohttp.TCPConnector(limit=concurrency)
+        async with aiohttp.ClientSession(
+            connector=connector, timeout=self.timeout
+        ) as session:
+
+            async def user() -> None:
+                while time.perf_counter() < deadline:
+                    await self._send(session)
+
+            await asyncio.gather(*(user() for _ in range(concurrency)))
+        return start
+
+    async def run_open_loop(self, rate: float, duration: float, seed: int = 0) -> float:
+        """Start requests with Poisson arrivals at ``rate`` per second.
+
+        Unlike the closed loop, arrivals do not wait for earlier requests, so
+        queueing inside the service shows up as growing latency.
+
+        Returns:
+            float: Start time of the test (perf_counter).
+        """
+        rng = random.Random(seed)
+        start = time.perf_counter()
+        deadline = start + duration
+        tasks = []
+        async with aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=0), timeout=self.timeout
+        ) as session:
+            next_arrival = start
+            while next_arrival < deadline:
+                await asyncio.sleep(max(0.0, next_arrival - time.perf_counter()))
+                tasks.append(asyncio.create_task(self._send(session)))
+                next_arrival += rng.expovariate(rate)
+            await asyncio.gather(*tasks)
+        return start
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class ServiceProcess:
+    def __init__(self, stubs: StubServer, workers: int, env: Dict[str, str]):
+        """Run the app under uvicorn with scrapers and OpenAI pointed at the stand-ins.
+
+        Args:
+            stubs (StubServer): Running stand-in server.
+            workers (int): Number of uvicorn worker processes.
+            env (Dict[str, str]): Extra environment variables (e.g. INFERENCE_WORKERS).
+        """
+        self.port = _free_port()
+        self.url = f"http://127.0.0.1:{self.port}"
+        self.env = {
+            **os.environ,
+            "OPENAI_KEY": "loadtest",
+            "OPENAI_BASE_URL": stubs.openai_base_url,
+            "GOOGLE_BASE_URL": stubs.google_base_url,
+            "AMAZON_BASE_URL": stubs.amazon_base_url,
+            **env,
+        }
+        self.workers = workers
+        self._process: Optional[subprocess.Popen] = None
+
+    async def __aenter__(self) -> "ServiceProcess":
+        self._process = subprocess.Popen(
+            [
+                sys.executable,
+                "-m",
+                "uvicorn",
+                "app:app",
+                "--port",
+                str(self.port),
+                "--workers",
+                str(self.workers),
+                "--log-level",
+                "warning",
+            ],
+            cwd=PROJECT_ROOT,
+            env=self.env,
+        )
+        async with aiohttp.ClientSession() as session:
+            for _ in range(600):
+                if self._process.poll() is not None:
+                    raise RuntimeError("Service exited during startup.")
+                try:
+                    async with session.get(f"{self.url}/health/") as response:
+                        if response.status == 200:
+                            return self
+                except aiohttp.ClientError:
+                    pass
+                await asyncio.sleep(0.5)
+        raise RuntimeError("Service did not become healthy in time.")
+
+    async def __aexit__(self, *exc_info) -> None:
+        self._process.send_signal(signal.SIGINT)
+        try:
+            self._process.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            self._process.kill()
+
+
+async def run_test(
+    target: str,
+    image: bytes,
+    duration: float,
+    concurrency: Optional[int],
+    rate: Optional[float],
+    window: float,
+) -> Dict[str, Any]:
+    generator = LoadGenerator(target, image)
+    if rate:
+        start = await generator.run_open_loop(rate, duration)
+    else:
+        start = await generator.run_closed_loop(concurrency or 1, duration)
+    elapsed = time.perf_counter() - start
+    return {
+        "mode": {"rate": rate} if rate else {"concurrency": concurrency or 1},
+        "duration": elapsed,
+        "summary": summarize(generator.records, elapsed),
+        "windows": windowed(generator.records, start, elapsed, window),
+        "records": [asdict(record) for record in generator.records],
+    }
+
+
+def find_saturation(
+    runs: List[Dict[str, Any]], min_gain: float = 0.1, max_error_rate: float = 0.01
+) -> Optional[Dict[str, Any]]:
+    """Return the first run after which more concurrency stops paying off.
+
+    Saturation is reached when raising concurrency improves throughput by less
+    than ``min_gain`` (relative) while p95 latency keeps growing, or when the
+    next run fails more than ``max_error_rate`` of its requests: failing
+    requests finish early and would otherwise pass for extra throughput.
+
+    Args:
+        runs (List[Dict[str, Any]]): Closed-loop runs of one worker setting, in
+            increasing concurrency order.
+        min_gain (float): Minimum relative throughput gain. Defaults to 0.1.
+        max_error_rate (float): Highest error rate of a healthy run.
+            Defaults to 0.01.
+
+    Returns:
+        Optional[Dict[str, Any]]: Settings, summary and reason of the
+        saturating run.
+    """
+    for previous, current in zip(runs, runs[1:]):
+        before, after = previous["summary"], current["summary"]
+        if max(before["error_rate"], after["error_rate"]) > max_error_rate:
+            return {
+                "settings": previous["settings"],
+                "summary": before,
+                "reason": "errors",
+            }
+        if not before["throughput_rps"]:
+            continue
+        gain = after["throughput_rps"] / before["throughput_rps"] - 1.0
+        if gain < min_gain and after["latency"]["p95"] > before["latency"]["p95"]:
+            return {
+                "settings": previous["settings"],
+                "summary": before,
+                "reason": "throughput",
+            }
+    return None
+
+
+async def sweep(
+    image: bytes,
+    workers_options: List[int],
+    concurrency_options: List[int],
+    inference_workers_options: List[int],
+    duration: float,
+    window: float,
+    stubs: StubServer,
+) -> Dict[str, Any]:
+    """Run closed-loop tests over a grid of service and client settings."""
+    results = []
+    for workers in workers_options:
+        for inference_workers in inference_workers_options:
+            env = {"INFERENCE_WORKERS": str(inference_workers)}
+            runs = []
+            async with ServiceProcess(stubs, workers, env) as service:
+                for concurrency in concurrency_options:
+                    print(
+                        f"workers={workers} inference_workers={inference_workers} "
+                        f"concurrency={concurrency}",
+                        file=sys.stderr,
+                        flush=True,
+                    )
+                    run = await run_test(
+                        service.url, image, duration, concurrency, None, window
+                    )
+                    run["settings"] = {
+                        "workers": workers,
+                        "inference_workers": inference_workers,
+                        "concurrency": concurrency,
+                    }
+                    run.pop("records")
+                    runs.append(run)
+            results.append(
+                {
+                    "workers": workers,
+                    "inference_workers": inference_workers,
+                    "runs": runs,
+                    "saturation": find_saturation(runs),
+                }
+            )
+    return {"sweep": results}
+
+
+def _print_summary(summary: Dict[str, Any]) -> None:
+    latency = summary["latency"]
+    print(
+        f"requests={summary['requests']} ok={summary['succeeded']} "
+        f"errors={summary['error_rate'] * 100:.1f}% "
+        f"throughput={summary['throughput_rps']:.2f} rps "
+        f"p50={latency['p50']:.2f}s p95={latency['p95']:.2f}s p99={latency['p99']:.2f}s"
+    )
+    for stage, seconds in summary["stages_mean"].items():
+        print(f"  {stage:20s} {seconds * 1000:9.1f} ms")
+
+
+def _int_list(value: str) -> List[int]:
+    return [int(item) for item in value.split(",") if item]
+
+
+async def _main(args: argparse.Namespace) -> Dict[str, Any]:
+    stubs = StubServer(
+        openai_latency=args.openai_latency,
+        page_latency=args.page_latency,
+        image_latency=args.image_latency,
+    ).start_in_thread()
+    try:
+        image = (
+            Path(args.image).read_bytes()
+            if args.image
+            else stubs.image_bytes(stubs.catalog[0]["id"])
+        )
+        if args.sweep:
+            return await sweep(
+                image,
+                _int_list(args.workers),
+                _int_list(args.concurrency),
+                _int_list(args.inference_workers),
+                args.duration,
+                args.window,
+                stubs,
+            )
+        if args.target:
+            return await run_test(
+                args.target,
+                image,
+                args.duration,
+                int(args.concurrency),
+                args.rate,
+                args.window,
+            )
+        env = {"INFERENCE_WORKERS": args.inference_workers}
+        async with ServiceProcess(stubs, int(args.workers), env) as service:
+            return await run_test(
+                service.url,
+                image,
+                args.duration,
+                int(args.concurrency),
+                args.rate,
+                args.window,
+            )
+    finally:
+        stubs.stop_thread()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Load test the /process/ endpoint.")
+    parser.add_argument(
+        "--target",
+        help="URL of an already running service. By default the app is started "
+        "under uvicorn with scrapers and OpenAI pointed at local stand-ins.",
+    )
+    parser.add_argument("--image", help="JPEG to upload (default: a fixture image).")
+    parser.add_argument("--duration", type=float, default=60.0)
+    parser.add_argument(
+        "--concurrency",
+        default="4",
+        help="Closed-loop users (comma-separated for --sweep).",
+    )
+    parser.add_argument(
+        "--rate", type=float, help="Open-loop arrival rate in requests/s."
+    )
+    parser.add_argument(
+        "--window", type=float, default=10.0, help="Report window in seconds."
+    )
+    parser.add_argument(
+        "--workers", default="1", help="uvicorn workers (comma-separated for --sweep)."
+    )
+    parser.add_argument(
+        "--inference-workers",
+        default="1",
+        help="INFERENCE_WORKERS (comma-separated for --sweep).",
+    )
+    parser.add_argument(
+        "--sweep", action="store_true", help="Sweep workers x concurrency."
+    )
+    parser.add_argument("--openai-latency", type=float, default=1.5)
+    parser.add_argument("--page-latency", type=float, default=0.3)
+    parser.add_argument("--image-latency", type=float, default=0.02)
+    parser.add_argument("--output", default="loadtest_results.json")
+    args = parser.parse_args()
+
+    results = asyncio.run(_main(args))
+    with open(args.output, "w", encoding="utf-8") as file:
+        json.dump(results, file, indent=2)
+
+    if "sweep" in results:
+        for entry in results["sweep"]:
+            print(
+                f"workers={entry['workers']} inference_workers={entry['inference_workers']}"
+            )
+            for run in entry["runs"]:
+                print(f" concurrency={run['settings']['concurrency']}: ", end="")
+                _print_summary(run["summary"])
+            saturation = entry["saturation"]
+            if saturation:
+                print(
+                    f" saturates at concurrency={saturation['settings']['concurrency']}"
+                    f" ({saturation['reason']})"
+                )
+    else:
+        _print_summary(results["summary"])
+        for window in results["windows"]:
+            print(
+                f"[{window['offset']:6.0f}s] {window['throughput_rps']:.2f} rps "
+                f"p95={window['latency']['p95']:.2f}s errors={window['error_rate'] * 100:.1f}%"
+            )
+
+
+if __name__ == "__main__":
+    main()
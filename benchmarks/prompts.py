@@ -0,0 +1,311 @@
+import argparse
+import asyncio
+import base64
+import io
+import json
+import math
+import re
+import statistics
+import time
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional
+
+from PIL import Image
+
+from benchmarks.stubs import FAKE_DESCRIPTION, build_catalog, render_product_image
+from services.image_description import ImageDescriptionGenerator
+from services.prompts import CSV, JSON, PROMPT_VERSIONS, PromptVersion
+from services.text_prefilter import LEADING_FIELDS, parse_description
+
+# Answers the labelled versions give for the stub's black bomber jacket,
+# following the examples in their prompts.
+LABELLED_ANSWERS = {
+    "v1": """**Category**: Outerwear
+**Gender**: Man
+**Garment Type**: Bomber jacket
+**Color**: Solid black with a subtle matte finish
+**Pattern**: Solid, no pattern
+**Style**: Classic bomber silhouette, slightly cropped
+**Fit**: Relaxed fit
+**Fabric/Material**: 100% nylon
+**Texture**: Smooth
+**Closure Type**: Zippered
+**Neckline/Collar**: Ribbed collar
+**Sleeve Type**: Long sleeves
+**Pockets**: Two zippered side pockets
+**Additional Design Features**: Ribbed cuffs and hem, small embroidered logo on the chest
+**Length**: Waist-length
+**Lining**: Fully lined
+**Branding or Logos**: Small 'Nike' logo
+**Occasion/Use**: Casual wear
+
+This is a man's solid black bomber jacket in a relaxed fit, made of smooth 100% nylon with a zippered front, ribbed collar, cuffs and hem, two zippered side pockets and a small embroidered 'Nike' logo on the chest. It is waist-length, fully lined and suited to casual wear.""",
+    "v2": """**Category**: Outerwear
+**Gender**: Man
+**Garment Type**: Bomber jacket
+**Color**: Solid black
+**Pattern**: None
+**Additional Features**: Zippered front, ribbed cuffs
+
+A man's solid black bomber jacket with a zippered front and ribbed cuffs, suited to casual everyday wear.""",
+    "v3": """**Category**: Outerwear
+**Gender**: Man
+**Garment Type**: Bomber jacket
+**Color**: Solid black
+**Pattern**: None
+**Additional Features**: Zippered front, ribbed cuffs""",
+}
+EXPECTED_LEADING = dict(zip(LEADING_FIELDS, FAKE_DESCRIPTION.split(", ")))
+
+# Words and runs of punctuation, so that e.g. '","' counts once as in BPE.
+_TOKEN_RE = re.compile(r"\w+|[^\w\s]+")
+
+
+def count_tokens(text: str) -> int:
+    """Approximate a token count by words and punctuation runs."""
+    return len(_TOKEN_RE.findall(text))
+
+
+def image_tokens(width: int, height: int, detail: str) -> int:
+    """Image input tokens of GPT-4o: 85 at low detail, plus 170 per 512 px tile."""
+    if detail == "low":
+        return 85
+    scale = min(1.0, 2048 / max(width, height))
+    width, height = width * scale, height * scale
+    scale = min(1.0, 768 / min(width, height))
+    tiles = math.ceil(width * scale / 512) * math.ceil(height * scale / 512)
+    return 85 + 170 * tiles
+
+
+def canned_answer(version: PromptVersion) -> str:
+    """Return the stubbed model answer for a prompt version."""
+    if version.output == CSV:
+        return FAKE_DESCRIPTION
+    if version.output == JSON:
+        properties = version.json_schema["schema"]["properties"]
+        values = dict(zip(properties, FAKE_DESCRIPTION.split(", ")))
+        return json.dumps(values, separators=(",", ":"))
+    return LABELLED_ANSWERS.get(version.name, LABELLED_ANSWERS["v3"])
+
+
+class StubCompletions:
+    def __init__(
+        self,
+        answers: Dict[str, str],
+        first_token_seconds: float,
+        prompt_token_seconds: float,
+        output_token_seconds: float,
+        time_scale: float,
+    ):
+        """Answer chat completions offline, taking as long as GPT-4o would.
+
+        The answer is picked by the prompt text of the request. Latency is
+        modelled as a fixed time to first token plus per-token prefill and
+        decode times, and slept scaled by ``time_scale``. ``max_tokens``
+        truncates the answer.
+        """
+        self.answers = answers
+        self.first_token_seconds = first_token_seconds
+        self.prompt_token_seconds = prompt_token_seconds
+        self.output_token_seconds = output_token_seconds
+        self.time_scale = time_scale
+        # Finish reason and usage of the latest completion.
+        self.last: Optional[tuple] = None
+
+    def _answer(self, messages: List[Dict[str, Any]], max_tokens: Optional[int]):
+        text = messages[0]["content"][0]["text"]
+        image_url = messages[0]["content"][1]["image_url"]
+        data = image_url["url"].split(",", 1)[1]
+        with Image.open(io.BytesIO(base64.b64decode(data))) as image:
+            size = image.size
+        content = next(
+            answer for prompt, answer in self.answers.items() if text.endswith(prompt)
+        )
+        tokens = _TOKEN_RE.findall(content)
+        finish_reason = "stop"
+        if max_tokens and len(tokens) > max_tokens:
+            # Cut the text after the last allowed token.
+            position = 0
+            for token in tokens[:max_tokens]:
+                position = content.index(token, position) + len(token)
+            content, finish_reason = content[:position], "length"
+        usage = SimpleNamespace(
+            prompt_tokens=count_tokens(text)
+            + image_tokens(*size, image_url.get("detail", "auto")),
+            completion_tokens=min(len(tokens), max_tokens or len(tokens)),
+        )
+        return content, finish_reason, usage
+
+    async def create(self, model: str, messages, stream: bool = False, **options):
+        content, finish_reason, usage = self._answer(
+            messages, options.get("max_tokens")
+        )
+        self.last = (finish_reason, usage)
+        first_token = (
+            self.first_token_seconds + usage.prompt_tokens * self.prompt_token_seconds
+        )
+        if stream:
+            return self._stream(content, finish_reason, usage, first_token)
+        await asyncio.sleep(
+            (first_token + usage.completion_tokens * self.output_token_seconds)
+            * self.time_scale
+        )
+        message = SimpleNamespace(role="assistant", content=content)
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message=message, finish_reason=finish_reason)],
+            usage=usage,
+        )
+
+    async def _stream(self, content, finish_reason, usage, first_token):
+        await asyncio.sleep(first_token * self.time_scale)
+        pieces = re.findall(r"\s*(?:\w+|[^\w\s]+)", content)
+        for piece in pieces:
+            await asyncio.sleep(self.output_token_seconds * self.time_scale)
+            delta = SimpleNamespace(content=piece)
+            yield SimpleNamespace(
+                choices=[SimpleNamespace(delta=delta, finish_reason=None)], usage=None
+            )
+        yield SimpleNamespace(
+            choices=[
+                SimpleNamespace(
+                    delta=SimpleNamespace(content=None), finish_reason=finish_reason
+                )
+            ],
+            usage=None,
+        )
+        yield SimpleNamespace(choices=[], usage=usage)
+
+
+async def compare(
+    names: List[str],
+    repeats: int,
+    first_token_seconds: float,
+    prompt_token_seconds: float,
+    output_token_seconds: float,
+    time_scale: float,
+) -> Dict[str, Any]:
+    """Describe the stub image with each prompt version through a stubbed client.
+
+    Returns:
+        Dict[str, Any]: Per version: prompt and completion tokens, modelled
+        latency, time until the leading attributes streamed, the description
+        and whether its leading attributes were recovered.
+    """
+    image_data = render_product_image(build_catalog()[0])
+    versions = [PROMPT_VERSIONS[name] for name in names]
+    completions = StubCompletions(
+        {version.text: canned_answer(version) for version in versions},
+        first_token_seconds,
+        prompt_token_seconds,
+        output_token_seconds,
+        time_scale,
+    )
+    client = SimpleNamespace(chat=SimpleNamespace(completions=completions))
+    generator = ImageDescriptionGenerator(api_key="offline", client=client)
+
+    results = {}
+    for version in versions:
+        latencies, leading_times = [], []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            description = await generator.generate_description(
+                "", "upper", "jacket", image_data, "image/jpeg", version.name
+            )
+            latencies.append((time.perf_counter() - start) / time_scale)
+            finish_reason, usage = completions.last
+
+            leading: List[float] = []
+            start = time.perf_counter()
+            await generator.stream_description(
+                "",
+                "upper",
+                "jacket",
+                image_data,
+                "image/jpeg",
+                on_leading_attributes=lambda _: leading.append(
+                    (time.perf_counter() - start) / time_scale
+                ),
+                prompt_version=version.name,
+            )
+            leading_times.extend(leading)
+
+        attributes = parse_description(description)
+        results[version.name] = {
+            "prompt_tokens": usage.prompt_tokens,
+            "completion_tokens": usage.completion_tokens,
+            "finish_reason": finish_reason,
+            "latency_median": statistics.median(latencies),
+            "leading_attributes_median": (
+                statistics.median(leading_times) if leading_times else None
+            ),
+            "description": description,
+            "leading_attributes_ok": all(
+                value.lower() in attributes.get(name, "").lower()
+                for name, value in EXPECTED_LEADING.items()
+            ),
+        }
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Compare description prompt versions offline with a stubbed "
+        "GPT-4o client: token counts and modelled latency."
+    )
+    parser.add_argument(
+        "--versions",
+        default=",".join(PROMPT_VERSIONS),
+        help="Comma-separated prompt versions (default: all registered).",
+    )
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument(
+        "--first-token", type=float, default=0.4, help="Seconds to the first token."
+    )
+    parser.add_argument(
+        "--prompt-token",
+        type=float,
+        default=0.0002,
+        help="Prefill seconds per prompt token.",
+    )
+    parser.add_argument(
+        "--output-token",
+        type=float,
+        default=0.015,
+        help="Decode seconds per completion token.",
+    )
+    parser.add_argument(
+        "--time-scale",
+        type=float,
+        default=0.05,
+        help="Fraction of the modelled latency actually slept.",
+    )
+    parser.add_argument("--output", help="Write the results as JSON to this file.")
+    args = parser.parse_args()
+
+    results = asyncio.run(
+        compare(
+            [name.strip() for name in args.versions.split(",") if name.strip()],
+            args.repeats,
+            args.first_token,
+            args.prompt_token,
+            args.output_token,
+            args.time_scale,
+        )
+    )
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(results, file, indent=2)
+    for name, result in results.items():
+        leading = result["leading_attributes_median"]
+        print(
+            f"{name}: {result['prompt_tokens']} prompt + "
+            f"{result['completion_tokens']} completion tokens, "
+            f"{result['latency_median']:.2f}s, leading attributes after "
+            f"{'-' if leading is None else f'{leading:.2f}s'}, "
+            f"parsed {'ok' if result['leading_attributes_ok'] else 'WRONG'}: "
+            f"{result['description']}"
+        )
+
+
+if __name__ == "__main__":
+    main()
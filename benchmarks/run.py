@@ -0,0 +1,689 @@
+import argparse
+import asyncio
+import fnmatch
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+import numpy as np
+
+from benchmarks.stubs import StubServer
+
+# Never reach out to the Hugging Face hub; DINOv2 weights must already be cached.
+os.environ.setdefault("HF_HUB_OFFLINE", "1")
+
+THRESHOLDS_FILE = Path(__file__).parent / "thresholds.json"
+
+
+class BenchmarkSkipped(Exception):
+    """Raised by a benchmark whose dependencies are unavailable."""
+
+
+@dataclass
+class BenchContext:
+    server: StubServer
+    work_dir: Path
+    repeats: int
+    warmup: int
+    _cache: Dict[str, Any] = field(default_factory=dict)
+
+    def dino(self):
+        """Return a shared DINOEmbeddingsGenerator, loading it on first use."""
+        if "dino" not in self._cache:
+            try:
+                from services.clip_embeddings import DINOEmbeddingsGenerator
+
+                self._cache["dino"] = DINOEmbeddingsGenerator()
+            except Exception as e:
+                self._cache["dino"] = BenchmarkSkipped(f"DINOv2 unavailable: {e}")
+        if isinstance(self._cache["dino"], BenchmarkSkipped):
+            raise self._cache["dino"]
+        return self._cache["dino"]
+
+    def fixture_images(self, count: int) -> List[Path]:
+        """Write ``count`` catalog images to disk and return their paths."""
+        image_dir = self.work_dir / "fixtures"
+        image_dir.mkdir(exist_ok=True)
+        paths = []
+        for product in self.server.catalog[:count]:
+            path = image_dir / f"{product['id']}.jpg"
+            if not path.exists():
+                path.write_bytes(self.server.image_bytes(product["id"]))
+            paths.append(path)
+        return paths
+
+
+async def measure(
+    operation: Callable[[], Awaitable[Any]], repeats: int, warmup: int
+) -> Dict[str, float]:
+    """Time an async operation.
+
+    Args:
+        operation (Callable[[], Awaitable[Any]]): Operation to time.
+        repeats (int): Number of timed runs.
+        warmup (int): Number of untimed runs before measuring.
+
+    Returns:
+        Dict[str, float]: min, median, p95, mean and stdev in seconds.
+    """
+    for _ in range(warmup):
+        await operation()
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        await operation()
+        samples.append(time.perf_counter() - start)
+    samples.sort()
+    return {
+        "repeats": repeats,
+        "min": samples[0],
+        "median": statistics.median(samples),
+        "p95": samples[min(len(samples) - 1, int(round(0.95 * (len(samples) - 1))))],
+        "mean": statistics.fmean(samples),
+        "stdev": statistics.stdev(samples) if len(samples) > 1 else 0.0,
+    }
+
+
+BENCHMARKS: Dict[str, Callable[[BenchContext], Awaitable[Dict[str, Any]]]] = {}
+
+
+def benchmark(name: str):
+    """Register a benchmark under ``name``."""
+
+    def register(func):
+        BENCHMARKS[name] = func
+        return func
+
+    return register
+
+
+@benchmark("comparator_cosine_similarity")
+async def bench_cosine_similarity(ctx: BenchContext) -> Dict[str, Any]:
+    from services.image_comparator import ImageComparator
+
+    rng = np.random.default_rng(0)
+    query = rng.standard_normal((1, 768)).astype(np.float32)
+    vectors = rng.standard_normal((60, 1, 768)).astype(np.float32)
+
+    async def operation():
+        for vector in vectors:
+            ImageComparator.cosine_similarity(query, vector)
+
+    return {**await measure(operation, ctx.repeats, ctx.warmup), "items": len(vectors)}
+
+
+@benchmark("comparator_sort_by_similarity")
+async def bench_sort_by_similarity(ctx: BenchContext) -> Dict[str, Any]:
+    from services.image_comparator import ImageComparator
+
+    comparator = ImageComparator()
+    rng = np.random.default_rng(1)
+    query = rng.standard_normal((1, 768)).astype(np.float32)
+    vectors = rng.standard_normal((60, 1, 768)).astype(np.float32)
+
+    async def operation():
+        items = [
+            {"local_image_path": f"{index}.jpg", "vectors": vector}
+            for index, vector in enumerate(vectors)
+        ]
+        await comparator.sort_dicts_by_similarity(query, items)
+
+    return {**await measure(operation, ctx.repeats, ctx.warmup), "items": len(vectors)}
+
+
+@benchmark("dino_preprocess")
+async def bench_dino_preprocess(ctx: BenchContext) -> Dict[str, Any]:
+    from PIL import Image
+
+    dino = ctx.dino()
+    images = [Image.open(path).convert("RGB") for path in ctx.fixture_images(16)]
+
+    async def operation():
+        for image in images:
+            dino.image_processor(image, return_tensors="pt")
+
+    return {**await measure(operation, ctx.repeats, ctx.warmup), "items": len(images)}
+
+
+@benchmark("preprocess_fast")
+async def bench_preprocess_fast(ctx: BenchContext) -> Dict[str, Any]:
+    from services.preprocessing import FastImagePreprocessor
+
+    preprocessor = FastImagePreprocessor()
+    paths = [str(path) for path in ctx.fixture_images(16)]
+
+    async def operation():
+        preprocessor(paths)
+
+    return {**await measure(operation, ctx.repeats, ctx.warmup), "items": len(paths)}
+
+
+@benchmark("preprocess_parity")
+async def bench_preprocess_parity(ctx: BenchContext) -> Dict[str, Any]:
+    """Compare the fast path with AutoImageProcessor on the same images."""
+    from PIL import Image
+
+    from services.preprocessing import FastImagePreprocessor
+
+    try:
+        from transformers import AutoImageProcessor
+
+        reference = AutoImageProcessor.from_pretrained("facebook/dinov2-base")
+    except Exception as e:
+        raise BenchmarkSkipped(f"DINOv2 processor unavailable: {e}")
+
+    paths = [str(path) for path in ctx.fixture_images(16)]
+    # Non-square inputs exercise the shortest-edge resize and crop offsets.
+    for index, size in enumerate([(640, 480), (333, 777), (1200, 900)]):
+        path = ctx.work_dir / f"parity_{index}.jpg"
+        Image.open(paths[index]).resize(size).save(path, quality=90)
+        paths.append(str(path))
+
+    expected = reference(
+        [Image.open(path).convert("RGB") for path in paths], return_tensors="np"
+    )["pixel_values"]
+    result: Dict[str, Any] = {"items": len(paths)}
+    for name, draft in (("exact", False), ("draft", True)):
+        actual = FastImagePreprocessor.from_processor(reference, draft=draft)(paths)
+        diff = np.abs(actual - expected)
+        result[f"{name}_max_abs_diff"] = float(diff.max())
+        result[f"{name}_mean_abs_diff"] = float(diff.mean())
+    # One 8-bit step after normalization is 1 / (255 * std) ~= 0.0175.
+    # A divergence is recorded rather than raised so the other benchmarks still
+    # run; main() fails the run afterwards.
+    result["ok"] = (
+        result["exact_max_abs_diff"] <= 0.02 and result["draft_mean_abs_diff"] <= 0.01
+    )
+    return result
+
+
+@benchmark("dino_inference")
+async def bench_dino_inference(ctx: BenchContext) -> Dict[str, Any]:
+    dino = ctx.dino()
+    crops = [dino.preprocessor.load(str(path)) for path in ctx.fixture_images(8)]
+
+    async def operation():
+        dino._forward(crops)
+
+    return {**await measure(operation, ctx.repeats, ctx.warmup), "items": len(crops)}
+
+
+@benchmark("dino_generate_embeddings")
+async def bench_dino_generate_embeddings(ctx: BenchContext) -> Dict[str, Any]:
+    dino = ctx.dino()
+    paths = ctx.fixture_images(8)
+
+    async def operation():
+        for path in paths:
+            await dino.generate_embeddings(str(path))
+
+    return {**await measure(operation, ctx.repeats, ctx.warmup), "items": len(paths)}
+
+
+@benchmark("dino_generate_embeddings_batch")
+async def bench_dino_generate_embeddings_batch(ctx: BenchContext) -> Dict[str, Any]:
+    dino = ctx.dino()
+    paths = [str(path) for path in ctx.fixture_images(8)]
+
+    async def operation():
+        await dino.generate_embeddings_batch(paths)
+
+    return {**await measure(operation, ctx.repeats, ctx.warmup), "items": len(paths)}
+
+
+@benchmark("cascade_prefilter")
+async def bench_cascade_prefilter(ctx: BenchContext) -> Dict[str, Any]:
+    from services.image_comparator import ImageComparator
+    from services.ranking_cascade import CascadeRanker
+
+    ranker = CascadeRanker(None, ImageComparator(), shortlist_size=20)
+    paths = ctx.fixture_images(60)
+    candidates = [{"local_image_path": str(path)} for path in paths[1:]]
+
+    async def operation():
+        await ranker.prefilter(str(paths[0]), candidates)
+
+    return {
+        **await measure(operation, ctx.repeats, ctx.warmup),
+        "items": len(candidates),
+    }
+
+
+@benchmark("cascade_recall")
+async def bench_cascade_recall(ctx: BenchContext) -> Dict[str, Any]:
+    from services.image_comparator import ImageComparator
+    from services.ranking_cascade import CascadeRanker
+
+    dino = ctx.dino()
+    ranker = CascadeRanker(dino, ImageComparator())
+    paths = ctx.fixture_images(60)
+    candidates = [{"local_image_path": str(path)} for path in paths[1:]]
+    query_vector = await dino.generate_embeddings(str(paths[0]))
+    sizes = [10, 20, 30, 40]
+
+    recall = await ranker.evaluate_recall(
+        query_vector, str(paths[0]), candidates, k=10, shortlist_sizes=sizes
+    )
+    result = await measure(
+        lambda: ranker.rank(query_vector, str(paths[0]), [dict(c) for c in candidates]),
+        ctx.repeats,
+        ctx.warmup,
+    )
+    return {**result, "recall_at_10": {str(size): recall[size] for size in sizes}}
+
+
+@benchmark("dedupe_products")
+async def bench_dedupe_products(ctx: BenchContext) -> Dict[str, Any]:
+    from services.dedupe import ProductDeduplicator
+
+    deduplicator = ProductDeduplicator()
+    paths = ctx.fixture_images(50)
+    # Same overlap as the stub retailers: Amazon relists products 30-49.
+    items = [
+        {"local_image_path": str(path), "image_url": ctx.server.image_url(path.stem)}
+        for path in paths[:40]
+    ] + [
+        {
+            "local_image_path": str(path),
+            "image_url": ctx.server.image_url(path.stem, variant="cdn=amz"),
+        }
+        for path in paths[30:]
+    ]
+    kept = await deduplicator.dedupe([dict(item) for item in items])
+
+    return {
+        **await measure(
+            lambda: deduplicator.dedupe([dict(item) for item in items]),
+            ctx.repeats,
+            ctx.warmup,
+        ),
+        "items": len(items),
+        "kept": len(kept),
+    }
+
+
+async def _bench_scraper_fetch(ctx: BenchContext, scraper) -> Dict[str, Any]:
+    import aiohttp
+
+    urls = [ctx.server.image_url(product["id"]) for product in ctx.server.catalog[:40]]
+    save_dir = Path(tempfile.mkdtemp(dir=ctx.work_dir))
+
+    async def operation():
+        async with aiohttp.ClientSession() as session:
+            for index, url in enumerate(urls):
+                await scraper._fetch_image(session, url, save_dir / f"{index}.jpg")
+
+    return {**await measure(operation, ctx.repeats, ctx.warmup), "items": len(urls)}
+
+
+@benchmark("download_google_fetch_image")
+async def bench_google_fetch_image(ctx: BenchContext) -> Dict[str, Any]:
+    from scrapper.google_scrapper import GoogleShoppingScraper
+
+    scraper = GoogleShoppingScraper(save_dir=str(ctx.work_dir / "google"))
+    return await _bench_scraper_fetch(ctx, scraper)
+
+
+@benchmark("download_amazon_fetch_image")
+async def bench_amazon_fetch_image(ctx: BenchContext) -> Dict[str, Any]:
+    from scrapper.amazon_scrapper import AsyncAmazonScraper
+
+    scraper = AsyncAmazonScraper(save_dir=str(ctx.work_dir / "amazon"))
+    return await _bench_scraper_fetch(ctx, scraper)
+
+
+@benchmark("download_cached_fetch_image")
+async def bench_cached_fetch_image(ctx: BenchContext) -> Dict[str, Any]:
+    from scrapper.google_scrapper import GoogleShoppingScraper
+    from utils.download_cache import DownloadCache
+
+    cache = DownloadCache(Path(tempfile.mkdtemp(dir=ctx.work_dir)))
+    scraper = GoogleShoppingScraper(
+        save_dir=str(ctx.work_dir / "google_cached"), download_cache=cache
+    )
+    fresh = await _bench_scraper_fetch(ctx, scraper)
+    # Past the freshness window every image is revalidated (304, no body).
+    cache.fresh_seconds = 0.0
+    revalidated = await _bench_scraper_fetch(ctx, scraper)
+    return {
+        **fresh,
+        "revalidate_median": revalidated["median"],
+        "cache_bytes": cache.total_bytes,
+    }
+
+
+@benchmark("download_file_handler")
+async def bench_file_handler_download(ctx: BenchContext) -> Dict[str, Any]:
+    from utils.file_handling import FileHandler
+
+    urls = [ctx.server.image_url(product["id"]) for product in ctx.server.catalog[:10]]
+    save_dir = str(ctx.work_dir / "file_handler")
+
+    async def operation():
+        for index, url in enumerate(urls):
+            await FileHandler.save_image_from_url(url, save_dir, f"{index}.jpg")
+
+    return {**await measure(operation, ctx.repeats, ctx.warmup), "items": len(urls)}
+
+
+@benchmark("scrape_http_google")
+async def bench_scrape_http_google(ctx: BenchContext) -> Dict[str, Any]:
+    from scrapper.http_scrapper import HTTPScraper
+
+    scraper = HTTPScraper(
+        save_dir=str(ctx.work_dir / "http_google"),
+        base_urls={"google": ctx.server.google_base_url},
+    )
+
+    async def operation():
+        await scraper.scrape_and_save("black bomber jacket", 40, retailer="google")
+
+    try:
+        return await measure(operation, ctx.repeats, ctx.warmup)
+    finally:
+        await scraper.close()
+
+
+@benchmark("parse_http_amazon")
+async def bench_parse_http_amazon(ctx: BenchContext) -> Dict[str, Any]:
+    from scrapper.http_scrapper import HTTPScraper
+
+    scraper = HTTPScraper(
+        save_dir=str(ctx.work_dir / "http_amazon"),
+        base_urls={"amazon": ctx.server.amazon_base_url},
+    )
+
+    async def operation():
+        await scraper.search("black bomber jacket", retailer="amazon", max_results=20)
+
+    try:
+        return await measure(operation, ctx.repeats, ctx.warmup)
+    finally:
+        await scraper.close()
+
+
+def _result_page(ctx: BenchContext, size: int = 100) -> Dict[str, Any]:
+    """Build a /process/ response body with ``size`` ranked results."""
+    rng = np.random.default_rng(0)
+    results = []
+    for index in range(size):
+        product = ctx.server.catalog[index % len(ctx.server.catalog)]
+        url = (
+            f"{ctx.server.google_base_url}product/{product['id']}?srsltid={index:040d}"
+        )
+        results.append(
+            {
+                "name": product["name"],
+                "price": "\u20b91,990",
+                "product_url": url,
+                "image_url": ctx.server.image_url(product["id"]),
+                "rating": "4.4",
+                "text_score": float(rng.random()),
+                "local_image_path": f"fetched_images/{index:032x}.jpg",
+                "offers": [{"name": product["name"], "product_url": url}],
+                "cosine_similarity": float(rng.random()),
+                "score": float(rng.random()),
+                "thumbnail_url": f"/thumbnails/{index:032x}.webp",
+            }
+        )
+    return {"description": "Man Solid black Bomber jacket", "results": results}
+
+
+@benchmark("serialize_json_response")
+async def bench_serialize_json_response(ctx: BenchContext) -> Dict[str, Any]:
+    """Baseline: the stdlib-based JSONResponse, uncompressed."""
+    from fastapi.responses import JSONResponse
+
+    data = _result_page(ctx)
+
+    async def operation():
+        JSONResponse(content={"success": True, "data": data})
+
+    body = JSONResponse(content={"success": True, "data": data}).body
+    return {**await measure(operation, ctx.repeats, ctx.warmup), "bytes": len(body)}
+
+
+@benchmark("serialize_compact_response")
+async def bench_serialize_compact_response(ctx: BenchContext) -> Dict[str, Any]:
+    """orjson with rounded scores; bytes with gzip and with a field subset too."""
+    from utils.api_responses import ResponseEncoder
+
+    encoder = ResponseEncoder()
+    data = _result_page(ctx)
+    fields = ["name", "price", "product_url", "score", "thumbnail_url"]
+
+    async def operation():
+        encoder.encode(data)
+
+    async def compressed():
+        encoder.encode(data, accept_encoding="gzip")
+
+    result = await measure(operation, ctx.repeats, ctx.warmup)
+    gzip_result = await measure(compressed, ctx.repeats, ctx.warmup)
+    return {
+        **result,
+        "gzip_median": gzip_result["median"],
+        "bytes": len(encoder.encode(data).body),
+        "gzip_bytes": len(encoder.encode(data, accept_encoding="gzip").body),
+        "fields_gzip_bytes": len(
+            encoder.encode(data, accept_encoding="gzip", fields=fields).body
+        ),
+    }
+
+
+@benchmark("describe_fake_openai")
+async def bench_describe(ctx: BenchContext) -> Dict[str, Any]:
+    from services.image_description import ImageDescriptionGenerator
+
+    generator = ImageDescriptionGenerator(
+        api_key="benchmark", base_url=ctx.server.openai_base_url
+    )
+    path = ctx.fixture_images(1)[0]
+
+    async def operation():
+        await generator.generate_description(str(path), "upper", "jacket")
+
+    return await measure(operation, ctx.repeats, ctx.warmup)
+
+
+@benchmark("describe_stream_fake_openai")
+async def bench_describe_stream(ctx: BenchContext) -> Dict[str, Any]:
+    """Time the streamed description and when its leading attributes arrive."""
+    from services.image_description import ImageDescriptionGenerator
+
+    generator = ImageDescriptionGenerator(
+        api_key="benchmark", base_url=ctx.server.openai_base_url
+    )
+    path = ctx.fixture_images(1)[0]
+    leading: List[float] = []
+
+    async def operation():
+        start = time.perf_counter()
+        await generator.stream_description(
+            str(path),
+            "upper",
+            "jacket",
+            on_leading_attributes=lambda _: leading.append(time.perf_counter() - start),
+        )
+
+    result = await measure(operation, ctx.repeats, ctx.warmup)
+    timed = sorted(leading[ctx.warmup :])
+    # The stand-in may never produce the leading attributes.
+    median = timed[len(timed) // 2] if timed else None
+    return {**result, "leading_attributes_median": median}
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except Exception:
+        return None
+
+
+async def run_benchmarks(names: List[str], repeats: int, warmup: int) -> Dict[str, Any]:
+    """Run the selected benchmarks against a fresh local stand-in.
+
+    Args:
+        names (List[str]): Benchmark names to run.
+        repeats (int): Timed runs per benchmark.
+        warmup (int): Untimed runs per benchmark.
+
+    Returns:
+        Dict[str, Any]: Run metadata and per-benchmark results.
+    """
+    results: Dict[str, Any] = {}
+    server = StubServer().start_in_thread()
+    try:
+        with tempfile.TemporaryDirectory(prefix="stylefinder-bench-") as work_dir:
+            ctx = BenchContext(server, Path(work_dir), repeats, warmup)
+            for name in names:
+                print(f"running {name} ...", file=sys.stderr, flush=True)
+                try:
+                    results[name] = await BENCHMARKS[name](ctx)
+                except BenchmarkSkipped as e:
+                    results[name] = {"skipped": str(e)}
+                except ImportError as e:
+                    results[name] = {"skipped": f"missing dependency: {e}"}
+    finally:
+        server.stop_thread()
+
+    return {
+        "meta": {
+            "commit": _git_commit(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+        },
+        "benchmarks": results,
+    }
+
+
+def compare_results(
+    current: Dict[str, Any], baseline: Dict[str, Any], thresholds: Dict[str, Any]
+) -> List[Dict[str, Any]]:
+    """Compare median timings against a baseline run.
+
+    A benchmark regresses when its median exceeds the baseline median by more
+    than its allowed ratio: the first matching glob in ``thresholds["benchmarks"]``,
+    otherwise ``thresholds["default"]``.
+
+    Args:
+        current (Dict[str, Any]): Results of this run.
+        baseline (Dict[str, Any]): Results of the reference run.
+        thresholds (Dict[str, Any]): Allowed regression ratios.
+
+    Returns:
+        List[Dict[str, Any]]: One row per benchmark present in both runs.
+    """
+    rows = []
+    for name, result in current["benchmarks"].items():
+        reference = baseline["benchmarks"].get(name)
+        if not reference or "median" not in result or "median" not in reference:
+            continue
+        allowed = thresholds.get("default", 0.15)
+        for pattern, ratio in thresholds.get("benchmarks", {}).items():
+            if fnmatch.fnmatch(name, pattern):
+                allowed = ratio
+                break
+        change = result["median"] / reference["median"] - 1.0
+        rows.append(
+            {
+                "name": name,
+                "baseline": reference["median"],
+                "current": result["median"],
+                "change": change,
+                "allowed": allowed,
+                "regressed": change > allowed,
+            }
+        )
+    return rows
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run the offline benchmark suite.")
+    parser.add_argument("--output", default="bench_results.json")
+    parser.add_argument("--only", help="Comma-separated benchmark names or globs.")
+    parser.add_argument("--repeats", type=int, default=10)
+    parser.add_argument("--warmup", type=int, default=2)
+    parser.add_argument("--compare", help="Baseline results JSON to compare against.")
+    parser.add_argument("--thresholds", default=str(THRESHOLDS_FILE))
+    parser.add_argument("--list", action="store_true", help="List benchmarks and exit.")
+    args = parser.parse_args()
+
+    if args.list:
+        print("\n".join(BENCHMARKS))
+        return
+
+    names = list(BENCHMARKS)
+    if args.only:
+        patterns = [pattern.strip() for pattern in args.only.split(",")]
+        names = [
+            name
+            for name in names
+            if any(fnmatch.fnmatch(name, pattern) for pattern in patterns)
+        ]
+
+    results = asyncio.run(run_benchmarks(names, args.repeats, args.warmup))
+    with open(args.output, "w", encoding="utf-8") as file:
+        json.dump(results, file, indent=2)
+
+    for name, result in results["benchmarks"].items():
+        if "skipped" in result:
+            print(f"{name:40s} skipped ({result['skipped']})")
+        elif "median" not in result:
+            # Accuracy checks report their own metrics rather than timings.
+            metrics = ", ".join(
+                f"{key} {value:.4g}" if isinstance(value, float) else f"{key} {value}"
+                for key, value in result.items()
+            )
+            print(f"{name:40s} {metrics}")
+        else:
+            print(
+                f"{name:40s} median {result['median'] * 1000:9.2f} ms"
+                f"  p95 {result['p95'] * 1000:9.2f} ms"
+            )
+
+    regressed = False
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as file:
+            baseline = json.load(file)
+        with open(args.thresholds, encoding="utf-8") as file:
+            thresholds = json.load(file)
+        rows = compare_results(results, baseline, thresholds)
+        print()
+        for row in rows:
+            status = "REGRESSED" if row["regressed"] else "ok"
+            print(
+                f"{row['name']:40s} {row['change'] * 100:+7.1f}%"
+                f" (allowed +{row['allowed'] * 100:.0f}%) {status}"
+            )
+        regressed = any(row["regressed"] for row in rows)
+
+    # Accuracy checks report "ok": False instead of raising.
+    failed = [
+        name
+        for name, result in results["benchmarks"].items()
+        if result.get("ok") is False
+    ]
+    if failed:
+        print(f"\nFAILED: {', '.join(failed)}")
+    if regressed or failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,470 @@
+import argparse
+import asyncio
+import html
+import io
+import json
+import random
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import quote_plus
+
+from aiohttp import web
+from PIL import Image, ImageDraw
+
+# Canned GPT-4o answer, in the comma-separated format the production prompt asks for.
+FAKE_DESCRIPTION = (
+    "Bomber jacket, Man, Solid black, Relaxed fit, 100% nylon, Smooth, Zippered, "
+    "Ribbed collar, Long sleeves, Two zippered pockets, Ribbed cuffs and embroidered "
+    "logo, Waist-length, Fully lined, Small 'Nike' logo, Casual wear"
+)
+
+COLOURS = {
+    "black": (20, 20, 24),
+    "navy blue": (25, 35, 80),
+    "olive green": (85, 95, 45),
+    "red": (170, 30, 35),
+    "beige": (215, 195, 160),
+    "white": (235, 235, 235),
+    "grey": (128, 128, 128),
+    "brown": (110, 70, 40),
+}
+GARMENTS = [
+    "bomber jacket",
+    "puffer jacket",
+    "denim jacket",
+    "hoodie",
+    "t-shirt",
+    "halter dress",
+    "chinos",
+    "cargo pants",
+]
+GENDERS = ["Men's", "Women's", "Unisex"]
+
+GOOGLE_RESULTS = 40
+AMAZON_RESULTS = 20
+IMAGE_LAST_MODIFIED = "Mon, 06 Jan 2025 00:00:00 GMT"
+
+
+def build_catalog(size: int = 60, seed: int = 7) -> List[Dict[str, str]]:
+    """Build a deterministic fake product catalog.
+
+    Args:
+        size (int): Number of products. Defaults to 60.
+        seed (int): Random seed. Defaults to 7.
+
+    Returns:
+        List[Dict[str, str]]: Products with id, name, colour, garment, price and rating.
+    """
+    rng = random.Random(seed)
+    catalog = []
+    for index in range(size):
+        colour = rng.choice(list(COLOURS))
+        garment = rng.choice(GARMENTS)
+        gender = rng.choice(GENDERS)
+        catalog.append(
+            {
+                "id": f"P{index:04d}",
+                "name": f"{gender} {colour.title()} {garment.title()}",
+                "colour": colour,
+                "garment": garment,
+                "price": f"{rng.randint(499, 9999):,}",
+                "rating": f"{rng.uniform(3.0, 5.0):.1f} out of 5 stars",
+            }
+        )
+    return catalog
+
+
+def render_product_image(product: Dict[str, str], size: int = 800) -> bytes:
+    """Draw a simple garment-like JPEG for a catalog product.
+
+    Args:
+        product (Dict[str, str]): Catalog entry.
+        size (int): Image side length in pixels. Defaults to 800.
+
+    Returns:
+        bytes: JPEG bytes.
+    """
+    rng = random.Random(product["id"])
+    image = Image.new("RGB", (size, size), (245, 245, 245))
+    draw = ImageDraw.Draw(image)
+    colour = COLOURS[product["colour"]]
+    margin = size // 8
+    if product["garment"] in ("chinos", "cargo pants"):
+        draw.polygon(
+            [
+                (margin * 2, margin),
+                (size - margin * 2, margin),
+                (size - margin, size - margin),
+                (size // 2 + margin // 2, size - margin),
+                (size // 2, size // 3),
+                (size // 2 - margin // 2, size - margin),
+                (margin, size - margin),
+            ],
+            fill=colour,
+        )
+    elif product["garment"] == "halter dress":
+        draw.polygon(
+            [
+                (size // 2, margin),
+                (size - margin * 2, size // 3),
+                (size - margin, size - margin),
+                (margin, size - margin),
+                (margin * 2, size // 3),
+            ],
+            fill=colour,
+        )
+    else:
+        draw.polygon(
+            [
+                (margin * 2, margin),
+                (size - margin * 2, margin),
+                (size - margin // 2, size // 2),
+                (size - margin * 2, size // 2),
+                (size - margin * 2, size - margin),
+                (margin * 2, size - margin),
+                (margin * 2, size // 2),
+                (margin // 2, size // 2),
+            ],
+            fill=colour,
+        )
+    for _ in range(12):
+        x, y = rng.randrange(size), rng.randrange(size)
+        shade = tuple(min(255, channel + rng.randint(-25, 25)) for channel in colour)
+        draw.ellipse((x, y, x + size // 20, y + size // 20), fill=shade)
+    buffer = io.BytesIO()
+    image.save(buffer, format="JPEG", quality=90)
+    return buffer.getvalue()
+
+
+def _google_card(product: Dict[str, str], image_url: str) -> str:
+    name = html.escape(product["name"])
+    return f"""
+<div class="sh-dgr__grid-result">
+  <a href="/google/product/{product['id']}">
+    <div class="ArOc1c"><img src="{image_url}" alt="{name}"></div>
+    <h3>{name}</h3>
+  </a>
+  <span class="a8Pemb">&#8377;{product['price']}</span>
+  <span class="Rsc7Yb">{product['rating'][:3]}</span>
+</div>"""
+
+
+def _amazon_card(product: Dict[str, str], image_url: str) -> str:
+    name = html.escape(product["name"])
+    return f"""
+<div data-component-type="s-search-result" data-asin="{product['id']}">
+  <a class="a-link-normal" href="/amazon/dp/{product['id']}">
+    <img class="s-image" src="{image_url}" alt="{name}">
+  </a>
+  <h2 class="a-size-base-plus"><span>{name}</span></h2>
+  <span class="a-price"><span class="a-price-symbol">&#8377;</span><span class="a-price-whole">{product['price']}</span></span>
+  <i class="a-icon a-icon-star"><span class="a-icon-alt">{product['rating']}</span></i>
+</div>"""
+
+
+def _page(title: str, body: str) -> str:
+    return f"<!doctype html><html><head><title>{html.escape(title)}</title></head><body>{body}</body></html>"
+
+
+class StubServer:
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        openai_latency: float = 0.0,
+        page_latency: float = 0.0,
+        image_latency: float = 0.0,
+        image_size: int = 800,
+    ):
+        """Local HTTP stand-in for Google Shopping, Amazon and the OpenAI API.
+
+        Serves search home pages and result pages with the markup the scrapers
+        select on, deterministic product images, and a fake chat completions
+        endpoint. All three base URLs are exposed as properties once started.
+
+        Args:
+            host (str): Interface to bind. Defaults to "127.0.0.1".
+            port (int): Port to bind; 0 picks a free port. Defaults to 0.
+            openai_latency (float): Simulated completion latency in seconds.
+            page_latency (float): Simulated search page latency in seconds.
+            image_latency (float): Simulated image download latency in seconds.
+            image_size (int): Side length of the served product images.
+        """
+        self.host = host
+        self.port = port
+        self.openai_latency = openai_latency
+        self.page_latency = page_latency
+        self.image_latency = image_latency
+        self.catalog = build_catalog()
+        self._images = {
+            product["id"]: render_product_image(product, image_size)
+            for product in self.catalog
+        }
+        self._runner: Optional[web.AppRunner] = None
+        self.requests: Dict[str, int] = {}
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    @property
+    def google_base_url(self) -> str:
+        return f"{self.base_url}/google/"
+
+    @property
+    def amazon_base_url(self) -> str:
+        return f"{self.base_url}/amazon/"
+
+    @property
+    def openai_base_url(self) -> str:
+        return f"{self.base_url}/openai/v1"
+
+    def image_url(self, product_id: str, variant: str = "") -> str:
+        """URL of a product image; ``variant`` mimics CDN-specific query strings."""
+        url = f"{self.base_url}/images/{product_id}.jpg"
+        return f"{url}?{variant}" if variant else url
+
+    def image_bytes(self, product_id: str) -> bytes:
+        return self._images[product_id]
+
+    def build_app(self) -> web.Application:
+        app = web.Application(middlewares=[self._count_requests])
+        app.router.add_get("/google/", self._google_home)
+        app.router.add_get("/google/search", self._google_search)
+        app.router.add_get("/amazon/", self._amazon_home)
+        app.router.add_get("/amazon/s", self._amazon_search)
+        app.router.add_get("/images/{product_id}.jpg", self._image)
+        app.router.add_post("/openai/v1/chat/completions", self._chat_completions)
+        return app
+
+    async def start(self) -> "StubServer":
+        self._runner = web.AppRunner(self.build_app(), access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        await site.start()
+        self.port = self._runner.addresses[0][1]
+        return self
+
+    async def stop(self) -> None:
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def __aenter__(self) -> "StubServer":
+        return await self.start()
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.stop()
+
+    def start_in_thread(self) -> "StubServer":
+        """Serve from a background thread with its own event loop.
+
+        Keeps the stand-in responsive while the code under test blocks its
+        own loop (e.g. synchronous ``requests`` downloads).
+        """
+        self._loop = asyncio.new_event_loop()
+        started = threading.Event()
+
+        def serve() -> None:
+            asyncio.set_event_loop(self._loop)
+            self._loop.run_until_complete(self.start())
+            started.set()
+            self._loop.run_forever()
+            self._loop.run_until_complete(self.stop())
+            self._loop.close()
+
+        self._thread = threading.Thread(target=serve, name="stub-server", daemon=True)
+        self._thread.start()
+        started.wait()
+        return self
+
+    def stop_thread(self) -> None:
+        """Stop a server started with ``start_in_thread``."""
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+
+    @web.middleware
+    async def _count_requests(self, request: web.Request, handler):
+        route = request.match_info.route.resource
+        key = route.canonical if route is not None else request.path
+        self.requests[key] = self.requests.get(key, 0) + 1
+        return await handler(request)
+
+    async def _google_home(self, request: web.Request) -> web.Response:
+        body = '<form action="search" method="get"><input name="q" type="text"></form>'
+        return web.Response(text=_page("Google", body), content_type="text/html")
+
+    async def _google_search(self, request: web.Request) -> web.Response:
+        await asyncio.sleep(self.page_latency)
+        query = request.query.get("q", "")
+        if request.query.get("tbm") != "shop":
+            body = f'<a href="search?q={quote_plus(query)}&amp;tbm=shop">Shopping</a>'
+            return web.Response(text=_page(query, body), content_type="text/html")
+        cards = "".join(
+            _google_card(product, self.image_url(product["id"]))
+            for product in self.catalog[:GOOGLE_RESULTS]
+        )
+        return web.Response(
+            text=_page(query, f'<div id="rso">{cards}</div>'), content_type="text/html"
+        )
+
+    async def _amazon_home(self, request: web.Request) -> web.Response:
+        body = (
+            '<form action="s" method="get">'
+            '<input id="twotabsearchtextbox" name="k" type="text"></form>'
+        )
+        return web.Response(text=_page("Amazon", body), content_type="text/html")
+
+    async def _amazon_search(self, request: web.Request) -> web.Response:
+        await asyncio.sleep(self.page_latency)
+        # Amazon overlaps with Google on part of the catalog and serves the
+        # shared images through a different URL, like a second CDN would.
+        start = GOOGLE_RESULTS - AMAZON_RESULTS // 2
+        cards = "".join(
+            _amazon_card(product, self.image_url(product["id"], variant="cdn=amz"))
+            for product in self.catalog[start : start + AMAZON_RESULTS]
+        )
+        return web.Response(
+            text=_page(request.query.get("k", ""), cards), content_type="text/html"
+        )
+
+    async def _image(self, request: web.Request) -> web.Response:
+        await asyncio.sleep(self.image_latency)
+        product_id = request.match_info["product_id"]
+        data = self._images.get(product_id)
+        if data is None:
+            raise web.HTTPNotFound()
+        # Validators like a CDN's, so conditional requests can be exercised.
+        headers = {"ETag": f'"{product_id}"', "Last-Modified": IMAGE_LAST_MODIFIED}
+        if request.headers.get("If-None-Match") == headers["ETag"]:
+            return web.Response(status=304, headers=headers)
+        return web.Response(body=data, content_type="image/jpeg", headers=headers)
+
+    @staticmethod
+    def _completion_content(payload: Dict) -> Tuple[str, str]:
+        """Return the answer to a completion request and its finish reason.
+
+        A ``json_schema`` response format is answered with a JSON object whose
+        properties take the description values by position; ``max_tokens``
+        truncates the answer (one word per token).
+        """
+        content = FAKE_DESCRIPTION
+        response_format = payload.get("response_format") or {}
+        if response_format.get("type") == "json_schema":
+            properties = response_format["json_schema"]["schema"]["properties"]
+            content = json.dumps(dict(zip(properties, FAKE_DESCRIPTION.split(", "))))
+        words = content.split(" ")
+        max_tokens = payload.get("max_tokens")
+        if max_tokens and len(words) > max_tokens:
+            return " ".join(words[:max_tokens]), "length"
+        return content, "stop"
+
+    async def _chat_completions(self, request: web.Request) -> web.StreamResponse:
+        payload = await request.json()
+        if payload.get("stream"):
+            return await self._stream_chat_completion(request, payload)
+        await asyncio.sleep(self.openai_latency)
+        content, finish_reason = self._completion_content(payload)
+        completion = {
+            "id": f"chatcmpl-stub-{int(time.time() * 1000)}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": payload.get("model", "gpt-4o"),
+            "choices": [
+                {
+                    "index": 0,
+                    "message": {"role": "assistant", "content": content},
+                    "finish_reason": finish_reason,
+                }
+            ],
+            "usage": {
+                "prompt_tokens": 1100,
+                "completion_tokens": len(content.split()),
+                "total_tokens": 1100 + len(content.split()),
+            },
+        }
+        return web.json_response(completion)
+
+    async def _stream_chat_completion(
+        self, request: web.Request, payload: Dict
+    ) -> web.StreamResponse:
+        # A fifth of the latency goes to the first token, the rest is spread
+        # over the remaining tokens, roughly like a real streamed completion.
+        content, finish_reason = self._completion_content(payload)
+        tokens = [word + " " for word in content.split(" ")]
+        tokens[-1] = tokens[-1].rstrip()
+        per_token = 0.8 * self.openai_latency / len(tokens)
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+        await response.prepare(request)
+        await asyncio.sleep(0.2 * self.openai_latency)
+        base = {
+            "id": f"chatcmpl-stub-{int(time.time() * 1000)}",
+            "object": "chat.completion.chunk",
+            "created": int(time.time()),
+            "model": payload.get("model", "gpt-4o"),
+        }
+        for index, token in enumerate(tokens):
+            if index:
+                await asyncio.sleep(per_token)
+            chunk = {
+                **base,
+                "choices": [
+                    {"index": 0, "delta": {"content": token}, "finish_reason": None}
+                ],
+            }
+            await response.write(f"data: {json.dumps(chunk)}\n\n".encode())
+        done = {
+            **base,
+            "choices": [{"index": 0, "delta": {}, "finish_reason": finish_reason}],
+        }
+        await response.write(f"data: {json.dumps(done)}\n\ndata: [DONE]\n\n".encode())
+        await response.write_eof()
+        return response
+
+
+async def _serve_forever(server: StubServer) -> None:
+    await server.start()
+    print(
+        json.dumps(
+            {
+                "GOOGLE_BASE_URL": server.google_base_url,
+                "AMAZON_BASE_URL": server.amazon_base_url,
+                "OPENAI_BASE_URL": server.openai_base_url,
+            },
+            indent=2,
+        ),
+        flush=True,
+    )
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await server.stop()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Run the local retailer and OpenAI stand-ins."
+    )
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--openai-latency", type=float, default=0.0)
+    parser.add_argument("--page-latency", type=float, default=0.0)
+    parser.add_argument("--image-latency", type=float, default=0.0)
+    args = parser.parse_args()
+
+    server = StubServer(
+        host=args.host,
+        port=args.port,
+        openai_latency=args.openai_latency,
+        page_latency=args.page_latency,
+        image_latency=args.image_latency,
+    )
+    try:
+        asyncio.run(_serve_forever(server))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,5 @@
 import aiohttp
+import asyncio
 from selenium import webdriver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.common.keys import Keys
@@ -7,24 +8,43 @@ from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.chrome.service import Service
 from pathlib import Path
-import json
+import time
 import logging
-from typing import List, Dict, Optional
+from scrapper.errors import EmptyListingError
+from utils.download_cache import DownloadCache
+from utils.result_log import ResultLog
+from utils.metrics import (
+    BROWSERS_ACTIVE,
+    IMAGE_DOWNLOAD_DURATION,
+    IMAGE_DOWNLOADS,
+    record_stage,
+)
+from typing import Callable, List, Dict, Optional
 from uuid import uuid4
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
 class AsyncAmazonScraper:
-    def __init__(self, save_dir: str):
+    def __init__(
+        self,
+        save_dir: str,
+        base_url: str = "https://www.amazon.in/",
+        download_cache: Optional[DownloadCache] = None,
+        result_log: Optional[ResultLog] = None,
+    ):
         """Initialize the Amazon scraper.
 
         Args:
             save_dir (str): Directory to save the scraped results.
+            base_url (str): Store home page. Defaults to "https://www.amazon.in/".
+            download_cache (Optional[DownloadCache]): Shared image download cache.
+            result_log (Optional[ResultLog]): Log the scraped products are appended to.
         """
         self.save_dir = Path(save_dir)
+        self.base_url = base_url
+        self.download_cache = download_cache
+        self.result_log = result_log
         self.save_dir.mkdir(exist_ok=True)
         self.image_dir = self.save_dir / "images"
         self.image_dir.mkdir(exist_ok=True)
@@ -54,8 +74,9 @@ class AsyncAmazonScraper:
             List[Dict]: List of dictionaries containing product information.
         """
         driver = self._init_driver()
+        BROWSERS_ACTIVE.inc(source="amazon")
         try:
-            driver.get("https://www.amazon.in/")
+            driver.get(self.base_url)
 
             # Search for the term
             search_box = WebDriverWait(driver, 20).until(
@@ -127,7 +148,7 @@ class AsyncAmazonScraper:
                         else None
                     )
                     product_url = (
-                        f"https://amazon.in{relative_url}"
+                        f"{self.base_url.rstrip('/')}{relative_url}"
                         if relative_url and not relative_url.startswith("http")
                         else relative_url
                     )
@@ -142,11 +163,12 @@ class AsyncAmazonScraper:
                         }
                     )
                 except Exception as e:
-                    logger.warning(f"Error extracting product {index + 1}: {e}")
+                    logger.warning("Error extracting product %s: %s", index + 1, e)
 
             return products
         finally:
             driver.quit()
+            BROWSERS_ACTIVE.dec(source="amazon")
 
     async def _fetch_image(
         self, session: aiohttp.ClientSession, url: str, save_path: Path
@@ -161,63 +183,93 @@ class AsyncAmazonScraper:
         Returns:
             Optional[str]: Local path of the saved image or None if failed.
         """
+        start = time.perf_counter()
+        outcome = "error"
         try:
+            if self.download_cache is not None:
+                outcome = await self.download_cache.fetch(session, url, save_path)
+                if outcome == "http_error":
+                    logger.warning("Failed to fetch image: %s", url)
+                    return None
+                logger.debug("Image saved: %s (%s)", save_path, outcome)
+                return str(save_path)
             async with session.get(url) as response:
                 if response.status == 200:
                     with open(save_path, "wb") as file:
                         file.write(await response.read())
-                    logger.info(f"Image saved: {save_path}")
+                    outcome = "ok"
+                    logger.debug("Image saved: %s", save_path)
                     return str(save_path)
                 else:
-                    logger.warning(f"Failed to fetch image: {url}")
+                    outcome = "http_error"
+                    logger.warning("Failed to fetch image: %s", url)
                     return None
         except Exception as e:
-            logger.error(f"Error fetching image {url}: {e}")
+            logger.error("Error fetching image %s: %s", url, e)
             return None
+        finally:
+            elapsed = time.perf_counter() - start
+            IMAGE_DOWNLOAD_DURATION.observe(elapsed, source="amazon")
+            IMAGE_DOWNLOADS.inc(source="amazon", outcome=outcome)
+            record_stage("image_download", elapsed)
 
     async def scrape_and_save(
-        self, search_term: str, max_results: int = 20
+        self,
+        search_term: str,
+        max_results: int = 20,
+        product_filter: Optional[
+            Callable[[List[Dict[str, Optional[str]]]], List[Dict[str, Optional[str]]]]
+        ] = None,
+        on_listing: Optional[Callable[[List[Dict[str, Optional[str]]]], None]] = None,
+        save_dir: Optional[Path] = None,
     ) -> List[Dict[str, Optional[str]]]:
         """Scrape Amazon search results for a given search term and save the results.
 
         Args:
             search_term (str): The search term or query.
             max_results (int, optional): Maximum number of results to scrape. Defaults to 20.
+            product_filter (Optional[Callable], optional): Applied to the listing before
+                any image is downloaded; products it drops are not returned.
+            on_listing (Optional[Callable], optional): Called with the unfiltered
+                listing as soon as it is parsed, before filtering and downloads.
+            save_dir (Optional[Path], optional): Directory for this search's
+                images, e.g. one private to the request. Defaults to the
+                scraper's own.
+
+        Raises:
+            EmptyListingError: If the search page has no products.
+            RuntimeError: If scraping fails.
 
         Returns:
             List[Dict[str, Optional[str]]]: List of dictionaries containing product information.
         """
         try:
-            products = self.scrape_amazon(search_term, max_results)
+            # Selenium is blocking; keep the browser session off the event loop.
+            products = await asyncio.to_thread(
+                self.scrape_amazon, search_term, max_results
+            )
+            if on_listing is not None:
+                on_listing(products)
+            if not products:
+                raise EmptyListingError(
+                    f"Amazon returned no products for '{search_term}'."
+                )
+            if product_filter is not None:
+                products = product_filter(products)
+            image_dir = Path(save_dir) if save_dir is not None else self.image_dir
             async with aiohttp.ClientSession() as session:
                 for product in products:
                     if product["image_url"]:
-                        save_path = self.image_dir / f"{uuid4()}.jpg"
+                        save_path = image_dir / f"{uuid4()}.jpg"
                         product["local_image_path"] = await self._fetch_image(
                             session, product["image_url"], save_path
                         )
 
-            filename = f"{search_term}_results.json"
-            self._save_results(products, filename)
+            if self.result_log is not None:
+                self.result_log.append("amazon", search_term, products)
             return products
+        except EmptyListingError:
+            raise
         except Exception as e:
-            logger.error(f"Error in scrape_and_save: {e}")
-            return []
-
-    def _save_results(
-        self, results: List[Dict[str, Optional[str]]], filename: str
-    ) -> None:
-        """Save the scraped results to a JSON file
-
-        Args:
-            results (List[Dict[str, Optional[str]]]): List of dictionaries containing product information.
-            filename (str): Name of the file to save the results.
-        """
-
-        file_path = self.save_dir / filename
-        try:
-            with open(file_path, "w", encoding="utf-8") as file:
-                json.dump(results, file, indent=4)
-            logger.info(f"Results saved to {file_path}")
-        except Exception as e:
-            logger.error(f"Failed to save results: {e}")
+            logger.error("Error in scrape_and_save: %s", e)
+            raise RuntimeError(f"Error scraping Amazon: {e}")
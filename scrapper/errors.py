@@ -0,0 +1,7 @@
+class EmptyListingError(RuntimeError):
+    """Raised when a search page yields no products at all.
+
+    A retailer rarely has nothing for a garment search; an empty listing
+    usually means changed markup, a CAPTCHA or robot check, or a throttled
+    page served with status 200.
+    """
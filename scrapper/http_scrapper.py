@@ -0,0 +1,420 @@
+import aiohttp
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+from urllib.parse import quote_plus, urljoin
+from uuid import uuid4
+
+import soupsieve as sv
+from bs4 import BeautifulSoup
+
+from scrapper.errors import EmptyListingError
+from utils.download_cache import DownloadCache
+from utils.result_log import ResultLog
+from utils.metrics import (
+    IMAGE_DOWNLOAD_DURATION,
+    IMAGE_DOWNLOADS,
+    REGISTRY,
+    record_stage,
+)
+
+logger = logging.getLogger(__name__)
+
+SCRAPER_FALLBACKS = REGISTRY.counter(
+    "stylefinder_scraper_fallbacks_total",
+    "Searches handed to the Selenium scraper because the page needed JavaScript.",
+    labelnames=("retailer",),
+)
+
+DEFAULT_HEADERS = {
+    "User-Agent": (
+        "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 "
+        "(KHTML, like Gecko) Chrome/131.0 Safari/537.36"
+    ),
+    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+    "Accept-Language": "en-IN,en;q=0.9",
+}
+
+# Phrases found on interstitials that only render their content with JavaScript
+# or stand in front of it with a captcha. A bare <noscript> is no signal: most
+# ordinary result pages carry one for tracking pixels.
+JAVASCRIPT_MARKERS = (
+    "enablejs",
+    "please enable javascript",
+    "enable javascript to continue",
+    "turn on javascript",
+    "please click here if you are not redirected",
+    'action="/sorry/',
+    "/errors/validatecaptcha",
+    "g-recaptcha",
+    'id="captcha-form"',
+)
+
+
+@dataclass(frozen=True)
+class RetailerConfig:
+    name: str
+    search_path: str
+    parse: Callable[[BeautifulSoup, str, int], List[Dict[str, Optional[str]]]]
+
+
+# Selectors are compiled once and shared by all parser threads.
+GOOGLE_CARD = sv.compile(".sh-dgr__grid-result")
+GOOGLE_NAME = sv.compile("h3")
+GOOGLE_PRICE = sv.compile(".a8Pemb")
+GOOGLE_LINK = sv.compile("a")
+GOOGLE_IMAGE = sv.compile(".ArOc1c img")
+GOOGLE_RATING = sv.compile(".Rsc7Yb")
+
+AMAZON_CARD = sv.compile("[data-component-type='s-search-result']")
+AMAZON_NAME = sv.compile("h2.a-size-base-plus span")
+AMAZON_PRICE_SYMBOL = sv.compile("span.a-price-symbol")
+AMAZON_PRICE_WHOLE = sv.compile("span.a-price-whole")
+AMAZON_IMAGE = sv.compile("img.s-image")
+AMAZON_RATING = sv.compile(".a-icon-alt")
+AMAZON_LINK = sv.compile("a.a-link-normal")
+
+
+def _text(pattern: sv.SoupSieve, element) -> Optional[str]:
+    match = pattern.select_one(element)
+    return match.get_text(" ", strip=True) if match is not None else None
+
+
+def _image_src(match) -> Optional[str]:
+    if match is None:
+        return None
+    return match.get("src") or match.get("data-src")
+
+
+def parse_google_shopping(
+    soup: BeautifulSoup, base_url: str, max_results: int
+) -> List[Dict[str, Optional[str]]]:
+    """Extract product cards from a Google Shopping results page.
+
+    Mirrors ``GoogleShoppingScraper.scrape_google_shopping``: cards without a
+    name, price, link or image are skipped.
+
+    Args:
+        soup (BeautifulSoup): Parsed results page.
+        base_url (str): URL the page was fetched from, to resolve relative links.
+        max_results (int): Maximum number of products to return.
+
+    Returns:
+        List[Dict[str, Optional[str]]]: Product dictionaries.
+    """
+    products = []
+    for index, card in enumerate(GOOGLE_CARD.select(soup, limit=max_results)):
+        name = _text(GOOGLE_NAME, card)
+        price = _text(GOOGLE_PRICE, card)
+        link = GOOGLE_LINK.select_one(card)
+        image_url = _image_src(GOOGLE_IMAGE.select_one(card))
+        if not (name and price and link is not None and link.get("href") and image_url):
+            logger.warning("Error extracting product %s: missing field", index + 1)
+            continue
+        products.append(
+            {
+                "name": name,
+                "price": price,
+                "product_url": urljoin(base_url, link["href"]),
+                "image_url": urljoin(base_url, image_url),
+                "rating": _text(GOOGLE_RATING, card) or "No rating available",
+            }
+        )
+    return products
+
+
+def parse_amazon(
+    soup: BeautifulSoup, base_url: str, max_results: int
+) -> List[Dict[str, Optional[str]]]:
+    """Extract product cards from an Amazon search results page.
+
+    Mirrors ``AsyncAmazonScraper.scrape_amazon``, including its placeholder
+    values for missing fields.
+
+    Args:
+        soup (BeautifulSoup): Parsed results page.
+        base_url (str): URL the page was fetched from, to resolve relative links.
+        max_results (int): Maximum number of products to return.
+
+    Returns:
+        List[Dict[str, Optional[str]]]: Product dictionaries.
+    """
+    products = []
+    for card in AMAZON_CARD.select(soup, limit=max_results):
+        price_whole = _text(AMAZON_PRICE_WHOLE, card) or ""
+        price_symbol = _text(AMAZON_PRICE_SYMBOL, card) or ""
+        image_url = _image_src(AMAZON_IMAGE.select_one(card))
+        link = AMAZON_LINK.select_one(card)
+        products.append(
+            {
+                "name": _text(AMAZON_NAME, card) or "No name available",
+                "price": f"{price_symbol}{price_whole}"
+                if price_whole
+                else "No price available",
+                "image_url": urljoin(base_url, image_url) if image_url else None,
+                "rating": _text(AMAZON_RATING, card) or "No rating available",
+                "product_url": urljoin(base_url, link["href"])
+                if link is not None and link.get("href")
+                else None,
+            }
+        )
+    return products
+
+
+RETAILERS: Dict[str, RetailerConfig] = {
+    "google": RetailerConfig(
+        name="google",
+        search_path="search?q={query}&tbm=shop&hl=en",
+        parse=parse_google_shopping,
+    ),
+    "amazon": RetailerConfig(
+        name="amazon",
+        search_path="s?k={query}",
+        parse=parse_amazon,
+    ),
+}
+
+
+def needs_javascript(html: str) -> bool:
+    """Guess whether a page without product cards only renders with JavaScript.
+
+    Args:
+        html (str): Raw page markup.
+
+    Returns:
+        bool: True if the page looks like a JavaScript interstitial.
+    """
+    lowered = html.lower()
+    return any(marker in lowered for marker in JAVASCRIPT_MARKERS)
+
+
+class HTTPScraper:
+    def __init__(
+        self,
+        save_dir: str,
+        base_urls: Optional[Dict[str, str]] = None,
+        fallbacks: Optional[Dict[str, object]] = None,
+        max_connections: int = 32,
+        timeout: float = 15.0,
+        download_cache: Optional[DownloadCache] = None,
+        result_log: Optional[ResultLog] = None,
+    ):
+        """Initialize the browserless scraper.
+
+        Search pages are fetched over a pooled aiohttp session and parsed with
+        precompiled selectors on a worker thread. When a page needs JavaScript
+        the search is handed to the retailer's Selenium scraper.
+
+        Args:
+            save_dir (str): Directory to save the scraped results and images.
+            base_urls (Optional[Dict[str, str]]): Site root per retailer
+                ("google", "amazon"). Defaults to the public sites.
+            fallbacks (Optional[Dict[str, object]]): Selenium scraper per retailer,
+                used when the page needs JavaScript.
+            max_connections (int): Connection pool size. Defaults to 32.
+            timeout (float): Total timeout per HTTP request in seconds. Defaults to 15.
+            download_cache (Optional[DownloadCache]): Shared image download cache.
+            result_log (Optional[ResultLog]): Log the scraped products are appended to.
+        """
+        self.save_dir = Path(save_dir)
+        self.save_dir.mkdir(exist_ok=True)
+        self.base_urls = {
+            "google": "https://www.google.com/",
+            "amazon": "https://www.amazon.in/",
+            **(base_urls or {}),
+        }
+        self.fallbacks = fallbacks or {}
+        self.max_connections = max_connections
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+        self.download_cache = download_cache
+        self.result_log = result_log
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    async def _get_session(self) -> aiohttp.ClientSession:
+        """Return the shared client session, creating it on first use."""
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.max_connections, ttl_dns_cache=300
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector, headers=DEFAULT_HEADERS, timeout=self.timeout
+            )
+        return self._session
+
+    async def close(self) -> None:
+        """Close the pooled session."""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+
+    async def search(
+        self, search_term: str, retailer: str = "google", max_results: int = 40
+    ) -> Optional[List[Dict[str, Optional[str]]]]:
+        """Fetch and parse one search results page.
+
+        Args:
+            search_term (str): The search term or query.
+            retailer (str): Retailer key, "google" or "amazon". Defaults to "google".
+            max_results (int): Maximum number of products to return. Defaults to 40.
+
+        Returns:
+            Optional[List[Dict[str, Optional[str]]]]: Products, or None if the page
+            needs JavaScript to render its results.
+        """
+        config = RETAILERS[retailer]
+        url = urljoin(
+            self.base_urls[retailer],
+            config.search_path.format(query=quote_plus(search_term)),
+        )
+        session = await self._get_session()
+        start = time.perf_counter()
+        async with session.get(url) as response:
+            response.raise_for_status()
+            html = await response.text()
+            page_url = str(response.url)
+        record_stage(f"fetch_{retailer}", time.perf_counter() - start)
+
+        start = time.perf_counter()
+        products = await asyncio.to_thread(
+            self._parse, config, html, page_url, max_results
+        )
+        record_stage(f"parse_{retailer}", time.perf_counter() - start)
+
+        if not products and needs_javascript(html):
+            return None
+        return products
+
+    @staticmethod
+    def _parse(
+        config: RetailerConfig, html: str, page_url: str, max_results: int
+    ) -> List[Dict[str, Optional[str]]]:
+        return config.parse(BeautifulSoup(html, "html.parser"), page_url, max_results)
+
+    async def _fetch_image(
+        self, url: str, save_path: Path, source: str
+    ) -> Optional[str]:
+        """Fetch an image over the pooled session and save it to a file.
+
+        Args:
+            url (str): URL of the image to fetch.
+            save_path (Path): Path to save the image file.
+            source (str): Retailer key, used as the metrics label.
+
+        Returns:
+            Optional[str]: Path to the saved image file or None if failed.
+        """
+        start = time.perf_counter()
+        outcome = "error"
+        try:
+            session = await self._get_session()
+            if self.download_cache is not None:
+                outcome = await self.download_cache.fetch(session, url, save_path)
+                if outcome == "http_error":
+                    logger.warning("Failed to fetch image: %s", url)
+                    return None
+                logger.debug("Image saved: %s (%s)", save_path, outcome)
+                return str(save_path)
+            async with session.get(url) as response:
+                if response.status == 200:
+                    with open(save_path, "wb") as file:
+                        file.write(await response.read())
+                    outcome = "ok"
+                    logger.debug("Image saved: %s", save_path)
+                    return str(save_path)
+                else:
+                    outcome = "http_error"
+                    logger.warning("Failed to fetch image: %s", url)
+                    return None
+        except Exception as e:
+            logger.error("Error fetching image %s: %s", url, e)
+            return None
+        finally:
+            elapsed = time.perf_counter() - start
+            IMAGE_DOWNLOAD_DURATION.observe(elapsed, source=source)
+            IMAGE_DOWNLOADS.inc(source=source, outcome=outcome)
+            record_stage("image_download", elapsed)
+
+    async def scrape_and_save(
+        self,
+        search_term: str,
+        max_results: int = 40,
+        retailer: str = "google",
+        product_filter: Optional[
+            Callable[[List[Dict[str, Optional[str]]]], List[Dict[str, Optional[str]]]]
+        ] = None,
+        on_listing: Optional[Callable[[List[Dict[str, Optional[str]]]], None]] = None,
+        save_dir: Optional[Path] = None,
+    ) -> List[Dict[str, Optional[str]]]:
+        """Scrape a retailer's search results and download the product images.
+
+        Args:
+            search_term (str): The search term or query.
+            max_results (int, optional): Maximum number of results. Defaults to 40.
+            retailer (str, optional): Retailer key, "google" or "amazon".
+                Defaults to "google".
+            product_filter (Optional[Callable], optional): Applied to the listing
+                before any image is downloaded; products it drops are not returned.
+            on_listing (Optional[Callable], optional): Called with the unfiltered
+                listing as soon as it is parsed, before filtering and downloads.
+            save_dir (Optional[Path], optional): Directory for this search's
+                images, e.g. one private to the request. Defaults to the
+                scraper's own.
+
+        Raises:
+            EmptyListingError: If the search page has no products and does not
+                look like it needs JavaScript (changed markup, a CAPTCHA or a
+                throttled page).
+            RuntimeError: If the search fails and no fallback succeeds.
+
+        Returns:
+            List[Dict[str, Optional[str]]]: Product details with local image paths
+            (or None where the download failed), in the Selenium scrapers' shape.
+        """
+        if retailer not in RETAILERS:
+            raise ValueError(f"Unknown retailer: {retailer}")
+        try:
+            products = await self.search(search_term, retailer, max_results)
+        except Exception as e:
+            logger.error("Error fetching %s results over HTTP: %s", retailer, e)
+            raise RuntimeError(f"Error scraping {retailer}: {e}")
+
+        if products is None:
+            fallback = self.fallbacks.get(retailer)
+            if fallback is None:
+                raise RuntimeError(f"{retailer} results require JavaScript.")
+            logger.info("%s page needs JavaScript, using Selenium.", retailer)
+            SCRAPER_FALLBACKS.inc(retailer=retailer)
+            return await fallback.scrape_and_save(
+                search_term,
+                max_results=max_results,
+                product_filter=product_filter,
+                on_listing=on_listing,
+                save_dir=save_dir,
+            )
+        if on_listing is not None:
+            on_listing(products)
+        if not products:
+            raise EmptyListingError(
+                f"{retailer} returned no products for '{search_term}'."
+            )
+        if product_filter is not None:
+            products = product_filter(products)
+
+        image_dir = Path(save_dir) if save_dir is not None else self.save_dir
+        downloads = [
+            self._fetch_image(
+                product["image_url"], image_dir / f"{uuid4()}.jpg", retailer
+            )
+            for product in products
+            if product["image_url"]
+        ]
+        paths = iter(await asyncio.gather(*downloads))
+        for product in products:
+            if product["image_url"]:
+                product["local_image_path"] = next(paths)
+
+        if self.result_log is not None:
+            self.result_log.append(retailer, search_term, products)
+        return products
@@ -0,0 +1,252 @@
+import asyncio
+import logging
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Set
+
+import numpy as np
+
+from services.image_comparator import ImageComparator
+from services.speculative_search import SearchFunction
+from services.text_prefilter import parse_description
+from utils.metrics import REGISTRY, track_stage
+
+logger = logging.getLogger(__name__)
+
+BATCH_QUERIES = REGISTRY.counter(
+    "stylefinder_batch_queries_total",
+    "Images submitted to the batch endpoint and retailer searches run for them.",
+    labelnames=("stage",),
+)
+
+
+@dataclass
+class BatchQuery:
+    file_path: str
+    crop: np.ndarray
+    garment_type: str
+    garment_layer: Optional[str] = None
+    # Normalized JPEG sent for description instead of reading ``file_path``.
+    image_data: Optional[bytes] = None
+    # Description prompt version; None uses the generator's configured one.
+    prompt_version: Optional[str] = None
+
+
+@dataclass
+class BatchResult:
+    description: Optional[str] = None
+    attributes: Dict[str, str] = field(default_factory=dict)
+    # Ranked items with ``cosine_similarity`` and their embedding under
+    # ``vectors``; empty when ``error`` is set.
+    results: List[Dict[str, Any]] = field(default_factory=list)
+    error: Optional[str] = None
+
+
+def search_key(description: str) -> str:
+    """Normalize a description so identical searches are run once."""
+    return " ".join(description.lower().split())
+
+
+class BatchSearch:
+    def __init__(
+        self,
+        description_generator: Any,
+        comparator: ImageComparator,
+        cascade: Any,
+        deduplicator: Any,
+        search: SearchFunction,
+        search_concurrency: int = 2,
+    ):
+        """Search for several garments at once, sharing work between them.
+
+        Descriptions are generated concurrently, identical searches are run
+        once, and the scraped products of all searches form one deduplicated
+        candidate pool. Query and candidate images are embedded in shared
+        batches and every query is ranked against the pool with one matrix
+        product; each query only keeps candidates found by its own search.
+
+        Args:
+            description_generator (Any): ImageDescriptionGenerator.
+            comparator (ImageComparator): Comparator used for the ranking.
+            cascade (Any): CascadeRanker whose prefilter shortlists each query
+                and whose embeddings generator embeds queries and candidates.
+            deduplicator (Any): ProductDeduplicator merging the pool.
+            search (SearchFunction): Coroutine taking the search term and the
+                attributes used to filter titles, returning scraped products.
+            search_concurrency (int): Searches running at once. Defaults to 2.
+        """
+        self.description_generator = description_generator
+        self.comparator = comparator
+        self.cascade = cascade
+        self.deduplicator = deduplicator
+        self.search = search
+        self.search_concurrency = search_concurrency
+
+    async def _describe(self, queries: List[BatchQuery]) -> List[Any]:
+        return await asyncio.gather(
+            *(
+                self.description_generator.generate_description(
+                    file_path=query.file_path,
+                    garment_type=query.garment_type,
+                    garment_layer=query.garment_layer,
+                    image_data=query.image_data,
+                    mime_type="image/jpeg" if query.image_data else None,
+                    prompt_version=query.prompt_version,
+                )
+                for query in queries
+            ),
+            return_exceptions=True,
+        )
+
+    async def _search_all(
+        self, searches: Dict[str, BatchResult], search: SearchFunction
+    ) -> Dict[str, List[Dict[str, Any]]]:
+        semaphore = asyncio.Semaphore(max(1, self.search_concurrency))
+
+        async def limited(result: BatchResult) -> List[Dict[str, Any]]:
+            async with semaphore:
+                return await search(result.description, result.attributes)
+
+        keys = list(searches)
+        outcomes = await asyncio.gather(
+            *(limited(searches[key]) for key in keys), return_exceptions=True
+        )
+        found = {}
+        for key, outcome in zip(keys, outcomes):
+            if isinstance(outcome, BaseException):
+                logger.error("Batch search for '%s' failed: %r", key, outcome)
+                continue
+            found[key] = outcome
+        return found
+
+    async def run(
+        self,
+        queries: List[BatchQuery],
+        cascade: Any = None,
+        search: Optional[SearchFunction] = None,
+        shortlist_size: Optional[int] = None,
+    ) -> List[BatchResult]:
+        """Describe, search and rank every query.
+
+        Args:
+            queries (List[BatchQuery]): Ingested images with their garment types.
+            cascade (Any): Overrides the configured cascade, e.g. one running a
+                smaller model.
+            search (Optional[SearchFunction]): Overrides the configured search.
+            shortlist_size (Optional[int]): Overrides the prefilter shortlist size.
+
+        Raises:
+            RuntimeError: If the query images cannot be embedded.
+
+        Returns:
+            List[BatchResult]: One result per query, in input order. A query
+            whose description or search failed carries an ``error`` instead
+            of results.
+        """
+        cascade = cascade or self.cascade
+        search = search or self.search
+        BATCH_QUERIES.inc(len(queries), stage="input")
+        results = [BatchResult() for _ in queries]
+
+        # Describe all images while the query crops are embedded in one batch
+        with track_stage("describe"):
+            descriptions, query_vectors = await asyncio.gather(
+                self._describe(queries),
+                cascade.embeddings_generator.embed_crops(
+                    [query.crop for query in queries]
+                ),
+            )
+
+        # Run each distinct search once
+        searches: Dict[str, BatchResult] = {}
+        keys: List[Optional[str]] = []
+        for result, description in zip(results, descriptions):
+            if isinstance(description, BaseException):
+                logger.error("Batch description failed: %s", description)
+                result.error = "Description failed."
+                keys.append(None)
+                continue
+            result.description = description
+            result.attributes = parse_description(description)
+            key = search_key(description)
+            searches.setdefault(key, result)
+            keys.append(key)
+        BATCH_QUERIES.inc(len(searches), stage="search")
+        logger.info("Batch of %s images runs %s searches.", len(queries), len(searches))
+        with track_stage("search"):
+            found = await self._search_all(searches, search)
+
+        # Pool the products of all searches and merge duplicates, remembering
+        # which searches found each canonical item
+        items: List[Dict[str, Any]] = []
+        item_keys: List[str] = []
+        for key, products in found.items():
+            for item in products:
+                if item.get("local_image_path"):
+                    items.append(item)
+                    item_keys.append(key)
+        with track_stage("dedupe"):
+            groups = await self.deduplicator.group(items)
+        pool = [self.deduplicator.merge(items, group) for group in groups]
+        owners: List[Set[str]] = [
+            {item_keys[index] for index in group} for group in groups
+        ]
+
+        # Shortlist each query's candidates and embed the union of shortlists
+        owned = [
+            [index for index, found_by in enumerate(owners) if key in found_by]
+            if key in found
+            else []
+            for key in keys
+        ]
+        with track_stage("prefilter"):
+            shortlists = await asyncio.gather(
+                *(
+                    cascade.prefilter(
+                        query.file_path,
+                        [pool[index] for index in indices],
+                        shortlist_size,
+                    )
+                    for query, indices in zip(queries, owned)
+                )
+            )
+        position = {id(item): index for index, item in enumerate(pool)}
+        allowed = [
+            [position[id(item)] for item in shortlist] for shortlist in shortlists
+        ]
+        to_embed = sorted({index for indices in allowed for index in indices})
+        with track_stage("embed_candidates"):
+            embedded_items = await cascade.embed([pool[index] for index in to_embed])
+        embedded = {position[id(item)]: item.pop("vectors") for item in embedded_items}
+
+        # Rank every query against the embedded pool in one matrix product
+        with track_stage("rank"):
+            columns = list(embedded)
+            column_of = {index: column for column, index in enumerate(columns)}
+            similarity = (
+                self.comparator.similarity_matrix(
+                    query_vectors, np.vstack([embedded[index] for index in columns])
+                )
+                if columns
+                else np.zeros((len(queries), 0), np.float32)
+            )
+            for row, (result, key, indices) in enumerate(zip(results, keys, allowed)):
+                if result.error:
+                    continue
+                if key not in found:
+                    result.error = "Search failed."
+                    continue
+                scored = [
+                    (float(similarity[row, column_of[index]]), index)
+                    for index in indices
+                    if index in column_of
+                ]
+                scored.sort(key=lambda pair: pair[0], reverse=True)
+                result.results = [
+                    {
+                        **pool[index],
+                        "cosine_similarity": score,
+                        "vectors": embedded[index],
+                    }
+                    for score, index in scored
+                ]
+        return results
@@ -0,0 +1,311 @@
+import copy
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from services.dedupe import normalize_url
+from services.text_prefilter import tokenize
+from utils.metrics import record_cache_lookup
+
+logger = logging.getLogger(__name__)
+
+
+def query_key(search_term: str) -> str:
+    """Normalize a search term so reworded but equivalent queries share an entry.
+
+    Args:
+        search_term (str): Query as sent to the retailers.
+
+    Returns:
+        str: Sorted, de-duplicated index tokens of the query.
+    """
+    return " ".join(sorted(set(tokenize(search_term))))
+
+
+def _digest(text: str) -> str:
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()[:20]
+
+
+def _write_atomic(path: Path, data: bytes) -> None:
+    temporary = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    temporary.write_bytes(data)
+    os.replace(temporary, path)
+
+
+class SearchCache:
+    def __init__(
+        self, cache_dir: Path, ttl_seconds: float = 21600.0, max_entries: int = 128
+    ):
+        """Keep scraped products per query, with their images, on disk.
+
+        Entries are JSON files under ``cache_dir/searches`` so a crawler in
+        another process can fill the cache the app reads; the most recently
+        used entries are also held in memory. Images referenced by an entry
+        must live outside the per-request directories, which are cleaned.
+        Replacing an entry never deletes images a reader may still be using:
+        new entries get fresh image paths, and the superseded images are
+        listed under ``searches/superseded`` until ``prune`` finds them
+        older than the TTL.
+
+        Args:
+            cache_dir (Path): Root of the cache.
+            ttl_seconds (float): Age after which an entry is stale. Defaults to 6 h.
+            max_entries (int): Entries held in memory. Defaults to 128.
+        """
+        self.root = Path(cache_dir) / "searches"
+        self.superseded_dir = self.root / "superseded"
+        self.superseded_dir.mkdir(parents=True, exist_ok=True)
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[float, List[Dict[str, Any]]]]" = (
+            OrderedDict()
+        )
+        self._lock = threading.Lock()
+
+    def _path(self, key: str) -> Path:
+        return self.root / f"{_digest(key)}.json"
+
+    def _load(self, key: str) -> Optional[Tuple[float, List[Dict[str, Any]]]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                return entry
+        try:
+            data = json.loads(self._path(key).read_text())
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(
+                "Ignoring unreadable search cache entry for '%s': %s", key, e
+            )
+            return None
+        entry = (data["created_at"], data["products"])
+        self._remember(key, entry)
+        return entry
+
+    def _remember(self, key: str, entry: Tuple[float, List[Dict[str, Any]]]) -> None:
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def age(self, search_term: str) -> Optional[float]:
+        """Return the age in seconds of the entry for a query, or None."""
+        entry = self._load(query_key(search_term))
+        return None if entry is None else time.time() - entry[0]
+
+    def get(self, search_term: str) -> Optional[List[Dict[str, Any]]]:
+        """Return a copy of the cached products for a query.
+
+        Args:
+            search_term (str): Query as sent to the retailers.
+
+        Returns:
+            Optional[List[Dict[str, Any]]]: Products, or None if the entry is
+            missing, stale or lost one of its images.
+        """
+        entry = self._load(query_key(search_term))
+        if entry is None or time.time() - entry[0] > self.ttl_seconds:
+            record_cache_lookup("search", hit=False)
+            return None
+        products = entry[1]
+        if any(
+            item.get("local_image_path") and not Path(item["local_image_path"]).exists()
+            for item in products
+        ):
+            record_cache_lookup("search", hit=False)
+            return None
+        record_cache_lookup("search", hit=True)
+        # Callers annotate and merge items, so never hand out the cached dicts.
+        return copy.deepcopy(products)
+
+    def put(self, search_term: str, products: List[Dict[str, Any]]) -> None:
+        """Store the products of a query, replacing an older entry.
+
+        Images of the older entry that the new one does not use are left for
+        ``prune`` to delete once they are older than the TTL.
+
+        Args:
+            search_term (str): Query as sent to the retailers.
+            products (List[Dict[str, Any]]): Scraped products with their
+                ``local_image_path``.
+        """
+        key = query_key(search_term)
+        previous = self._load(key)
+        entry = (time.time(), copy.deepcopy(products))
+        data = {"query": search_term, "created_at": entry[0], "products": entry[1]}
+        _write_atomic(self._path(key), json.dumps(data).encode("utf-8"))
+        self._remember(key, entry)
+        if previous is not None:
+            kept = {item.get("local_image_path") for item in products}
+            superseded = [
+                item
+                for item in previous[1]
+                if item.get("local_image_path") and item["local_image_path"] not in kept
+            ]
+            if superseded:
+                record = {"superseded_at": entry[0], "products": superseded}
+                _write_atomic(
+                    self.superseded_dir / f"{_digest(key)}-{entry[0]:.6f}.json",
+                    json.dumps(record).encode("utf-8"),
+                )
+
+    @staticmethod
+    def _remove_images(products) -> None:
+        for item in products:
+            if item.get("local_image_path"):
+                Path(item["local_image_path"]).unlink(missing_ok=True)
+
+    def prune(self) -> int:
+        """Delete stale entries and their images, and images superseded
+        longer than the TTL ago.
+
+        Returns:
+            int: Number of entries deleted.
+        """
+        removed = 0
+        now = time.time()
+        for path in self.superseded_dir.glob("*.json"):
+            try:
+                data = json.loads(path.read_text())
+            except Exception:
+                path.unlink(missing_ok=True)
+                continue
+            if now - data["superseded_at"] <= self.ttl_seconds:
+                continue
+            self._remove_images(data["products"])
+            path.unlink(missing_ok=True)
+        for path in self.root.glob("*.json"):
+            try:
+                data = json.loads(path.read_text())
+            except Exception:
+                path.unlink(missing_ok=True)
+                continue
+            if now - data["created_at"] <= self.ttl_seconds:
+                continue
+            self._remove_images(data["products"])
+            path.unlink(missing_ok=True)
+            with self._lock:
+                self._entries.pop(query_key(data["query"]), None)
+            removed += 1
+        if removed:
+            logger.info("Pruned %s stale search cache entries.", removed)
+        return removed
+
+
+class EmbeddingCache:
+    def __init__(
+        self,
+        cache_dir: Path,
+        max_entries: int = 4096,
+        ttl_seconds: float = 7 * 86400.0,
+    ):
+        """Keep image embeddings per model and image URL, in memory and on disk.
+
+        Retailers serve the same product image to many queries, so keying on
+        the normalized image URL lets any search reuse an embedding.
+
+        Args:
+            cache_dir (Path): Root of the cache; vectors go to ``cache_dir/embeddings``.
+            max_entries (int): Vectors held in memory. Defaults to 4096.
+            ttl_seconds (float): Age after which ``prune`` deletes a vector
+                file. Defaults to 7 days.
+        """
+        self.root = Path(cache_dir) / "embeddings"
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._vectors: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(model: str, image_url: Optional[str]) -> Optional[str]:
+        url = normalize_url(image_url)
+        return None if url is None else _digest(f"{model} {url}")
+
+    def _remember(self, key: str, vector: np.ndarray) -> None:
+        with self._lock:
+            self._vectors[key] = vector
+            self._vectors.move_to_end(key)
+            while len(self._vectors) > self.max_entries:
+                self._vectors.popitem(last=False)
+
+    def get(self, model: str, image_url: Optional[str]) -> Optional[np.ndarray]:
+        """Return the cached embedding of an image, or None.
+
+        Args:
+            model (str): Name of the model that produced the embedding.
+            image_url (Optional[str]): Retailer image URL.
+
+        Returns:
+            Optional[np.ndarray]: Embedding of shape (1, D).
+        """
+        key = self._key(model, image_url)
+        if key is None:
+            return None
+        with self._lock:
+            vector = self._vectors.get(key)
+            if vector is not None:
+                self._vectors.move_to_end(key)
+        if vector is None:
+            try:
+                vector = np.load(self.root / f"{key}.npy")
+                self._remember(key, vector)
+            except FileNotFoundError:
+                pass
+            except Exception as e:
+                logger.warning("Ignoring unreadable cached embedding %s: %s", key, e)
+        record_cache_lookup("embedding", hit=vector is not None)
+        return vector
+
+    def put(self, model: str, image_url: Optional[str], vector: np.ndarray) -> None:
+        """Store the embedding of an image; images without a URL are skipped.
+
+        Args:
+            model (str): Name of the model that produced the embedding.
+            image_url (Optional[str]): Retailer image URL.
+            vector (np.ndarray): Embedding of shape (1, D).
+        """
+        key = self._key(model, image_url)
+        if key is None:
+            return
+        vector = np.asarray(vector, np.float32)
+        self._remember(key, vector)
+        path = self.root / f"{key}.npy"
+        try:
+            temporary = path.with_name(f".{key}.{os.getpid()}.tmp.npy")
+            np.save(temporary, vector)
+            os.replace(temporary, path)
+        except Exception as e:
+            logger.warning("Could not persist embedding %s: %s", key, e)
+
+    def prune(self) -> int:
+        """Delete vector files older than the TTL.
+
+        Returns:
+            int: Number of files deleted.
+        """
+        cutoff = time.time() - self.ttl_seconds
+        removed = 0
+        for path in self.root.glob("*.npy"):
+            try:
+                if path.stat().st_mtime < cutoff:
+                    path.unlink()
+                    with self._lock:
+                        self._vectors.pop(path.stem, None)
+                    removed += 1
+            except FileNotFoundError:
+                continue
+        if removed:
+            logger.info("Pruned %s cached embeddings.", removed)
+        return removed
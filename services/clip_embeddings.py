@@ -1,22 +1,54 @@
 import asyncio
-from typing import Any
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, List, Optional
+import numpy as np
 import torch
-from PIL import Image
 from transformers import AutoImageProcessor, AutoModel
+from services.preprocessing import FastImagePreprocessor
+from utils.metrics import EMBEDDING_DURATION_PER_IMAGE, REGISTRY
 import logging
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+INFERENCE_QUEUE_DEPTH = REGISTRY.gauge(
+    "stylefinder_inference_queue_depth",
+    "Embedding jobs waiting for or running on an inference thread.",
+)
+INFERENCE_ACTIVE = REGISTRY.gauge(
+    "stylefinder_inference_active",
+    "Embedding jobs currently running on an inference thread.",
+)
+
 
 class DINOEmbeddingsGenerator:
-    def __init__(self):
-        """Initialize the DINO embeddings generator with pre-trained model and processor."""
-        self.image_processor = AutoImageProcessor.from_pretrained(
-            "facebook/dinov2-base"
+    def __init__(
+        self,
+        max_workers: int = 1,
+        max_batch_size: int = 16,
+        draft_decode: bool = True,
+        model_name: str = "facebook/dinov2-base",
+    ):
+        """Initialize the DINO embeddings generator with pre-trained model and processor.
+
+        Args:
+            max_workers (int): Number of threads running model inference. Defaults to 1.
+            max_batch_size (int): Largest batch passed to one forward call. Defaults to 16.
+            draft_decode (bool): Use reduced-scale JPEG decoding when preprocessing.
+                Defaults to True.
+            model_name (str): DINOv2 checkpoint. Defaults to "facebook/dinov2-base".
+        """
+        self.model_name = model_name
+        self.image_processor = AutoImageProcessor.from_pretrained(self.model_name)
+        self.model = AutoModel.from_pretrained(self.model_name)
+        self.preprocessor = FastImagePreprocessor.from_processor(
+            self.image_processor, draft=draft_decode
+        )
+        self.max_batch_size = max_batch_size
+        # Keep the forward pass off the event loop.
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="inference"
         )
-        self.model = AutoModel.from_pretrained("facebook/dinov2-base")
 
     async def generate_embeddings(self, file_path: str) -> Any:
         """
@@ -29,37 +61,145 @@ class DINOEmbeddingsGenerator:
             Any: The embeddings generated for the image.
         """
         try:
-            logger.info(f"Generating embeddings for image: {file_path}")
-            image = await self._load_image(file_path)
-            inputs = self.image_processor(image, return_tensors="pt")
+            logger.debug("Generating embeddings for image: %s", file_path)
+            crop = await self._load_image(file_path)
+            embedding = await self.embed_crop(crop)
+            logger.debug("Embeddings generation successful.")
+            return embedding
+        except Exception as e:
+            logger.error("Error generating embeddings for %s: %s", file_path, e)
+            raise RuntimeError(f"Error generating embeddings: {e}")
+
+    async def embed_crop(self, crop: np.ndarray) -> np.ndarray:
+        """Embed an image already decoded and cropped by ``preprocessor.load``.
+
+        Args:
+            crop (np.ndarray): uint8 crop of shape (224, 224, 3).
+
+        Returns:
+            np.ndarray: CLS token embedding, shape (1, D).
+        """
+        INFERENCE_QUEUE_DEPTH.inc()
+        loop = asyncio.get_event_loop()
+        try:
+            return await loop.run_in_executor(self._executor, self._embed, [crop])
+        finally:
+            INFERENCE_QUEUE_DEPTH.dec()
+
+    async def generate_embeddings_batch(
+        self, file_paths: List[str]
+    ) -> List[Optional[np.ndarray]]:
+        """Embed several images with batched forward passes.
+
+        Images are decoded concurrently; images that fail to load get None
+        instead of failing the whole batch.
+
+        Args:
+            file_paths (List[str]): Paths to the image files.
+
+        Returns:
+            List[Optional[np.ndarray]]: Embedding of shape (1, D) per path, or None.
+        """
+        crops = await asyncio.gather(
+            *(self._load_image(path) for path in file_paths), return_exceptions=True
+        )
+        loaded = [
+            index for index, crop in enumerate(crops) if isinstance(crop, np.ndarray)
+        ]
+        for index, crop in enumerate(crops):
+            if not isinstance(crop, np.ndarray):
+                logger.warning("Skipping %s: %s", file_paths[index], crop)
+
+        embeddings: List[Optional[np.ndarray]] = [None] * len(file_paths)
+        if not loaded:
+            return embeddings
+        result = await self.embed_crops([crops[i] for i in loaded])
+        for offset, index in enumerate(loaded):
+            embeddings[index] = result[offset : offset + 1]
+        return embeddings
 
-            with torch.no_grad():
-                outputs = self.model(**inputs)
+    async def embed_crops(self, crops: List[np.ndarray]) -> np.ndarray:
+        """Embed decoded crops in forward passes of up to ``max_batch_size``.
 
-            embedding = outputs.last_hidden_state[:, 0, :].squeeze(1)
-            logger.info("Embeddings generation successful.")
-            return embedding.numpy()
+        Args:
+            crops (List[np.ndarray]): uint8 crops of shape (224, 224, 3).
+
+        Raises:
+            RuntimeError: If a forward pass fails.
+
+        Returns:
+            np.ndarray: CLS token embeddings, shape (N, D), in input order.
+        """
+        loop = asyncio.get_event_loop()
+        batches = [
+            crops[start : start + self.max_batch_size]
+            for start in range(0, len(crops), self.max_batch_size)
+        ]
+        INFERENCE_QUEUE_DEPTH.inc(len(batches))
+        try:
+            results = await asyncio.gather(
+                *(
+                    loop.run_in_executor(self._executor, self._embed, batch)
+                    for batch in batches
+                )
+            )
         except Exception as e:
-            logger.error(f"Error generating embeddings for {file_path}: {e}")
+            logger.error("Error generating batch embeddings: %s", e)
             raise RuntimeError(f"Error generating embeddings: {e}")
+        finally:
+            INFERENCE_QUEUE_DEPTH.dec(len(batches))
+        return np.concatenate(results, axis=0)
+
+    def _embed(self, crops: List[np.ndarray]) -> np.ndarray:
+        """Run ``_forward`` on an inference thread, tracking inference metrics.
+
+        Args:
+            crops (List[np.ndarray]): Outputs of ``FastImagePreprocessor.load``.
 
-    async def _load_image(self, file_path: str) -> Image.Image:
+        Returns:
+            np.ndarray: CLS token embeddings, shape (N, D).
         """
-        Load an image file asynchronously.
+        INFERENCE_ACTIVE.inc()
+        start = time.perf_counter()
+        try:
+            return self._forward(crops)
+        finally:
+            per_image = (time.perf_counter() - start) / max(len(crops), 1)
+            for _ in crops:
+                EMBEDDING_DURATION_PER_IMAGE.observe(per_image)
+            INFERENCE_ACTIVE.dec()
+
+    def _forward(self, crops: List[np.ndarray]) -> np.ndarray:
+        """Normalize a batch of crops and return their CLS token embeddings.
+
+        Args:
+            crops (List[np.ndarray]): Outputs of ``FastImagePreprocessor.load``.
+
+        Returns:
+            np.ndarray: CLS token embeddings, shape (N, D).
+        """
+        pixel_values = torch.from_numpy(self.preprocessor.normalize(crops))
+
+        with torch.no_grad():
+            outputs = self.model(pixel_values=pixel_values)
+
+        return outputs.last_hidden_state[:, 0, :].numpy()
+
+    async def _load_image(self, file_path: str) -> np.ndarray:
+        """
+        Decode an image file and resize/crop it for the model asynchronously.
 
         Args:
             file_path (str): Path to the image file.
 
         Returns:
-            Image.Image: The loaded image object.
+            np.ndarray: uint8 crop of shape (224, 224, 3).
         """
         try:
             loop = asyncio.get_event_loop()
-            image = await loop.run_in_executor(
-                None, lambda: Image.open(file_path).convert("RGB")
-            )
-            logger.info(f"Image loaded successfully: {file_path}")
-            return image
+            crop = await loop.run_in_executor(None, self.preprocessor.load, file_path)
+            logger.debug("Image loaded successfully: %s", file_path)
+            return crop
         except Exception as e:
-            logger.error(f"Error loading image {file_path}: {e}")
+            logger.error("Error loading image %s: %s", file_path, e)
             raise RuntimeError(f"Error loading image: {e}")
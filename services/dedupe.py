@@ -0,0 +1,251 @@
+import asyncio
+import logging
+import re
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+import numpy as np
+from PIL import Image
+
+from utils.metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+DEDUPE_ITEMS = REGISTRY.counter(
+    "stylefinder_dedupe_items_total",
+    "Scraped items seen by the dedupe stage and items merged into another.",
+    labelnames=("outcome",),
+)
+
+# Query parameters that track the click rather than identify the resource.
+TRACKING_PARAMS = {
+    "ref",
+    "ref_",
+    "tag",
+    "psc",
+    "qid",
+    "sr",
+    "srsltid",
+    "crid",
+    "sprefix",
+    "keywords",
+    "th",
+    "gclid",
+    "fbclid",
+}
+# Amazon CDN size/crop modifiers, e.g. "71abc._AC_UL320_.jpg" -> "71abc.jpg".
+_AMAZON_IMAGE_MODIFIER_RE = re.compile(r"\._[^/]*_(?=\.\w+$)")
+_AMAZON_PRODUCT_RE = re.compile(r"/(?:dp|gp/product)/([A-Z0-9]{10})")
+# Mean absolute RGB difference of the 4x4 layouts above which two images with
+# matching hashes are still different colourways.
+MAX_COLOUR_DISTANCE = 8.0
+# Fields copied from every merged item into the canonical item's ``offers``.
+OFFER_FIELDS = ("name", "price", "product_url", "rating", "image_url")
+
+
+def normalize_url(url: Optional[str]) -> Optional[str]:
+    """Reduce a product or image URL to a comparable key.
+
+    Lowercases scheme and host, drops fragments and tracking parameters,
+    collapses Amazon product pages to ``/dp/<ASIN>`` and strips Amazon image
+    size modifiers.
+
+    Args:
+        url (Optional[str]): URL as scraped.
+
+    Returns:
+        Optional[str]: Normalized URL, or None for a missing/unusable URL.
+    """
+    if not url or not url.startswith(("http://", "https://", "//")):
+        return None
+    parts = urlsplit(url if not url.startswith("//") else f"https:{url}")
+    host = parts.netloc.lower()
+    if host.startswith("www."):
+        host = host[4:]
+    path = parts.path or "/"
+
+    product = _AMAZON_PRODUCT_RE.search(path) if "amazon." in host else None
+    if product:
+        return f"https://{host}/dp/{product.group(1)}"
+    if "media-amazon.com" in host or "images-amazon.com" in host:
+        path = _AMAZON_IMAGE_MODIFIER_RE.sub("", path)
+
+    query = urlencode(
+        sorted(
+            (key, value)
+            for key, value in parse_qsl(parts.query, keep_blank_values=True)
+            if key.lower() not in TRACKING_PARAMS and not key.startswith("utm_")
+        )
+    )
+    return urlunsplit(("https", host, path.rstrip("/") or "/", query, ""))
+
+
+def image_signature(file_path: str, hash_size: int = 8) -> Tuple[int, np.ndarray]:
+    """Compute the difference hash and coarse colour layout of an image.
+
+    The dHash reduces the image to a ``(hash_size + 1) x hash_size`` grayscale
+    grid and records whether each pixel is brighter than its right neighbour,
+    so re-encodes and rescales of the same picture hash alike. Being
+    colour-blind, it is paired with a 4x4 RGB thumbnail that tells colour
+    variants of the same cut apart.
+
+    Args:
+        file_path (str): Path to the image file.
+        hash_size (int): Bits per row and column. Defaults to 8.
+
+    Returns:
+        Tuple[int, np.ndarray]: ``hash_size ** 2``-bit hash and the (48,)
+        colour layout in [0, 255].
+    """
+    with Image.open(file_path) as image:
+        image.draft("RGB", (hash_size * 4, hash_size * 4))
+        image = image.convert("RGB")
+        gray = np.asarray(
+            image.convert("L").resize(
+                (hash_size + 1, hash_size), Image.Resampling.BILINEAR
+            ),
+            dtype=np.int16,
+        )
+        colour = np.asarray(
+            image.resize((4, 4), Image.Resampling.BOX), dtype=np.float32
+        ).ravel()
+    bits = (gray[:, :-1] > gray[:, 1:]).ravel()
+    value = 0
+    for bit in bits:
+        value = (value << 1) | int(bit)
+    return value, colour
+
+
+def hamming_distance(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+class ProductDeduplicator:
+    def __init__(self, max_distance: int = 4):
+        """Collapse the same product listed by several retailers or CDNs.
+
+        Items are merged when their normalized product URLs or image URLs
+        match, or when their downloaded images have difference hashes within
+        ``max_distance`` bits and a similar colour layout.
+
+        Args:
+            max_distance (int): Largest dHash Hamming distance treated as the
+                same image; negative disables image hashing. Defaults to 4.
+        """
+        self.max_distance = max_distance
+
+    def _signatures(
+        self, file_paths: List[str]
+    ) -> List[Optional[Tuple[int, np.ndarray]]]:
+        signatures = []
+        for path in file_paths:
+            try:
+                signatures.append(image_signature(path))
+            except Exception as e:
+                logger.warning("Could not hash %s: %s", path, e)
+                signatures.append(None)
+        return signatures
+
+    def _same_image(
+        self, first: Tuple[int, np.ndarray], second: Tuple[int, np.ndarray]
+    ) -> bool:
+        return (
+            hamming_distance(first[0], second[0]) <= self.max_distance
+            and float(np.abs(first[1] - second[1]).mean()) <= MAX_COLOUR_DISTANCE
+        )
+
+    async def group(self, items: List[Dict[str, Any]]) -> List[List[int]]:
+        """Group the indices of items that are the same product.
+
+        Args:
+            items (List[Dict[str, Any]]): Merged scraper results with a
+                ``local_image_path``.
+
+        Returns:
+            List[List[int]]: Indices per group, in input order; each group's
+            first index is its canonical item.
+        """
+        parent = list(range(len(items)))
+
+        def find(index: int) -> int:
+            while parent[index] != index:
+                parent[index] = parent[parent[index]]
+                index = parent[index]
+            return index
+
+        def union(a: int, b: int) -> None:
+            a, b = find(a), find(b)
+            if a != b:
+                # The earliest item stays canonical.
+                parent[max(a, b)] = min(a, b)
+
+        for field in ("product_url", "image_url"):
+            seen: Dict[str, int] = {}
+            for index, item in enumerate(items):
+                key = normalize_url(item.get(field))
+                if key is None:
+                    continue
+                if key in seen:
+                    union(seen[key], index)
+                else:
+                    seen[key] = index
+
+        if self.max_distance >= 0 and len(items) > 1:
+            signatures = await asyncio.to_thread(
+                self._signatures, [item["local_image_path"] for item in items]
+            )
+            for i, first in enumerate(signatures):
+                if first is None:
+                    continue
+                for j in range(i + 1, len(items)):
+                    second = signatures[j]
+                    if (
+                        second is not None
+                        and find(i) != find(j)
+                        and self._same_image(first, second)
+                    ):
+                        union(i, j)
+
+        groups: Dict[int, List[int]] = {}
+        for index in range(len(items)):
+            groups.setdefault(find(index), []).append(index)
+
+        DEDUPE_ITEMS.inc(len(items), outcome="input")
+        DEDUPE_ITEMS.inc(len(items) - len(groups), outcome="merged")
+        logger.info("Dedupe kept %s of %s items.", len(groups), len(items))
+        return [groups[root] for root in sorted(groups)]
+
+    async def dedupe(self, items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Merge near-duplicate items, keeping the first of each group.
+
+        The canonical item gains an ``offers`` list with the name, price,
+        product URL, rating and image URL of every item in its group, itself
+        first, in input order. Only canonical items are returned, so only
+        their images go on to be embedded.
+
+        Args:
+            items (List[Dict[str, Any]]): Merged scraper results with a
+                ``local_image_path``.
+
+        Returns:
+            List[Dict[str, Any]]: Canonical items, in input order.
+        """
+        return [self.merge(items, group) for group in await self.group(items)]
+
+    @staticmethod
+    def merge(items: List[Dict[str, Any]], group: List[int]) -> Dict[str, Any]:
+        """Attach the ``offers`` of a group to its canonical item and return it.
+
+        Args:
+            items (List[Dict[str, Any]]): Items the group indexes into.
+            group (List[int]): Indices from ``group``, canonical first.
+
+        Returns:
+            Dict[str, Any]: The canonical item.
+        """
+        item = items[group[0]]
+        item["offers"] = [
+            {field: items[index].get(field) for field in OFFER_FIELDS}
+            for index in group
+        ]
+        return item
@@ -3,8 +3,6 @@ from pathlib import Path
 from typing import List, Dict
 import logging
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
@@ -34,7 +32,33 @@ class ImageComparator:
 
             return dot_product / (norm_vec1 * norm_vec2)
         except Exception as e:
-            logger.error(f"Error calculating cosine similarity: {e}")
+            logger.error("Error calculating cosine similarity: %s", e)
+            raise
+
+    @staticmethod
+    def similarity_matrix(queries: np.ndarray, candidates: np.ndarray) -> np.ndarray:
+        """
+        Calculate the cosine similarity of every query to every candidate at once.
+
+        Args:
+            queries (np.ndarray): Query vectors, shape (Q, D) or (Q, 1, D).
+            candidates (np.ndarray): Candidate vectors, shape (N, D) or (N, 1, D).
+
+        Returns:
+            np.ndarray: Similarities, shape (Q, N); zero vectors score 0.
+        """
+        try:
+            queries = np.asarray(queries, np.float32).reshape(len(queries), -1)
+            candidates = np.asarray(candidates, np.float32).reshape(len(candidates), -1)
+            query_norms = np.linalg.norm(queries, axis=1, keepdims=True)
+            candidate_norms = np.linalg.norm(candidates, axis=1, keepdims=True)
+            queries = queries / np.where(query_norms == 0, 1.0, query_norms)
+            candidates = candidates / np.where(
+                candidate_norms == 0, 1.0, candidate_norms
+            )
+            return queries @ candidates.T
+        except Exception as e:
+            logger.error("Error calculating similarity matrix: %s", e)
             raise
 
     async def sort_dicts_by_similarity(
@@ -42,6 +66,7 @@ class ImageComparator:
         test_vector: np.ndarray,
         dict_list: List[Dict[str, np.ndarray]],
         cleanup: bool = False,
+        drop_vectors: bool = True,
     ) -> List[Dict[str, float]]:
         """
         Sort a list of dictionaries based on cosine similarity to the test vector.
@@ -50,6 +75,8 @@ class ImageComparator:
             test_vector (np.ndarray): The vector to compare against.
             dict_list (List[Dict[str, np.ndarray]]): List of dictionaries with embeddings.
             cleanup (bool): Whether to delete image files after processing.
+            drop_vectors (bool): Whether to remove the embeddings from the sorted
+                dictionaries. Defaults to True.
 
         Returns:
             List[Dict[str, float]]: Sorted list of dictionaries with similarity scores.
@@ -64,21 +91,26 @@ class ImageComparator:
                 dict_list, key=lambda x: x["cosine_similarity"], reverse=True
             )
 
-            # Log top 10 images for visual confirmation
-            for item in sorted_dict_list[:10]:
-                logger.info(
-                    f"Similarity: {item['cosine_similarity']}, Image: {item['local_image_path']}"
+            # Log top 10 images for visual confirmation, as a single record
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug(
+                    "Top similarities: %s",
+                    [
+                        (round(item["cosine_similarity"], 4), item["local_image_path"])
+                        for item in sorted_dict_list[:10]
+                    ],
                 )
 
             # Cleanup temporary files if required
             if cleanup:
                 await self._cleanup_files([entry["local_path"] for entry in dict_list])
 
-            for item in sorted_dict_list:
-                del item["vectors"]
+            if drop_vectors:
+                for item in sorted_dict_list:
+                    del item["vectors"]
             return sorted_dict_list
         except Exception as e:
-            logger.error(f"Error sorting dictionaries by similarity: {e}")
+            logger.error("Error sorting dictionaries by similarity: %s", e)
             raise
 
     async def _cleanup_files(self, file_paths: List[str]) -> None:
@@ -93,6 +125,6 @@ class ImageComparator:
                 temp_file = Path(file_path)
                 if temp_file.exists():
                     temp_file.unlink()
-                    logger.info(f"Temporary file {file_path} deleted.")
+                    logger.debug("Temporary file %s deleted.", file_path)
         except Exception as e:
-            logger.warning(f"Failed to delete temporary file {file_path}: {e}")
+            logger.warning("Failed to delete temporary file %s: %s", file_path, e)
@@ -1,27 +1,56 @@
 from openai import AsyncOpenAI
 import openai
 import base64
-import re
-from typing import Optional
+import io
+from PIL import Image
+from typing import Any, Callable, Dict, List, Optional
+from services.prompts import DEFAULT_PROMPT_VERSION, PromptVersion, get_prompt
+from utils.metrics import REGISTRY
 import logging
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+DESCRIPTION_TOKENS = REGISTRY.counter(
+    "stylefinder_description_tokens_total",
+    "Tokens billed for image descriptions, by prompt version and kind (prompt, completion).",
+    labelnames=("version", "kind"),
+)
+
 
 class ImageDescriptionGenerator:
-    def __init__(self, api_key: str):
+    def __init__(
+        self,
+        api_key: str,
+        base_url: Optional[str] = None,
+        prompt_version: str = DEFAULT_PROMPT_VERSION,
+        client: Optional[AsyncOpenAI] = None,
+    ):
         """Initialize the ImageDescriptionGenerator with the OpenAI API key.
 
         Args:
             api_key (str): OpenAI API key.
+            base_url (Optional[str]): Alternative API base URL, e.g. a local stand-in.
+                Defaults to the OpenAI API (or OPENAI_BASE_URL if set).
+            prompt_version (str): Registered prompt version used unless a call
+                picks another (see ``services.prompts``). Defaults to "v4".
+            client (Optional[AsyncOpenAI]): Client to use instead of creating
+                one, e.g. a stub for offline prompt comparisons.
+
+        Raises:
+            ValueError: If the prompt version is unknown.
         """
 
-        self.client = AsyncOpenAI(api_key=api_key)
+        self.prompt = get_prompt(prompt_version)
+        self.client = client or AsyncOpenAI(api_key=api_key, base_url=base_url)
 
     async def generate_description(
-        self, file_path: str, garment_type: str, garment_layer: Optional[str] = None
+        self,
+        file_path: str,
+        garment_type: str,
+        garment_layer: Optional[str] = None,
+        image_data: Optional[bytes] = None,
+        mime_type: Optional[str] = None,
+        prompt_version: Optional[str] = None,
     ) -> str:
         """
         Generate a detailed description of the image using GPT-4 Vision.
@@ -30,106 +59,204 @@ class ImageDescriptionGenerator:
             file_path (str): Path to the image file.
             garment_type (str): General type of garment (e.g., "upper").
             garment_layer (Optional[str]): Specific layer or type (e.g., "jacket").
+            image_data (Optional[bytes]): Already encoded image to send instead of
+                reading ``file_path``, e.g. the normalized upload.
+            mime_type (Optional[str]): MIME type of ``image_data``. Defaults to
+                the type detected from the image bytes.
+            prompt_version (Optional[str]): Prompt version for this call; None
+                uses the configured one.
 
         Returns:
             str: Generated description.
         """
         try:
-            prompt = await self._create_prompt(garment_type, garment_layer)
+            version = self._prompt_version(prompt_version)
+            prompt = await self._create_prompt(garment_type, garment_layer, version)
 
-            base64_image = await self._encode_image(file_path)
+            messages = await self._create_messages(
+                prompt, file_path, image_data, mime_type, version.image_detail
+            )
 
-            logger.info("Generating description with GPT-4 Vision.")
+            logger.info("Generating description with prompt %s.", version.name)
             response = await self.client.chat.completions.create(
-                model="gpt-4o",
-                messages=[
-                    {
-                        "role": "user",
-                        "content": [
-                            {
-                                "type": "text",
-                                "text": prompt,
-                            },
-                            {
-                                "type": "image_url",
-                                "image_url": {
-                                    "url": f"data:image/jpeg;base64,{base64_image}"
-                                },
-                            },
-                        ],
-                    }
-                ],
+                model="gpt-4o", messages=messages, **version.request_options()
             )
+            self._record_usage(version, getattr(response, "usage", None))
 
-            description = await self._process_response(response)
+            description = await self._process_response(response, version)
 
             logger.info("Description generation successful.")
 
             return description
         except openai.OpenAIError as e:
-            logger.error(f"OpenAI API error: {e}")
+            logger.error("OpenAI API error: %s", e)
             raise RuntimeError(f"OpenAI API error: {e}")
         except Exception as e:
-            logger.error(f"Error generating description: {e}")
+            logger.error("Error generating description: %s", e)
             raise RuntimeError(f"Error generating description: {e}")
         finally:
             # Clean up temporary file
             self._cleanup_file(file_path)
 
+    async def stream_description(
+        self,
+        file_path: str,
+        garment_type: str,
+        garment_layer: Optional[str] = None,
+        image_data: Optional[bytes] = None,
+        mime_type: Optional[str] = None,
+        on_leading_attributes: Optional[Callable[[Dict[str, str]], Any]] = None,
+        prompt_version: Optional[str] = None,
+    ) -> str:
+        """
+        Generate the description as ``generate_description`` does, but stream the
+        completion and report the leading attributes as soon as they are final.
+
+        Args:
+            file_path (str): Path to the image file.
+            garment_type (str): General type of garment (e.g., "upper").
+            garment_layer (Optional[str]): Specific layer or type (e.g., "jacket").
+            image_data (Optional[bytes]): Already encoded image to send instead of
+                reading ``file_path``.
+            mime_type (Optional[str]): MIME type of ``image_data``.
+            on_leading_attributes (Optional[Callable[[Dict[str, str]], Any]]): Called
+                once with garment type, gender and colour while the rest of the
+                completion is still streaming.
+            prompt_version (Optional[str]): Prompt version for this call; None
+                uses the configured one.
+
+        Returns:
+            str: Generated description.
+        """
+        try:
+            version = self._prompt_version(prompt_version)
+            prompt = await self._create_prompt(garment_type, garment_layer, version)
+            messages = await self._create_messages(
+                prompt, file_path, image_data, mime_type, version.image_detail
+            )
+
+            logger.info("Streaming description with prompt %s.", version.name)
+            stream = await self.client.chat.completions.create(
+                model="gpt-4o",
+                messages=messages,
+                stream=True,
+                stream_options={"include_usage": True},
+                **version.request_options(),
+            )
+            content = ""
+            notified = on_leading_attributes is None
+            async for chunk in stream:
+                if getattr(chunk, "usage", None):
+                    self._record_usage(version, chunk.usage)
+                if not chunk.choices or not chunk.choices[0].delta.content:
+                    continue
+                delta = chunk.choices[0].delta.content
+                content += delta
+                # A value can only have ended at a separator or closing quote.
+                if not notified and any(mark in delta for mark in ',\n"'):
+                    attributes = version.leading_attributes(content)
+                    if attributes:
+                        notified = True
+                        on_leading_attributes(attributes)
+
+            description = version.description(content)
+            logger.info("Description generation successful.")
+            return description
+        except openai.OpenAIError as e:
+            logger.error("OpenAI API error: %s", e)
+            raise RuntimeError(f"OpenAI API error: {e}")
+        except Exception as e:
+            logger.error("Error generating description: %s", e)
+            raise RuntimeError(f"Error generating description: {e}")
+        finally:
+            self._cleanup_file(file_path)
+
+    async def _create_messages(
+        self,
+        prompt: str,
+        file_path: str,
+        image_data: Optional[bytes],
+        mime_type: Optional[str],
+        image_detail: str = "auto",
+    ) -> List[Dict[str, Any]]:
+        """Build the chat messages carrying the prompt and the image.
+
+        Args:
+            prompt (str): Prompt for the GPT-4 Vision model.
+            file_path (str): Path to the image file, read if ``image_data`` is None.
+            image_data (Optional[bytes]): Already encoded image.
+            mime_type (Optional[str]): MIME type of the image; detected if None.
+            image_detail (str): Detail the model looks at the image with; "low"
+                costs a fixed 85 image tokens. Defaults to "auto".
+
+        Returns:
+            List[Dict[str, Any]]: Messages for the chat completions API.
+        """
+        if image_data is None:
+            with open(file_path, "rb") as image_file:
+                image_data = image_file.read()
+        mime_type = mime_type or self._detect_mime_type(image_data)
+        base64_image = await self._encode_image(image_data)
+        return [
+            {
+                "role": "user",
+                "content": [
+                    {
+                        "type": "text",
+                        "text": prompt,
+                    },
+                    {
+                        "type": "image_url",
+                        "image_url": {
+                            "url": f"data:{mime_type};base64,{base64_image}",
+                            "detail": image_detail,
+                        },
+                    },
+                ],
+            }
+        ]
+
+    def _prompt_version(self, name: Optional[str]) -> PromptVersion:
+        return get_prompt(name) if name else self.prompt
+
     async def _create_prompt(
-        self, garment_type: str, garment_layer: Optional[str]
+        self,
+        garment_type: str,
+        garment_layer: Optional[str],
+        version: Optional[PromptVersion] = None,
     ) -> str:
         """Create the prompt for the GPT-4 Vision model.
 
         Args: garment_type (str): General type of garment (e.g., "upper").
             garment_layer (Optional[str]): Specific layer or type (e.g., "jacket").
+            version (Optional[PromptVersion]): Prompt version; defaults to the
+                configured one.
 
         Returns: str: Prompt for the GPT-4 Vision model.
         """
-        prompt = f"You are analyzing an image of a {garment_type} garment."
-        if garment_layer:
-            prompt += f" This garment specifically belongs to the {garment_layer.lower()} layer."
-
-        prompt = """
-Please provide an extremely detailed and specific description of the garment, covering the following categories. For each category, ensure the description is concise (1-2 words or short phrases) and avoid generating full sentences or explanations. Exclude the category names and provide only the values in the specified order, separated by commas.
-
-### Categories to Include (in the given order):
-1. Garment Type: Specify the specific garment type (e.g., bomber jacket, halter dress, hoodie, puffer coat).
-2. Gender: The intended gender for the garment (e.g., man, woman, unisex).
-4. Fit: Indicate the fit of the garment (e.g., "relaxed fit", "regular fit", "fitted").
-5. Fabric/Material: Specify the primary fabric or material used (e.g., "100% wool", "denim", "silk blend").
-6. Texture: Describe the texture of the fabric (e.g., "smooth", "ribbed", "soft").
-7. Closure Type: Indicate the closure mechanism (e.g., "zippered", "button-down", "drawstring").
-8. Neckline/Collar: Specify the neckline or collar type (e.g., "V-neck", "high collar", "notched collar").
-9. Sleeve Type: Specify the type of sleeves (e.g., "long sleeves", "short sleeves", "puffed sleeves").
-10. Pockets: Indicate the number and type of pockets, if any (e.g., "two side pockets", "no pockets").
-11. Additional Design Features: Highlight any distinctive details (e.g., "ruffled hem", "embroidered logo", "belt loops").
-12. Length: Specify the length of the garment (e.g., "waist-length", "knee-length").
-13. Lining: Indicate if the garment has lining and describe it briefly (e.g., "fully lined", "no lining").
-14. Branding or Logos: Mention visible branding or logos, if applicable (e.g., "small 'Adidas' logo on chest").
-15. Occasion/Use: Specify the occasion or use for which the garment is intended (e.g., "casual wear", "formal wear", "activewear").
-
-### Output Format:
-Provide the description as a single comma-separated list of values. Do not include category names, explanations, or additional commentary. 
-
-### Example Output:
-For a bomber jacket:  
-Bomber jacket, Man, Solid black, Relaxed fit, 100% nylon, Smooth, Zippered, Ribbed collar, Long sleeves, Two zippered pockets, Ribbed cuffs and embroidered logo, Waist-length, Fully lined, Small 'Nike' logo, Casual wear
-
-### Guidelines:
-1. Focus only on features that are visually identifiable from the garment in the image. Exclude unnecessary details or assumptions.  
-2. Avoid including any references to people, backgrounds, or irrelevant details outside the garment itself.  
-3. Ensure the description is accurate and concise, strictly following the order provided.  
-4. Do not generate category names or additional commentary in the output.
-"""
-
-        return prompt
-
-    async def _encode_image(self, file_path: str) -> str:
-        """Encode the image file as a base64 string.
+        return (version or self.prompt).render(garment_type, garment_layer)
+
+    @staticmethod
+    def _record_usage(version: PromptVersion, usage: Any) -> None:
+        """Count the prompt and completion tokens of a call, when reported."""
+        if usage is None:
+            return
+        DESCRIPTION_TOKENS.inc(usage.prompt_tokens, version=version.name, kind="prompt")
+        DESCRIPTION_TOKENS.inc(
+            usage.completion_tokens, version=version.name, kind="completion"
+        )
+        logger.debug(
+            "Prompt %s used %s prompt and %s completion tokens.",
+            version.name,
+            usage.prompt_tokens,
+            usage.completion_tokens,
+        )
+
+    async def _encode_image(self, image_data: bytes) -> str:
+        """Encode image bytes as a base64 string.
 
         Args:
-            file_path (str): Path to the image file.
+            image_data (bytes): Encoded image.
 
         Raises:
             RuntimeError: If there is an error encoding the image.
@@ -138,17 +265,29 @@ Bomber jacket, Man, Solid black, Relaxed fit, 100% nylon, Smooth, Zippered, Ribb
             str: Base64 encoded image string.
         """
         try:
-            with open(file_path, "rb") as image_file:
-                return base64.b64encode(image_file.read()).decode("utf-8")
+            return base64.b64encode(image_data).decode("utf-8")
         except Exception as e:
-            logger.error(f"Error encoding image: {e}")
+            logger.error("Error encoding image: %s", e)
             raise RuntimeError(f"Error encoding image: {e}")
 
-    async def _process_response(self, response) -> str:
+    @staticmethod
+    def _detect_mime_type(image_data: bytes) -> str:
+        """Detect the MIME type of encoded image bytes, defaulting to JPEG."""
+        try:
+            with Image.open(io.BytesIO(image_data)) as image:
+                return Image.MIME.get(image.format, "image/jpeg")
+        except Exception:
+            return "image/jpeg"
+
+    async def _process_response(
+        self, response, version: Optional[PromptVersion] = None
+    ) -> str:
         """Process the GPT-4 Vision response to extract the generated description.
 
         Args:
             response (_type_): Response object from GPT-4 Vision.
+            version (Optional[PromptVersion]): Prompt version that produced it;
+                defaults to the configured one.
 
         Raises:
             RuntimeError: If there is an error processing the response.
@@ -157,10 +296,15 @@ Bomber jacket, Man, Solid black, Relaxed fit, 100% nylon, Smooth, Zippered, Ribb
             str: Generated description.
         """
         try:
-            content = response.choices[0].message.content
-            return re.sub(r"\s*\n\s*", ", ", content)
+            choice = response.choices[0]
+            if choice.finish_reason == "length":
+                logger.warning(
+                    "Description cut off at the token limit of prompt %s.",
+                    (version or self.prompt).name,
+                )
+            return (version or self.prompt).description(choice.message.content)
         except Exception as e:
-            logger.error(f"Error processing response: {e}")
+            logger.error("Error processing response: %s", e)
             raise RuntimeError(f"Error processing response: {e}")
 
     def _cleanup_file(self, file_path: str) -> None:
@@ -0,0 +1,151 @@
+import logging
+import threading
+from typing import Any, List, Sequence, Tuple, Union
+
+import numpy as np
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+# facebook/dinov2-base preprocessor_config.json
+DINOV2_SHORTEST_EDGE = 256
+DINOV2_CROP_SIZE = 224
+IMAGENET_MEAN = (0.485, 0.456, 0.406)
+IMAGENET_STD = (0.229, 0.224, 0.225)
+
+
+class FastImagePreprocessor:
+    def __init__(
+        self,
+        shortest_edge: int = DINOV2_SHORTEST_EDGE,
+        crop_size: int = DINOV2_CROP_SIZE,
+        mean: Sequence[float] = IMAGENET_MEAN,
+        std: Sequence[float] = IMAGENET_STD,
+        resample: int = Image.Resampling.BICUBIC,
+        draft: bool = True,
+    ):
+        """Resize, center-crop and normalize images for DINOv2 without the
+        per-image Python path of ``AutoImageProcessor``.
+
+        Decoding and the resize/crop run in PIL, which releases the GIL, so
+        ``load`` scales across threads. Normalization is a single vectorized
+        pass over the whole batch into a reused per-thread buffer.
+
+        Args:
+            shortest_edge (int): Short side after resizing. Defaults to 256.
+            crop_size (int): Side of the center crop. Defaults to 224.
+            mean (Sequence[float]): Per-channel mean in [0, 1].
+            std (Sequence[float]): Per-channel standard deviation in [0, 1].
+            resample (int): PIL resampling filter. Defaults to bicubic.
+            draft (bool): Let the JPEG decoder downscale by 1/2, 1/4 or 1/8
+                while keeping the short side at least ``shortest_edge``.
+                Defaults to True.
+        """
+        self.shortest_edge = shortest_edge
+        self.crop_size = crop_size
+        self.resample = resample
+        self.draft = draft
+        # (x / 255 - mean) / std == x * scale + offset
+        std_array = np.asarray(std, dtype=np.float32)
+        self._scale = (1.0 / (255.0 * std_array)).reshape(1, 3, 1, 1)
+        self._offset = (-np.asarray(mean, dtype=np.float32) / std_array).reshape(
+            1, 3, 1, 1
+        )
+        self._buffers = threading.local()
+
+    @classmethod
+    def from_processor(cls, image_processor: Any, **kwargs) -> "FastImagePreprocessor":
+        """Mirror the settings of a Hugging Face image processor.
+
+        Args:
+            image_processor (Any): An ``AutoImageProcessor`` instance using
+                shortest-edge resizing and a square center crop.
+            **kwargs: Extra arguments for the constructor, e.g. ``draft``.
+
+        Returns:
+            FastImagePreprocessor: The equivalent fast preprocessor.
+        """
+        return cls(
+            shortest_edge=image_processor.size["shortest_edge"],
+            crop_size=image_processor.crop_size["height"],
+            mean=image_processor.image_mean,
+            std=image_processor.image_std,
+            resample=int(image_processor.resample),
+            **kwargs,
+        )
+
+    def _crop_box(self, width: int, height: int) -> Tuple[float, float, float, float]:
+        # Resize so the short side is ``shortest_edge``, then center-crop; the
+        # box maps that crop back onto the source so PIL does both in one pass.
+        if width <= height:
+            resized = (self.shortest_edge, int(self.shortest_edge * height / width))
+        else:
+            resized = (int(self.shortest_edge * width / height), self.shortest_edge)
+        left = (resized[0] - self.crop_size) // 2
+        top = (resized[1] - self.crop_size) // 2
+        scale_x = width / resized[0]
+        scale_y = height / resized[1]
+        return (
+            left * scale_x,
+            top * scale_y,
+            (left + self.crop_size) * scale_x,
+            (top + self.crop_size) * scale_y,
+        )
+
+    def load(self, image: Union[str, Image.Image]) -> np.ndarray:
+        """Decode an image and return its resized center crop.
+
+        Args:
+            image (Union[str, Image.Image]): Path to the image or an opened image.
+
+        Returns:
+            np.ndarray: uint8 array of shape (crop_size, crop_size, 3).
+        """
+        if isinstance(image, str):
+            image = Image.open(image)
+        if self.draft and image.format == "JPEG":
+            image.draft("RGB", (self.shortest_edge, self.shortest_edge))
+        image = image.convert("RGB")
+        crop = image.resize(
+            (self.crop_size, self.crop_size),
+            self.resample,
+            box=self._crop_box(*image.size),
+        )
+        return np.asarray(crop, dtype=np.uint8)
+
+    def _buffer(self, count: int) -> np.ndarray:
+        buffer = getattr(self._buffers, "pixels", None)
+        if buffer is None or buffer.shape[0] < count:
+            buffer = np.empty((count, 3, self.crop_size, self.crop_size), np.float32)
+            self._buffers.pixels = buffer
+        return buffer[:count]
+
+    def normalize(self, crops: List[np.ndarray]) -> np.ndarray:
+        """Stack crops and normalize them into a channels-first batch.
+
+        The returned array is a view of a per-thread buffer that is reused by
+        the next call on the same thread; consume it before calling again.
+
+        Args:
+            crops (List[np.ndarray]): Outputs of ``load``.
+
+        Returns:
+            np.ndarray: float32 array of shape (N, 3, crop_size, crop_size).
+        """
+        pixels = self._buffer(len(crops))
+        for index, crop in enumerate(crops):
+            pixels[index] = crop.transpose(2, 0, 1)
+        np.multiply(pixels, self._scale, out=pixels)
+        np.add(pixels, self._offset, out=pixels)
+        return pixels
+
+    def __call__(self, images: List[Union[str, Image.Image]]) -> np.ndarray:
+        """Load and normalize a batch of images.
+
+        Args:
+            images (List[Union[str, Image.Image]]): Paths or opened images.
+
+        Returns:
+            np.ndarray: float32 array of shape (N, 3, crop_size, crop_size).
+        """
+        return self.normalize([self.load(image) for image in images])
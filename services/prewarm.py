@@ -0,0 +1,421 @@
+import argparse
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from services.caches import EmbeddingCache, SearchCache, query_key
+from utils.download_cache import DownloadCache
+from utils.logging_config import configure_logging
+from utils.metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+PREWARM_QUERIES = REGISTRY.counter(
+    "stylefinder_prewarm_queries_total",
+    "Queries considered by the pre-warming crawler, by outcome.",
+    labelnames=("outcome",),
+)
+
+DEFAULT_MAX_RESULTS = {"google": 40, "amazon": 20}
+
+
+class QueryLog:
+    def __init__(self, path: Path, max_entries: int = 5000):
+        """Append the search terms of live requests to a JSON-lines file.
+
+        The file is shared with a crawler running as a separate process and
+        is compacted to the newest ``max_entries`` lines as it grows.
+
+        Args:
+            path (Path): Log file.
+            max_entries (int): Lines kept after compaction. Defaults to 5000.
+        """
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_entries = max_entries
+        self._appended = 0
+        self._lock = threading.Lock()
+
+    def record(self, search_term: str) -> None:
+        """Append a search term.
+
+        Args:
+            search_term (str): Query sent to the retailers.
+        """
+        line = json.dumps({"ts": time.time(), "query": search_term})
+        try:
+            with self._lock:
+                with open(self.path, "a", encoding="utf-8") as log_file:
+                    log_file.write(line + "\n")
+                self._appended += 1
+                if self._appended >= self.max_entries:
+                    self._appended = 0
+                    lines = self.path.read_text(encoding="utf-8").splitlines()
+                    self.path.write_text(
+                        "\n".join(lines[-self.max_entries :]) + "\n", encoding="utf-8"
+                    )
+        except OSError as e:
+            logger.warning("Could not record query: %s", e)
+
+    def popular(
+        self, limit: int = 10, window_seconds: float = 86400.0, min_count: int = 2
+    ) -> List[str]:
+        """Return the most frequent recent queries.
+
+        Args:
+            limit (int): Most queries returned. Defaults to 10.
+            window_seconds (float): How far back to look. Defaults to 24 h.
+            min_count (int): Fewest occurrences of a query. Defaults to 2.
+
+        Returns:
+            List[str]: Queries, most frequent first, each in its latest wording.
+        """
+        cutoff = time.time() - window_seconds
+        counts: Counter = Counter()
+        latest: Dict[str, str] = {}
+        try:
+            with open(self.path, encoding="utf-8") as log_file:
+                for line in log_file:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue
+                    if entry.get("ts", 0) < cutoff or not entry.get("query"):
+                        continue
+                    key = query_key(entry["query"])
+                    counts[key] += 1
+                    latest[key] = entry["query"]
+        except FileNotFoundError:
+            return []
+        return [
+            latest[key]
+            for key, count in counts.most_common(limit)
+            if count >= min_count
+        ]
+
+
+def system_load() -> float:
+    """Return the one-minute load average per CPU, or 0 where unavailable."""
+    try:
+        return os.getloadavg()[0] / (os.cpu_count() or 1)
+    except (AttributeError, OSError):
+        return 0.0
+
+
+class PrewarmCrawler:
+    def __init__(
+        self,
+        scrapers: Dict[str, Any],
+        embeddings_generator: Any,
+        search_cache: SearchCache,
+        embedding_cache: EmbeddingCache,
+        queries: Sequence[str] = (),
+        query_log: Optional[QueryLog] = None,
+        mined_queries: int = 10,
+        max_results: Optional[Dict[str, int]] = None,
+        is_busy: Optional[Callable[[], bool]] = None,
+        max_load: float = 0.5,
+        concurrency: int = 1,
+        embed_batch_size: int = 4,
+        interval_seconds: float = 300.0,
+        pause_seconds: float = 5.0,
+    ):
+        """Fill the search and embedding caches with popular queries while idle.
+
+        Each cycle takes the configured queries plus the most frequent ones
+        from the query log, skips those with a fresh cache entry, scrapes the
+        retailers, embeds the images in small batches and stores both. Work
+        only starts or continues while ``is_busy`` is false and the load
+        average per CPU is below ``max_load``.
+
+        Args:
+            scrapers (Dict[str, Any]): Scraper per retailer with
+                ``scrape_and_save(search_term, max_results=...)``, saving images
+                inside the cache directory.
+            embeddings_generator (Any): DINOEmbeddingsGenerator.
+            search_cache (SearchCache): Cache of scraped products per query.
+            embedding_cache (EmbeddingCache): Cache of image embeddings.
+            queries (Sequence[str]): Queries always kept warm.
+            query_log (Optional[QueryLog]): Log to mine popular queries from.
+            mined_queries (int): Queries taken from the log per cycle. Defaults to 10.
+            max_results (Optional[Dict[str, int]]): Results scraped per retailer.
+                Defaults to what a live search scrapes.
+            is_busy (Optional[Callable[[], bool]]): Reports live traffic.
+            max_load (float): Highest one-minute load average per CPU at which
+                work proceeds. Defaults to 0.5.
+            concurrency (int): Queries crawled at once. Defaults to 1.
+            embed_batch_size (int): Images per embedding call; idleness is
+                checked between calls. Defaults to 4.
+            interval_seconds (float): Pause between cycles. Defaults to 300.
+            pause_seconds (float): Back-off while the service is busy. Defaults to 5.
+        """
+        self.scrapers = scrapers
+        self.embeddings_generator = embeddings_generator
+        self.search_cache = search_cache
+        self.embedding_cache = embedding_cache
+        self.queries = list(queries)
+        self.query_log = query_log
+        self.mined_queries = mined_queries
+        self.max_results = max_results or dict(DEFAULT_MAX_RESULTS)
+        self.is_busy = is_busy
+        self.max_load = max_load
+        self.concurrency = concurrency
+        self.embed_batch_size = embed_batch_size
+        self.interval_seconds = interval_seconds
+        self.pause_seconds = pause_seconds
+        self._task: Optional[asyncio.Task] = None
+
+    def idle(self) -> bool:
+        """Whether there is no live traffic and spare CPU."""
+        if self.is_busy is not None and self.is_busy():
+            return False
+        return system_load() < self.max_load
+
+    async def _wait_until_idle(self) -> None:
+        while not self.idle():
+            await asyncio.sleep(self.pause_seconds)
+
+    def pending_queries(self) -> List[str]:
+        """Return the queries whose cache entries are missing or half-way stale."""
+        mined = (
+            self.query_log.popular(self.mined_queries)
+            if self.query_log is not None and self.mined_queries > 0
+            else []
+        )
+        pending, seen = [], set()
+        for query in self.queries + mined:
+            key = query_key(query)
+            if not key or key in seen:
+                continue
+            seen.add(key)
+            age = self.search_cache.age(query)
+            if age is None or age > self.search_cache.ttl_seconds / 2:
+                pending.append(query)
+        return pending
+
+    async def warm(self, search_term: str) -> int:
+        """Scrape, embed and cache one query.
+
+        Args:
+            search_term (str): Query to send to the retailers.
+
+        Returns:
+            int: Number of products cached.
+        """
+        products = []
+        for retailer, scraper in self.scrapers.items():
+            await self._wait_until_idle()
+            try:
+                products.extend(
+                    await scraper.scrape_and_save(
+                        search_term,
+                        max_results=self.max_results.get(retailer, 20),
+                    )
+                )
+            except Exception as e:
+                logger.warning(
+                    "Pre-warming %s for '%s' failed: %s", retailer, search_term, e
+                )
+        products = [item for item in products if item.get("local_image_path")]
+        if not products:
+            raise RuntimeError(f"No products found for '{search_term}'.")
+
+        model = getattr(self.embeddings_generator, "model_name", "")
+        for start in range(0, len(products), self.embed_batch_size):
+            batch = [
+                item
+                for item in products[start : start + self.embed_batch_size]
+                if self.embedding_cache.get(model, item.get("image_url")) is None
+            ]
+            if not batch:
+                continue
+            await self._wait_until_idle()
+            vectors = await self.embeddings_generator.generate_embeddings_batch(
+                [item["local_image_path"] for item in batch]
+            )
+            for item, vector in zip(batch, vectors):
+                if vector is not None:
+                    self.embedding_cache.put(model, item.get("image_url"), vector)
+
+        self.search_cache.put(search_term, products)
+        logger.info("Pre-warmed '%s' with %s products.", search_term, len(products))
+        return len(products)
+
+    async def run_once(self) -> int:
+        """Run one crawl cycle.
+
+        Returns:
+            int: Number of queries warmed.
+        """
+        self.search_cache.prune()
+        self.embedding_cache.prune()
+        semaphore = asyncio.Semaphore(max(1, self.concurrency))
+
+        async def crawl(query: str) -> bool:
+            async with semaphore:
+                if not self.idle():
+                    PREWARM_QUERIES.inc(outcome="deferred")
+                    return False
+                try:
+                    await self.warm(query)
+                except Exception as e:
+                    logger.warning("Pre-warming '%s' failed: %s", query, e)
+                    PREWARM_QUERIES.inc(outcome="failed")
+                    return False
+                PREWARM_QUERIES.inc(outcome="warmed")
+                return True
+
+        warmed = await asyncio.gather(
+            *(crawl(query) for query in self.pending_queries())
+        )
+        return sum(warmed)
+
+    async def run(self) -> None:
+        """Crawl forever, pausing ``interval_seconds`` between cycles."""
+        while True:
+            try:
+                await self.run_once()
+            except Exception as e:
+                logger.error("Pre-warming cycle failed: %s", e)
+            await asyncio.sleep(self.interval_seconds)
+
+    def start(self) -> None:
+        """Run the crawler as a background task of the running event loop."""
+        if self._task is None:
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self) -> None:
+        """Cancel the background task."""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+
+def read_queries(path: Optional[str]) -> List[str]:
+    """Read one query per line, skipping blank lines and # comments."""
+    if not path:
+        return []
+    lines = Path(path).read_text(encoding="utf-8").splitlines()
+    queries = [line.strip() for line in lines]
+    return [query for query in queries if query and not query.startswith("#")]
+
+
+def build_scrapers(
+    cache_dir: Path,
+    google_base_url: str,
+    amazon_base_url: str,
+    download_cache: Optional[DownloadCache] = None,
+) -> Dict[str, Any]:
+    """Create Selenium scrapers that save their images inside the cache.
+
+    Without ``download_cache`` they share one under ``cache_dir/downloads``.
+    """
+    from scrapper.amazon_scrapper import AsyncAmazonScraper
+    from scrapper.google_scrapper import GoogleShoppingScraper
+
+    if download_cache is None:
+        download_cache = DownloadCache(Path(cache_dir) / "downloads")
+
+    image_dir = Path(cache_dir) / "images"
+    image_dir.mkdir(parents=True, exist_ok=True)
+    return {
+        "google": GoogleShoppingScraper(
+            save_dir=str(image_dir / "google"),
+            base_url=google_base_url,
+            download_cache=download_cache,
+        ),
+        "amazon": AsyncAmazonScraper(
+            save_dir=str(image_dir / "amazon"),
+            base_url=amazon_base_url,
+            download_cache=download_cache,
+        ),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Pre-warm the search and embedding caches outside the app."
+    )
+    parser.add_argument("--cache-dir", default=os.getenv("CACHE_DIR", "cache"))
+    parser.add_argument(
+        "--queries-file",
+        default=os.getenv("PREWARM_QUERIES_FILE"),
+        help="File with one query per line.",
+    )
+    parser.add_argument("--query", action="append", default=[], help="Extra query.")
+    parser.add_argument(
+        "--mined-queries",
+        type=int,
+        default=int(os.getenv("PREWARM_MINED_QUERIES", "10")),
+        help="Popular queries taken from the app's query log.",
+    )
+    parser.add_argument(
+        "--max-load",
+        type=float,
+        default=float(os.getenv("PREWARM_MAX_LOAD", "0.5")),
+        help="Pause while the load average per CPU is above this.",
+    )
+    parser.add_argument(
+        "--threads",
+        type=int,
+        default=1,
+        help="Inference threads; keep low when sharing a host with the app.",
+    )
+    parser.add_argument(
+        "--once", action="store_true", help="Run a single cycle and exit."
+    )
+    parser.add_argument(
+        "--interval", type=float, default=float(os.getenv("PREWARM_INTERVAL", "300"))
+    )
+    args = parser.parse_args()
+    configure_logging(
+        level=os.getenv("LOG_LEVEL", "INFO"),
+        json_format=os.getenv("LOG_FORMAT", "json").lower() != "text",
+    )
+
+    # Yield the CPU to the app when both run on one host.
+    if hasattr(os, "nice"):
+        os.nice(10)
+    import torch
+
+    from services.clip_embeddings import DINOEmbeddingsGenerator
+
+    torch.set_num_threads(args.threads)
+    cache_dir = Path(args.cache_dir)
+    crawler = PrewarmCrawler(
+        build_scrapers(
+            cache_dir,
+            os.getenv("GOOGLE_BASE_URL", "https://www.google.com/"),
+            os.getenv("AMAZON_BASE_URL", "https://www.amazon.in/"),
+        ),
+        DINOEmbeddingsGenerator(max_workers=1),
+        SearchCache(
+            cache_dir, ttl_seconds=float(os.getenv("SEARCH_CACHE_TTL_SECONDS", "21600"))
+        ),
+        EmbeddingCache(cache_dir),
+        queries=read_queries(args.queries_file) + args.query,
+        query_log=QueryLog(cache_dir / "queries.jsonl"),
+        mined_queries=args.mined_queries,
+        max_load=args.max_load,
+        interval_seconds=args.interval,
+    )
+    if args.once:
+        warmed = asyncio.run(crawler.run_once())
+        logger.info("Pre-warmed %s queries.", warmed)
+    else:
+        asyncio.run(crawler.run())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,203 @@
+import json
+import re
+from dataclasses import dataclass, field
+from typing import Any, Dict, Optional
+
+from Prompts_Versions import prompt_v2, prompts_v1, prompts_v3, prompts_v4, prompts_v5
+from services.text_prefilter import (
+    LEADING_FIELDS,
+    format_description,
+    leading_attributes,
+)
+
+# How a version's answer is turned into the comma-separated description.
+CSV = "csv"
+LABELLED = "labelled"
+JSON = "json"
+
+# "**Label**: value" lines of the labelled (v1-v3) answers.
+_LABEL_LINE_RE = re.compile(
+    r"^\s*(?:[-*]\s+)?(?:\d+[.)]\s*)?\*{0,2}([^:*\n]{1,40}?)\*{0,2}\s*:\s*(.+?)\s*$"
+)
+# Completed "key": "value" pairs, also in a truncated or streaming JSON answer.
+_JSON_PAIR_RE = re.compile(r'"(\w+)"\s*:\s*"((?:[^"\\]|\\.)*)"')
+
+# Labels of the labelled answers and the description field they fill.
+# Category and the gender-specific details are too vague to search with.
+LABEL_FIELDS = {
+    "garment type": "garment_type",
+    "gender": "gender",
+    "color": "colour",
+    "colour": "colour",
+    "fit": "fit",
+    "fabric/material": "material",
+    "material": "material",
+    "texture": "texture",
+    "closure type": "closure",
+    "neckline/collar": "neckline",
+    "sleeve type": "sleeves",
+    "pockets": "pockets",
+    "pattern": "design_features",
+    "style": "design_features",
+    "additional features": "design_features",
+    "additional design features": "design_features",
+    "length": "length",
+    "lining": "lining",
+    "branding or logos": "branding",
+    "occasion/use": "occasion",
+}
+
+
+def _unescape(value: str) -> str:
+    try:
+        return json.loads(f'"{value}"')
+    except ValueError:
+        return value
+
+
+@dataclass(frozen=True)
+class PromptVersion:
+    name: str
+    text: str
+    output: str = CSV
+    # Cap on completion tokens; None leaves it to the model.
+    max_tokens: Optional[int] = None
+    # Image detail requested from the vision model: "low", "high" or "auto".
+    image_detail: str = "auto"
+    # Structured output schema (``response_format.json_schema``) of JSON versions.
+    json_schema: Optional[Dict[str, Any]] = None
+    # Output key -> description field, for JSON versions.
+    key_fields: Dict[str, str] = field(default_factory=dict)
+
+    def render(self, garment_type: str, garment_layer: Optional[str]) -> str:
+        """Build the prompt for a garment.
+
+        Args:
+            garment_type (str): General type of garment (e.g., "upper").
+            garment_layer (Optional[str]): Specific layer or type (e.g., "jacket").
+
+        Returns:
+            str: Prompt for the vision model.
+        """
+        intro = f"You are analyzing an image of a {garment_type} garment."
+        if garment_layer:
+            intro += (
+                f" This garment specifically belongs to the {garment_layer.lower()}"
+                " layer."
+            )
+        return f"{intro}\n{self.text}"
+
+    def request_options(self) -> Dict[str, Any]:
+        """Return the extra chat completion arguments of this version."""
+        options: Dict[str, Any] = {}
+        if self.max_tokens:
+            options["max_tokens"] = self.max_tokens
+        if self.json_schema:
+            options["response_format"] = {
+                "type": "json_schema",
+                "json_schema": self.json_schema,
+            }
+        return options
+
+    def attributes(self, content: str) -> Dict[str, str]:
+        """Map a (possibly partial) labelled or JSON answer onto description fields."""
+        attributes: Dict[str, str] = {}
+        if self.output == JSON:
+            try:
+                parsed = json.loads(content)
+            except ValueError:
+                parsed = None
+            if isinstance(parsed, dict):
+                pairs = list(parsed.items())
+            else:
+                pairs = [
+                    (key, _unescape(value))
+                    for key, value in _JSON_PAIR_RE.findall(content)
+                ]
+            for key, value in pairs:
+                if key in self.key_fields and isinstance(value, str) and value:
+                    attributes[self.key_fields[key]] = value.strip()
+            return attributes
+        for line in content.splitlines():
+            match = _LABEL_LINE_RE.match(line)
+            if not match:
+                continue
+            label = match.group(1).strip().lower()
+            value = match.group(2).strip(" *")
+            target = LABEL_FIELDS.get(label)
+            if target is None or not value or value.lower() == "none":
+                continue
+            if target in attributes:
+                attributes[target] += f"; {value}"
+            else:
+                attributes[target] = value
+        return attributes
+
+    def description(self, content: str) -> str:
+        """Turn the model's answer into the comma-separated description."""
+        attributes = self.attributes(content) if self.output != CSV else None
+        if attributes:
+            return format_description(attributes)
+        # Join a line-per-attribute answer into the comma-separated format;
+        # also used when the model ignored the requested format.
+        return re.sub(r"\s*\n\s*", ", ", content.strip())
+
+    def leading_attributes(self, partial: str) -> Optional[Dict[str, str]]:
+        """Return the leading attributes of a streaming answer once final, or None."""
+        if self.output == CSV:
+            return leading_attributes(partial)
+        if self.output == LABELLED:
+            # The last line may still be growing.
+            partial = partial[: partial.rfind("\n") + 1]
+        attributes = self.attributes(partial)
+        if not all(attributes.get(name) for name in LEADING_FIELDS):
+            return None
+        return {name: attributes[name] for name in LEADING_FIELDS}
+
+
+PROMPT_VERSIONS: Dict[str, PromptVersion] = {}
+
+
+def register_prompt(version: PromptVersion) -> PromptVersion:
+    """Add a prompt version to the registry, replacing one of the same name."""
+    PROMPT_VERSIONS[version.name] = version
+    return version
+
+
+def get_prompt(name: str) -> PromptVersion:
+    """Look a prompt version up by name.
+
+    Raises:
+        ValueError: If no version has that name.
+    """
+    try:
+        return PROMPT_VERSIONS[name]
+    except KeyError:
+        raise ValueError(
+            f"Unknown prompt version '{name}'; expected one of "
+            f"{', '.join(PROMPT_VERSIONS)}."
+        )
+
+
+# v1-v3 answer with "**Label**: value" lines; v4 with comma-separated values
+# in DESCRIPTION_FIELDS order; v5 with a compact JSON object, capped and
+# looking at a low-detail image.
+register_prompt(PromptVersion("v1", prompts_v1.prompt, output=LABELLED))
+register_prompt(PromptVersion("v2", prompt_v2.prompt, output=LABELLED))
+register_prompt(PromptVersion("v3", prompts_v3.prompt, output=LABELLED))
+register_prompt(PromptVersion("v4", prompts_v4.prompt, output=CSV))
+register_prompt(
+    PromptVersion(
+        "v5",
+        prompts_v5.prompt,
+        output=JSON,
+        max_tokens=120,
+        image_detail="low",
+        json_schema=prompts_v5.schema,
+        key_fields={
+            key: {"type": "garment_type", "details": "design_features"}.get(key, key)
+            for key in prompts_v5.fields
+        },
+    )
+)
+DEFAULT_PROMPT_VERSION = "v4"
@@ -0,0 +1,222 @@
+import logging
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from utils.metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+QUALITY_TIER_REQUESTS = REGISTRY.counter(
+    "stylefinder_quality_tier_requests_total",
+    "Searches served, by quality tier.",
+    labelnames=("tier",),
+)
+QUALITY_TIER_CHANGES = REGISTRY.counter(
+    "stylefinder_quality_tier_changes_total",
+    "Automatic switches between quality tiers, by the tier switched to.",
+    labelnames=("tier",),
+)
+QUALITY_TIER_ACTIVE = REGISTRY.gauge(
+    "stylefinder_quality_tier_level",
+    "Index of the quality tier in use; 0 is the full tier.",
+)
+
+
+@dataclass(frozen=True)
+class QualityTier:
+    name: str
+    google_results: int
+    amazon_results: int
+    # Candidates the prefilter passes on for embedding.
+    shortlist_size: int
+    # Key of the embeddings generator (and cascade) used by this tier.
+    model: str
+
+
+def default_tiers(
+    small_model: bool = True, shortlist_size: int = 24
+) -> List[QualityTier]:
+    """Return the tiers from best to cheapest.
+
+    The cheaper tiers scrape half the results and shortlist half the
+    candidates of the full tier.
+
+    Args:
+        small_model (bool): Include the tier running the small DINOv2 variant.
+        shortlist_size (int): Shortlist of the full tier. Defaults to 24.
+
+    Returns:
+        List[QualityTier]: full, reduced and, if enabled, small.
+    """
+    tiers = [
+        QualityTier(
+            "full",
+            google_results=40,
+            amazon_results=20,
+            shortlist_size=shortlist_size,
+            model="base",
+        ),
+        QualityTier(
+            "reduced",
+            google_results=20,
+            amazon_results=10,
+            shortlist_size=shortlist_size // 2,
+            model="base",
+        ),
+    ]
+    if small_model:
+        tiers.append(
+            QualityTier(
+                "small",
+                google_results=20,
+                amazon_results=10,
+                shortlist_size=shortlist_size // 2,
+                model="small",
+            )
+        )
+    return tiers
+
+
+class QualityController:
+    def __init__(
+        self,
+        tiers: Sequence[QualityTier],
+        queue_depth: Callable[[], float],
+        degrade_queue: float = 4,
+        recover_queue: float = 1,
+        degrade_latency: float = 25.0,
+        recover_latency: float = 12.0,
+        latency_window: int = 20,
+        min_dwell_seconds: float = 30.0,
+    ):
+        """Pick the quality tier of each search from load.
+
+        The controller steps one tier down when the queue depth reaches
+        ``degrade_queue`` or the 90th percentile of recent search latencies
+        reaches ``degrade_latency``, and one tier back up only once both are
+        at or below the lower recovery thresholds. A tier is kept for at
+        least ``min_dwell_seconds``, and latencies measured before a switch
+        are discarded, so it does not flap. Ops can pin a tier with
+        ``set_override``.
+
+        Args:
+            tiers (Sequence[QualityTier]): Tiers from best to cheapest.
+            queue_depth (Callable[[], float]): Current inference queue depth.
+            degrade_queue (float): Queue depth that triggers a step down. Defaults to 4.
+            recover_queue (float): Queue depth that allows a step up. Defaults to 1.
+            degrade_latency (float): p90 latency in seconds that triggers a step
+                down. Defaults to 25.
+            recover_latency (float): p90 latency in seconds that allows a step up.
+                Defaults to 12.
+            latency_window (int): Recent searches the percentile is taken over.
+                Defaults to 20.
+            min_dwell_seconds (float): Least time between switches. Defaults to 30.
+        """
+        if not tiers:
+            raise ValueError("At least one quality tier is required.")
+        self.tiers = list(tiers)
+        self.queue_depth = queue_depth
+        self.degrade_queue = degrade_queue
+        self.recover_queue = recover_queue
+        self.degrade_latency = degrade_latency
+        self.recover_latency = recover_latency
+        self.min_dwell_seconds = min_dwell_seconds
+        self.level = 0
+        self.override: Optional[str] = None
+        self._latencies: deque = deque(maxlen=latency_window)
+        self._changed_at = time.monotonic()
+        self._lock = threading.Lock()
+        QUALITY_TIER_ACTIVE.set_function(lambda: self.level)
+
+    def observe_latency(self, seconds: float) -> None:
+        """Record the duration of a finished search."""
+        with self._lock:
+            self._latencies.append(seconds)
+
+    def recent_latency(self) -> Optional[float]:
+        """Return the p90 of recent search latencies, or None without samples."""
+        with self._lock:
+            samples = list(self._latencies)
+        return float(np.percentile(samples, 90)) if samples else None
+
+    def _evaluate(self) -> None:
+        now = time.monotonic()
+        if now - self._changed_at < self.min_dwell_seconds:
+            return
+        depth = self.queue_depth()
+        latency = self.recent_latency()
+        overloaded = depth >= self.degrade_queue or (
+            latency is not None and latency >= self.degrade_latency
+        )
+        relaxed = depth <= self.recover_queue and (
+            latency is None or latency <= self.recover_latency
+        )
+        if overloaded and self.level < len(self.tiers) - 1:
+            step = 1
+        elif relaxed and self.level > 0:
+            step = -1
+        else:
+            return
+        with self._lock:
+            self.level += step
+            self._changed_at = now
+            self._latencies.clear()
+        tier = self.tiers[self.level]
+        QUALITY_TIER_CHANGES.inc(tier=tier.name)
+        logger.warning(
+            "Switched to quality tier '%s' (queue depth %g, p90 latency %.1fs).",
+            tier.name,
+            depth,
+            latency or 0,
+        )
+
+    def select(self) -> QualityTier:
+        """Return the tier for a new search."""
+        if self.override is not None:
+            tier = self.tier(self.override)
+        else:
+            self._evaluate()
+            tier = self.tiers[self.level]
+        QUALITY_TIER_REQUESTS.inc(tier=tier.name)
+        return tier
+
+    def tier(self, name: str) -> QualityTier:
+        """Look a tier up by name.
+
+        Raises:
+            ValueError: If no tier has that name.
+        """
+        for tier in self.tiers:
+            if tier.name == name:
+                return tier
+        raise ValueError(
+            f"Unknown quality tier '{name}'; expected one of "
+            f"{', '.join(tier.name for tier in self.tiers)}."
+        )
+
+    def set_override(self, name: Optional[str]) -> None:
+        """Pin a tier, or return to automatic selection with None.
+
+        Raises:
+            ValueError: If no tier has that name.
+        """
+        if name is not None:
+            self.tier(name)
+        self.override = name
+        logger.warning("Quality tier override set to %s.", name or "automatic")
+
+    def status(self) -> Dict[str, Any]:
+        """Describe the controller state for the ops endpoint."""
+        return {
+            "tier": (self.override or self.tiers[self.level].name),
+            "override": self.override,
+            "automatic_tier": self.tiers[self.level].name,
+            "queue_depth": self.queue_depth(),
+            "p90_latency_seconds": self.recent_latency(),
+            "tiers": [tier.name for tier in self.tiers],
+        }
@@ -0,0 +1,307 @@
+import asyncio
+import logging
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from PIL import Image
+
+from services.image_comparator import ImageComparator
+from utils.metrics import EMBEDDING_BATCH_SIZE, REGISTRY, track_stage
+
+logger = logging.getLogger(__name__)
+
+CASCADE_CANDIDATES = REGISTRY.counter(
+    "stylefinder_cascade_candidates_total",
+    "Candidates entering the prefilter and candidates shortlisted for DINOv2.",
+    labelnames=("stage",),
+)
+
+HUE_BINS = 8
+SATURATION_BINS = 3
+VALUE_BINS = 3
+ORIENTATION_BINS = 8
+SILHOUETTE_SIZE = 8
+# Product shots are mostly on white; ignore near-white pixels as background.
+BACKGROUND_THRESHOLD = 235
+
+
+def _load_thumbnail(file_path: str, size: int) -> Image.Image:
+    image = Image.open(file_path)
+    # JPEG draft mode decodes at a reduced scale, skipping most of the IDCT work.
+    image.draft("RGB", (size * 2, size * 2))
+    return image.convert("RGB").resize((size, size), Image.Resampling.BILINEAR)
+
+
+def compute_features(file_path: str, size: int = 32) -> np.ndarray:
+    """Compute the cheap colour and shape descriptor of an image.
+
+    The descriptor is a foreground HSV colour histogram followed by a
+    gradient-orientation histogram and a coarse foreground silhouette.
+
+    Args:
+        file_path (str): Path to the image file.
+        size (int): Side of the square thumbnail the features are computed on.
+
+    Returns:
+        np.ndarray: Feature vector of length ``colour_dims + shape_dims``.
+    """
+    thumbnail = _load_thumbnail(file_path, size)
+    rgb = np.asarray(thumbnail, dtype=np.uint8)
+    hsv = np.asarray(thumbnail.convert("HSV"), dtype=np.uint16)
+
+    foreground = ~np.all(rgb >= BACKGROUND_THRESHOLD, axis=2)
+    if not foreground.any():
+        foreground = np.ones(foreground.shape, dtype=bool)
+
+    hue = hsv[..., 0] * HUE_BINS // 256
+    saturation = hsv[..., 1] * SATURATION_BINS // 256
+    value = hsv[..., 2] * VALUE_BINS // 256
+    bins = (hue * SATURATION_BINS + saturation) * VALUE_BINS + value
+    colour = np.bincount(
+        bins[foreground], minlength=HUE_BINS * SATURATION_BINS * VALUE_BINS
+    ).astype(np.float32)
+    colour /= colour.sum()
+
+    gray = rgb.astype(np.float32).mean(axis=2)
+    gx = np.zeros_like(gray)
+    gy = np.zeros_like(gray)
+    gx[:, 1:-1] = gray[:, 2:] - gray[:, :-2]
+    gy[1:-1, :] = gray[2:, :] - gray[:-2, :]
+    magnitude = np.hypot(gx, gy)
+    orientation = (np.arctan2(gy, gx) % np.pi) * ORIENTATION_BINS / np.pi
+    edges = np.bincount(
+        np.minimum(orientation.astype(np.int64), ORIENTATION_BINS - 1).ravel(),
+        weights=magnitude.ravel(),
+        minlength=ORIENTATION_BINS,
+    ).astype(np.float32)
+    edges /= np.linalg.norm(edges) or 1.0
+
+    block = size // SILHOUETTE_SIZE
+    silhouette = (
+        foreground[: block * SILHOUETTE_SIZE, : block * SILHOUETTE_SIZE]
+        .reshape(SILHOUETTE_SIZE, block, SILHOUETTE_SIZE, block)
+        .mean(axis=(1, 3))
+        .astype(np.float32)
+        .ravel()
+    )
+    silhouette /= np.linalg.norm(silhouette) or 1.0
+
+    return np.concatenate([colour, edges, silhouette])
+
+
+COLOUR_DIMS = HUE_BINS * SATURATION_BINS * VALUE_BINS
+
+
+def prefilter_scores(
+    query: np.ndarray, candidates: np.ndarray, colour_weight: float = 0.6
+) -> np.ndarray:
+    """Score candidates against the query with the cheap descriptor.
+
+    Colour histograms are compared by histogram intersection, the shape part
+    by cosine similarity; both lie in [0, 1].
+
+    Args:
+        query (np.ndarray): Query features, shape (D,).
+        candidates (np.ndarray): Candidate features, shape (N, D).
+        colour_weight (float): Weight of the colour term. Defaults to 0.6.
+
+    Returns:
+        np.ndarray: Scores, shape (N,).
+    """
+    colour = np.minimum(candidates[:, :COLOUR_DIMS], query[:COLOUR_DIMS]).sum(axis=1)
+    edges_end = COLOUR_DIMS + ORIENTATION_BINS
+    edges = candidates[:, COLOUR_DIMS:edges_end] @ query[COLOUR_DIMS:edges_end]
+    silhouette = candidates[:, edges_end:] @ query[edges_end:]
+    shape = 0.5 * (edges + silhouette)
+    return colour_weight * colour + (1.0 - colour_weight) * shape
+
+
+class CascadeRanker:
+    def __init__(
+        self,
+        embeddings_generator: Any,
+        comparator: ImageComparator,
+        shortlist_size: int = 24,
+        thumbnail_size: int = 32,
+        colour_weight: float = 0.6,
+        embedding_cache: Any = None,
+        min_score: float = 0.35,
+    ):
+        """Rank candidates with a cheap colour/shape prefilter ahead of DINOv2.
+
+        Stage one scores every candidate on a small thumbnail and drops those
+        scoring below ``min_score``; of the rest, at most ``shortlist_size``
+        (the best) are embedded and ranked by cosine similarity. Candidates
+        past the cap are not returned, so a search yields at most
+        ``shortlist_size`` results.
+
+        Args:
+            embeddings_generator (Any): DINOEmbeddingsGenerator used for the final stage.
+            comparator (ImageComparator): Comparator used for the final ranking.
+            shortlist_size (int): Most candidates passed to DINOv2; 0 disables
+                the prefilter. Defaults to 24.
+            thumbnail_size (int): Thumbnail side for the prefilter. Defaults to 32.
+            colour_weight (float): Weight of colour vs. shape. Defaults to 0.6.
+            embedding_cache (Any): EmbeddingCache consulted before, and filled
+                after, running DINOv2. Defaults to None.
+            min_score (float): Prefilter score below which a candidate is a
+                clear mismatch and dropped; 0 keeps every candidate up to the
+                cap. Defaults to 0.35.
+        """
+        self.embeddings_generator = embeddings_generator
+        self.comparator = comparator
+        self.shortlist_size = shortlist_size
+        self.thumbnail_size = thumbnail_size
+        self.colour_weight = colour_weight
+        self.embedding_cache = embedding_cache
+        self.min_score = min_score
+
+    def _feature_matrix(self, file_paths: List[str]) -> np.ndarray:
+        return np.stack(
+            [compute_features(path, self.thumbnail_size) for path in file_paths]
+        )
+
+    async def prefilter(
+        self,
+        query_path: str,
+        candidates: List[Dict[str, Any]],
+        shortlist_size: Optional[int] = None,
+    ) -> List[Dict[str, Any]]:
+        """Drop clear mismatches and keep the best remaining candidates.
+
+        Args:
+            query_path (str): Path to the query image.
+            candidates (List[Dict[str, Any]]): Items with a ``local_image_path``.
+            shortlist_size (Optional[int]): Overrides the configured shortlist size.
+
+        Returns:
+            List[Dict[str, Any]]: The shortlist, best prefilter score first.
+        """
+        size = self.shortlist_size if shortlist_size is None else shortlist_size
+        CASCADE_CANDIDATES.inc(len(candidates), stage="input")
+        if size <= 0 or (len(candidates) <= size and self.min_score <= 0):
+            CASCADE_CANDIDATES.inc(len(candidates), stage="shortlisted")
+            return candidates
+
+        try:
+            features = await asyncio.to_thread(
+                self._feature_matrix,
+                [query_path] + [item["local_image_path"] for item in candidates],
+            )
+        except Exception as e:
+            logger.warning("Prefilter failed, keeping all candidates: %s", e)
+            CASCADE_CANDIDATES.inc(len(candidates), stage="shortlisted")
+            return candidates
+
+        scores = prefilter_scores(features[0], features[1:], self.colour_weight)
+        order = np.argsort(-scores, kind="stable")
+        keep = order[scores[order] >= self.min_score][:size]
+        CASCADE_CANDIDATES.inc(len(keep), stage="shortlisted")
+        logger.info("Prefilter kept %s of %s candidates.", len(keep), len(candidates))
+        return [candidates[index] for index in keep]
+
+    async def embed(self, candidates: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Attach DINOv2 embeddings under ``vectors``, reusing cached ones.
+
+        Args:
+            candidates (List[Dict[str, Any]]): Items with a ``local_image_path``.
+
+        Returns:
+            List[Dict[str, Any]]: The items that could be embedded, in order.
+        """
+        model = getattr(self.embeddings_generator, "model_name", "")
+        vectors: List[Optional[np.ndarray]] = [None] * len(candidates)
+        missing = list(range(len(candidates)))
+        if self.embedding_cache is not None:
+            for index, item in enumerate(candidates):
+                vectors[index] = self.embedding_cache.get(model, item.get("image_url"))
+            missing = [index for index, vector in enumerate(vectors) if vector is None]
+
+        EMBEDDING_BATCH_SIZE.observe(len(missing))
+        if missing:
+            computed = await self.embeddings_generator.generate_embeddings_batch(
+                [candidates[index]["local_image_path"] for index in missing]
+            )
+            for index, vector in zip(missing, computed):
+                vectors[index] = vector
+                if vector is not None and self.embedding_cache is not None:
+                    self.embedding_cache.put(
+                        model, candidates[index].get("image_url"), vector
+                    )
+
+        embedded = []
+        for item, vector in zip(candidates, vectors):
+            if vector is not None:
+                item["vectors"] = vector
+                embedded.append(item)
+        return embedded
+
+    async def rank(
+        self,
+        query_vector: np.ndarray,
+        query_path: str,
+        candidates: List[Dict[str, Any]],
+        keep_vectors: bool = False,
+        shortlist_size: Optional[int] = None,
+    ) -> List[Dict[str, Any]]:
+        """Run the cascade and return the shortlist sorted by cosine similarity.
+
+        Args:
+            query_vector (np.ndarray): DINOv2 embedding of the query image.
+            query_path (str): Path to the query image.
+            candidates (List[Dict[str, Any]]): Items with a ``local_image_path``.
+            keep_vectors (bool): Leave each item's embedding under ``vectors``.
+                Defaults to False.
+            shortlist_size (Optional[int]): Overrides the configured shortlist size.
+
+        Returns:
+            List[Dict[str, Any]]: Shortlisted items with ``cosine_similarity``.
+        """
+        with track_stage("prefilter"):
+            shortlist = await self.prefilter(query_path, candidates, shortlist_size)
+        with track_stage("embed_candidates"):
+            shortlist = await self.embed(shortlist)
+        with track_stage("rank"):
+            return await self.comparator.sort_dicts_by_similarity(
+                query_vector, shortlist, cleanup=False, drop_vectors=not keep_vectors
+            )
+
+    async def evaluate_recall(
+        self,
+        query_vector: np.ndarray,
+        query_path: str,
+        candidates: List[Dict[str, Any]],
+        k: int = 10,
+        shortlist_sizes: Optional[List[int]] = None,
+    ) -> Dict[int, float]:
+        """Measure how much of the full DINOv2 top-k survives the prefilter.
+
+        Embeds every candidate, so this is meant for offline evaluation.
+
+        Args:
+            query_vector (np.ndarray): DINOv2 embedding of the query image.
+            query_path (str): Path to the query image.
+            candidates (List[Dict[str, Any]]): Items with a ``local_image_path``.
+            k (int): Size of the reference top-k. Defaults to 10.
+            shortlist_sizes (Optional[List[int]]): Shortlist sizes to evaluate.
+                Defaults to the configured size.
+
+        Returns:
+            Dict[int, float]: Recall@k per shortlist size.
+        """
+        items = await self.embed([dict(item) for item in candidates])
+        full = sorted(
+            items,
+            key=lambda item: self.comparator.cosine_similarity(
+                query_vector, item["vectors"]
+            ),
+            reverse=True,
+        )
+        reference = {id(item) for item in full[:k]}
+
+        recall = {}
+        for size in shortlist_sizes or [self.shortlist_size]:
+            shortlist = await self.prefilter(query_path, items, shortlist_size=size)
+            kept = reference & {id(item) for item in shortlist}
+            recall[size] = len(kept) / len(reference) if reference else 1.0
+        return recall
@@ -0,0 +1,185 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+from uuid import uuid4
+
+import numpy as np
+
+from utils.metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+RESULT_SETS = REGISTRY.gauge(
+    "stylefinder_result_sets",
+    "Ranked result sets held for pagination and more-like-this queries.",
+)
+
+
+@dataclass
+class ResultSet:
+    id: str
+    description: str
+    items: List[Dict[str, Any]]
+    # Row-normalized embeddings aligned with ``items``; None when the items
+    # were stored without embeddings.
+    vectors: Optional[np.ndarray]
+    expires_at: float
+    metadata: Dict[str, Any] = field(default_factory=dict)
+
+
+class ResultStore:
+    def __init__(self, ttl_seconds: float = 900.0, max_sets: int = 256):
+        """Keep ranked result sets, with their vectors, for follow-up requests.
+
+        Sets expire ``ttl_seconds`` after they were last stored or read, and the
+        least recently used set is evicted beyond ``max_sets``.
+
+        Args:
+            ttl_seconds (float): Lifetime of an unused set. Defaults to 900.
+            max_sets (int): Most sets held at once. Defaults to 256.
+        """
+        self.ttl_seconds = ttl_seconds
+        self.max_sets = max_sets
+        self._sets: "OrderedDict[str, ResultSet]" = OrderedDict()
+        self._lock = threading.Lock()
+        RESULT_SETS.set_function(lambda: len(self._sets))
+
+    def _expire(self, now: float) -> None:
+        expired = [key for key, entry in self._sets.items() if entry.expires_at <= now]
+        for key in expired:
+            del self._sets[key]
+
+    def put(
+        self,
+        description: str,
+        items: List[Dict[str, Any]],
+        metadata: Optional[Dict[str, Any]] = None,
+    ) -> ResultSet:
+        """Store a ranked list, moving each item's ``vectors`` into the set.
+
+        Args:
+            description (str): Description the items were searched with.
+            items (List[Dict[str, Any]]): Ranked items; ``vectors`` is removed
+                from each so the items can be serialized as they are.
+            metadata (Optional[Dict[str, Any]]): Extra data kept with the set.
+
+        Returns:
+            ResultSet: The stored set.
+        """
+        vectors = None
+        if items and all(item.get("vectors") is not None for item in items):
+            vectors = np.vstack(
+                [np.asarray(item.pop("vectors"), np.float32).ravel() for item in items]
+            )
+            norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+            vectors /= np.where(norms == 0, 1.0, norms)
+        else:
+            for item in items:
+                item.pop("vectors", None)
+
+        now = time.monotonic()
+        result_set = ResultSet(
+            id=uuid4().hex,
+            description=description,
+            items=items,
+            vectors=vectors,
+            expires_at=now + self.ttl_seconds,
+            metadata=dict(metadata or {}),
+        )
+        with self._lock:
+            self._expire(now)
+            self._sets[result_set.id] = result_set
+            while len(self._sets) > self.max_sets:
+                self._sets.popitem(last=False)
+        return result_set
+
+    def get(self, result_set_id: str) -> Optional[ResultSet]:
+        """Return a live set and extend its lifetime, or None.
+
+        Args:
+            result_set_id (str): Id returned by ``put``.
+
+        Returns:
+            Optional[ResultSet]: The set, or None if unknown or expired.
+        """
+        now = time.monotonic()
+        with self._lock:
+            self._expire(now)
+            result_set = self._sets.get(result_set_id)
+            if result_set is not None:
+                result_set.expires_at = now + self.ttl_seconds
+                self._sets.move_to_end(result_set_id)
+            return result_set
+
+    def page(
+        self, result_set: ResultSet, cursor: Optional[str], limit: int
+    ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """Slice a page of items.
+
+        Args:
+            result_set (ResultSet): Set to page through.
+            cursor (Optional[str]): Cursor from the previous page; None starts
+                at the top.
+            limit (int): Page size.
+
+        Raises:
+            ValueError: If the cursor is malformed.
+
+        Returns:
+            Tuple[List[Dict[str, Any]], Optional[str]]: Items and the cursor of
+            the next page, or None on the last page.
+        """
+        try:
+            offset = int(cursor) if cursor else 0
+        except ValueError:
+            raise ValueError(f"Invalid cursor: {cursor}")
+        if offset < 0:
+            raise ValueError(f"Invalid cursor: {cursor}")
+        end = offset + limit
+        next_cursor = str(end) if end < len(result_set.items) else None
+        return result_set.items[offset:end], next_cursor
+
+    def more_like_this(self, result_set: ResultSet, index: int) -> ResultSet:
+        """Re-rank a set by similarity to one of its items.
+
+        The ranking reuses the stored vectors, so no scraping or inference is
+        needed. The result is stored as a new, pageable set.
+
+        Args:
+            result_set (ResultSet): Set holding the item.
+            index (int): Position of the item in the set.
+
+        Raises:
+            ValueError: If the set has no vectors.
+            IndexError: If ``index`` is out of range.
+
+        Returns:
+            ResultSet: Other items of the set, most similar first.
+        """
+        if result_set.vectors is None:
+            raise ValueError("This result set has no stored vectors.")
+        if not 0 <= index < len(result_set.items):
+            raise IndexError(f"No result at position {index}.")
+
+        similarity = result_set.vectors @ result_set.vectors[index]
+        order = [int(i) for i in np.argsort(-similarity, kind="stable") if i != index]
+        items = [
+            {**result_set.items[i], "cosine_similarity": float(similarity[i])}
+            for i in order
+        ]
+        for item in items:
+            item.pop("score", None)
+        derived = self.put(
+            result_set.description,
+            items,
+            metadata={
+                **result_set.metadata,
+                "parent": result_set.id,
+                "seed_index": index,
+            },
+        )
+        derived.vectors = result_set.vectors[order]
+        return derived
@@ -0,0 +1,322 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Dict, Iterable, Optional
+
+from utils.metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+SOURCE_CALLS = REGISTRY.counter(
+    "stylefinder_source_calls_total",
+    "Retailer searches, by source and outcome (success, slow, failure, rejected).",
+    labelnames=("source", "outcome"),
+)
+SOURCE_CIRCUIT_STATE = REGISTRY.gauge(
+    "stylefinder_source_circuit_state",
+    "Circuit breaker state per retailer: 0 closed, 1 half-open, 2 open.",
+    labelnames=("source",),
+)
+SOURCE_CONCURRENCY_LIMIT = REGISTRY.gauge(
+    "stylefinder_source_concurrency_limit",
+    "Concurrent searches currently allowed per retailer.",
+    labelnames=("source",),
+)
+SOURCE_IN_FLIGHT = REGISTRY.gauge(
+    "stylefinder_source_in_flight",
+    "Searches running against each retailer.",
+    labelnames=("source",),
+)
+
+CLOSED = "closed"
+HALF_OPEN = "half_open"
+OPEN = "open"
+_STATE_LEVELS = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+class SourceUnavailableError(RuntimeError):
+    """Raised instead of calling a retailer whose circuit is open."""
+
+
+class CircuitBreaker:
+    def __init__(self, failure_threshold: int = 3, reset_seconds: float = 30.0):
+        """Stop calling a source after consecutive failures.
+
+        After ``failure_threshold`` failures in a row the circuit opens and
+        calls are rejected at once. Once ``reset_seconds`` have passed it is
+        half-open: a single probe call goes through, closing the circuit on
+        success and opening it again on failure.
+
+        Args:
+            failure_threshold (int): Consecutive failures that open the circuit.
+                Defaults to 3.
+            reset_seconds (float): Time the circuit stays open before a probe.
+                Defaults to 30.
+        """
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.failures = 0
+        self._opened_at: Optional[float] = None
+        self._probing = False
+
+    @property
+    def state(self) -> str:
+        if self._opened_at is None:
+            return CLOSED
+        if self._probing or time.monotonic() - self._opened_at >= self.reset_seconds:
+            return HALF_OPEN
+        return OPEN
+
+    def retry_after(self) -> float:
+        """Return the seconds until the next probe is allowed."""
+        if self._opened_at is None:
+            return 0.0
+        return max(0.0, self._opened_at + self.reset_seconds - time.monotonic())
+
+    def allow(self) -> bool:
+        """Return whether a call may go ahead, claiming the probe when half-open."""
+        state = self.state
+        if state == CLOSED:
+            return True
+        if state == OPEN or self._probing:
+            return False
+        self._probing = True
+        return True
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self._opened_at = None
+        self._probing = False
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self._probing or self.failures >= self.failure_threshold:
+            self._opened_at = time.monotonic()
+        self._probing = False
+
+    def release(self) -> None:
+        """Give up a claimed probe without an outcome (the call was cancelled)."""
+        self._probing = False
+
+
+class AIMDLimiter:
+    def __init__(
+        self,
+        initial: int = 2,
+        minimum: int = 1,
+        maximum: int = 4,
+        latency_target: float = 15.0,
+        decrease_factor: float = 0.5,
+    ):
+        """Limit concurrent calls, adapting the limit to how the source copes.
+
+        Additive increase, multiplicative decrease: every call that succeeds
+        within ``latency_target`` raises the limit by ``1 / limit`` (one slot
+        per limit's worth of good calls), while a failure or a slow call
+        multiplies it by ``decrease_factor``.
+
+        Args:
+            initial (int): Starting limit. Defaults to 2.
+            minimum (int): Lowest limit. Defaults to 1.
+            maximum (int): Highest limit. Defaults to 4.
+            latency_target (float): Seconds above which a call counts as slow.
+                Defaults to 15.
+            decrease_factor (float): Multiplier applied on failure. Defaults to 0.5.
+        """
+        self.minimum = minimum
+        self.maximum = maximum
+        self.latency_target = latency_target
+        self.decrease_factor = decrease_factor
+        self.limit = float(min(max(initial, minimum), maximum))
+        self.in_flight = 0
+        self._waiters: deque = deque()
+
+    async def acquire(self) -> None:
+        """Wait for a free slot and take it."""
+        while self.in_flight >= int(self.limit):
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                if waiter.done() and not waiter.cancelled():
+                    # Pass the wake-up on to the next waiter.
+                    self._wake()
+                raise
+            finally:
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+        self.in_flight += 1
+
+    def release(self, latency: Optional[float] = None, ok: bool = True) -> None:
+        """Free a slot and adjust the limit.
+
+        Args:
+            latency (Optional[float]): Duration of the call; None leaves the
+                limit unchanged (e.g. the call was cancelled).
+            ok (bool): Whether the call succeeded. Defaults to True.
+        """
+        self.in_flight -= 1
+        if latency is not None:
+            if ok and latency <= self.latency_target:
+                self.limit = min(float(self.maximum), self.limit + 1.0 / self.limit)
+            else:
+                self.limit = max(float(self.minimum), self.limit * self.decrease_factor)
+        self._wake()
+
+    def _wake(self) -> None:
+        free = int(self.limit) - self.in_flight
+        while free > 0 and self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                free -= 1
+
+
+class SourceHealth:
+    def __init__(self, name: str, breaker: CircuitBreaker, limiter: AIMDLimiter):
+        """Guard the calls to one retailer with a circuit breaker and a limiter.
+
+        Args:
+            name (str): Retailer key, used in metrics and logs.
+            breaker (CircuitBreaker): Breaker of this retailer.
+            limiter (AIMDLimiter): Concurrency limiter of this retailer.
+        """
+        self.name = name
+        self.breaker = breaker
+        self.limiter = limiter
+        SOURCE_CIRCUIT_STATE.set_function(
+            lambda: _STATE_LEVELS[self.breaker.state], source=name
+        )
+        SOURCE_CONCURRENCY_LIMIT.set_function(
+            lambda: int(self.limiter.limit), source=name
+        )
+        SOURCE_IN_FLIGHT.set_function(lambda: self.limiter.in_flight, source=name)
+
+    async def call(self, fn: Callable[..., Awaitable[Any]], *args, **kwargs) -> Any:
+        """Run ``fn`` if the circuit allows it, once a concurrency slot is free.
+
+        ``fn`` is a scraper's ``scrape_and_save`` and any exception it raises,
+        including ``EmptyListingError`` for a search page without products,
+        counts as a failure. It is passed an ``on_listing`` callback; the
+        latency the limiter adapts to ends when the listing is reported, so
+        image downloads and the title filter do not throttle searches. Calls
+        that never report a listing are timed in full.
+
+        Raises:
+            SourceUnavailableError: If the circuit is open.
+        """
+        if not self.breaker.allow():
+            SOURCE_CALLS.inc(source=self.name, outcome="rejected")
+            raise SourceUnavailableError(
+                f"{self.name} is unavailable; retrying in "
+                f"{self.breaker.retry_after():.0f}s."
+            )
+        try:
+            await self.limiter.acquire()
+        except BaseException:
+            self.breaker.release()
+            raise
+
+        start = time.perf_counter()
+        listing_latency: Optional[float] = None
+
+        def on_listing(products: Any) -> None:
+            nonlocal listing_latency
+            if listing_latency is None:
+                listing_latency = time.perf_counter() - start
+
+        try:
+            result = await fn(*args, on_listing=on_listing, **kwargs)
+        except asyncio.CancelledError:
+            self.limiter.release()
+            self.breaker.release()
+            raise
+        except Exception:
+            self.limiter.release(time.perf_counter() - start, ok=False)
+            previous = self.breaker.state
+            self.breaker.record_failure()
+            SOURCE_CALLS.inc(source=self.name, outcome="failure")
+            if self.breaker.state == OPEN and previous != OPEN:
+                logger.warning(
+                    "Circuit for %s opened after %s consecutive failures.",
+                    self.name,
+                    self.breaker.failures,
+                )
+            raise
+
+        if listing_latency is not None:
+            latency = listing_latency
+        else:
+            latency = time.perf_counter() - start
+        self.limiter.release(latency, ok=True)
+        if self.breaker.state == HALF_OPEN:
+            logger.info("Circuit for %s closed after a successful probe.", self.name)
+        self.breaker.record_success()
+        slow = latency > self.limiter.latency_target
+        SOURCE_CALLS.inc(source=self.name, outcome="slow" if slow else "success")
+        return result
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "state": self.breaker.state,
+            "consecutive_failures": self.breaker.failures,
+            "concurrency_limit": int(self.limiter.limit),
+            "in_flight": self.limiter.in_flight,
+        }
+
+
+class RetailerHealth:
+    def __init__(
+        self,
+        sources: Iterable[str],
+        failure_threshold: int = 3,
+        reset_seconds: float = 30.0,
+        initial_concurrency: int = 2,
+        max_concurrency: int = 4,
+        latency_target: float = 15.0,
+    ):
+        """Per-retailer circuit breakers and adaptive concurrency limits.
+
+        A retailer that keeps failing (changed markup, throttling) is skipped
+        at once instead of every search waiting out the scraper timeouts;
+        see ``CircuitBreaker`` and ``AIMDLimiter``.
+
+        Args:
+            sources (Iterable[str]): Retailer keys, e.g. "google" and "amazon".
+            failure_threshold (int): Consecutive failures that open a circuit.
+                Defaults to 3.
+            reset_seconds (float): Time a circuit stays open before a probe.
+                Defaults to 30.
+            initial_concurrency (int): Starting concurrency limit. Defaults to 2.
+            max_concurrency (int): Highest concurrency limit. Defaults to 4.
+            latency_target (float): Seconds above which a search counts as slow
+                and lowers the limit. Defaults to 15.
+        """
+        self.sources = {
+            name: SourceHealth(
+                name,
+                CircuitBreaker(failure_threshold, reset_seconds),
+                AIMDLimiter(
+                    initial=initial_concurrency,
+                    maximum=max_concurrency,
+                    latency_target=latency_target,
+                ),
+            )
+            for name in sources
+        }
+
+    async def call(
+        self, source: str, fn: Callable[..., Awaitable[Any]], *args, **kwargs
+    ) -> Any:
+        """Call ``fn`` through the breaker and limiter of ``source``.
+
+        Raises:
+            SourceUnavailableError: If the circuit of ``source`` is open.
+        """
+        return await self.sources[source].call(fn, *args, **kwargs)
+
+    def status(self) -> Dict[str, Dict[str, Any]]:
+        """Describe each retailer's circuit and concurrency limit."""
+        return {name: source.status() for name, source in self.sources.items()}
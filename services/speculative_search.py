@@ -0,0 +1,105 @@
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from utils.metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+SPECULATIVE_SEARCHES = REGISTRY.counter(
+    "stylefinder_speculative_searches_total",
+    "Searches started from the leading description attributes, by outcome.",
+    labelnames=("outcome",),
+)
+
+SearchFunction = Callable[[str, Dict[str, str]], Awaitable[List[Dict[str, Any]]]]
+
+
+def build_query(attributes: Dict[str, str]) -> str:
+    """Build a short search query from the leading description attributes.
+
+    Args:
+        attributes (Dict[str, str]): At least garment type, gender and colour.
+
+    Returns:
+        str: Query such as "Man Solid black Bomber jacket".
+    """
+    return " ".join(
+        attributes[field]
+        for field in ("gender", "colour", "garment_type")
+        if attributes.get(field)
+    )
+
+
+class SpeculativeSearch:
+    def __init__(self, search: SearchFunction, min_results: int = 10):
+        """Start the product search before the description has finished streaming.
+
+        ``start`` launches ``search`` with a short query built from the leading
+        attributes; ``resolve`` then either reuses those results or, when the
+        early search failed or found too little, searches again with the full
+        description.
+
+        Args:
+            search (SearchFunction): Coroutine taking the search term and the
+                attributes used to filter titles, returning scraped products.
+            min_results (int): Fewest early results worth reusing. Defaults to 10.
+        """
+        self.search = search
+        self.min_results = min_results
+        self.query: Optional[str] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self, attributes: Dict[str, str]) -> None:
+        """Launch the early search; suitable as ``on_leading_attributes``.
+
+        Args:
+            attributes (Dict[str, str]): Garment type, gender and colour.
+        """
+        if self._task is not None:
+            return
+        self.query = build_query(attributes)
+        logger.info("Starting speculative search for '%s'.", self.query)
+        self._task = asyncio.create_task(self.search(self.query, attributes))
+
+    async def resolve(
+        self, description: str, attributes: Dict[str, str]
+    ) -> Tuple[List[Dict[str, Any]], str]:
+        """Reconcile the early search with the final description.
+
+        Args:
+            description (str): The complete description.
+            attributes (Dict[str, str]): All parsed description attributes.
+
+        Returns:
+            Tuple[List[Dict[str, Any]], str]: Products and how they were
+            obtained: "reused", "refined" (early search found too little),
+            "failed" (early search raised) or "not_started".
+        """
+        outcome = "not_started"
+        if self._task is not None:
+            try:
+                results = await self._task
+                if len(results) >= self.min_results:
+                    SPECULATIVE_SEARCHES.inc(outcome="reused")
+                    return results, "reused"
+                outcome = "refined"
+                logger.info(
+                    "Speculative search found %s products, searching with the full description.",
+                    len(results),
+                )
+            except Exception as e:
+                outcome = "failed"
+                logger.warning("Speculative search failed: %s", e)
+        SPECULATIVE_SEARCHES.inc(outcome=outcome)
+        return await self.search(description, attributes), outcome
+
+    def cancel(self) -> None:
+        """Cancel the early search if it is still running."""
+        if self._task is None:
+            return
+        if not self._task.done():
+            self._task.cancel()
+        elif not self._task.cancelled():
+            # Mark a failure as retrieved; the request is already failing.
+            self._task.exception()
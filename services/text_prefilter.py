@@ -0,0 +1,311 @@
+import logging
+import re
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from utils.metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+TEXT_PREFILTER_PRODUCTS = REGISTRY.counter(
+    "stylefinder_text_prefilter_products_total",
+    "Products scored by the title prefilter, by outcome.",
+    labelnames=("outcome",),
+)
+
+# Order of the comma-separated values requested by the description prompt.
+DESCRIPTION_FIELDS = (
+    "garment_type",
+    "gender",
+    "colour",
+    "fit",
+    "material",
+    "texture",
+    "closure",
+    "neckline",
+    "sleeves",
+    "pockets",
+    "design_features",
+    "length",
+    "lining",
+    "branding",
+    "occasion",
+)
+
+# Attributes a speculative search can start from once the stream has passed them.
+LEADING_FIELDS = ("garment_type", "gender", "colour")
+
+# Relative importance of each attribute when matching titles.
+FIELD_WEIGHTS = {
+    "garment_type": 3.0,
+    "colour": 1.5,
+    "material": 0.75,
+    "fit": 0.5,
+    "sleeves": 0.5,
+    "neckline": 0.5,
+    "length": 0.5,
+    "closure": 0.25,
+    "design_features": 0.25,
+    "texture": 0.25,
+    "occasion": 0.25,
+}
+
+GENDER_TOKENS = {
+    "man": "men",
+    "men": "men",
+    "mens": "men",
+    "male": "men",
+    "boy": "men",
+    "boys": "men",
+    "gent": "men",
+    "gents": "men",
+    "woman": "women",
+    "women": "women",
+    "womens": "women",
+    "female": "women",
+    "ladies": "women",
+    "lady": "women",
+    "girl": "women",
+    "girls": "women",
+    "unisex": "unisex",
+}
+# Title tokens that carry no signal about the garment.
+STOPWORDS = {
+    "a",
+    "an",
+    "and",
+    "for",
+    "in",
+    "of",
+    "on",
+    "the",
+    "to",
+    "with",
+    "no",
+    "none",
+    "solid",
+    "wear",
+}
+# Multiplier applied to a product whose title names the opposite gender.
+GENDER_MISMATCH_PENALTY = 0.2
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+_LABEL_RE = re.compile(
+    r"^\s*(?:[-*]\s+)?(?:\d+[.)]\s*)?(?:(?:\*\*)?[^:,*]{1,40}(?:\*\*)?:\s*)?"
+)
+
+
+def normalize_token(token: str) -> str:
+    """Fold plurals and gender synonyms onto a canonical token."""
+    if token in GENDER_TOKENS:
+        return GENDER_TOKENS[token]
+    if len(token) > 4 and token.endswith("es") and token[-3] in "sxz":
+        return token[:-2]
+    if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+        return token[:-1]
+    return token
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase, split and normalize text into index tokens."""
+    text = text.lower().replace("'s", "").replace("-", " ")
+    return [
+        normalize_token(token)
+        for token in _TOKEN_RE.findall(text)
+        if token not in STOPWORDS
+    ]
+
+
+def parse_description(description: str) -> Dict[str, str]:
+    """Split the comma-separated GPT-4o description into named attributes.
+
+    Values are matched to ``DESCRIPTION_FIELDS`` by position, so an empty
+    value leaves its attribute out; "Label: value" prefixes are stripped if
+    the model added them anyway.
+
+    Args:
+        description (str): Output of ``ImageDescriptionGenerator``.
+
+    Returns:
+        Dict[str, str]: Attribute name to value.
+    """
+    values = [_LABEL_RE.sub("", value).strip(" .*") for value in description.split(",")]
+    return {field: value for field, value in zip(DESCRIPTION_FIELDS, values) if value}
+
+
+def format_description(attributes: Dict[str, str]) -> str:
+    """Join named attributes into the comma-separated description.
+
+    The inverse of ``parse_description``: missing attributes keep their
+    position as empty values, and commas inside values become semicolons.
+
+    Args:
+        attributes (Dict[str, str]): Attribute name to value.
+
+    Returns:
+        str: Description such as "Bomber jacket, Man, Solid black".
+    """
+    values = [
+        attributes.get(field, "").replace(",", ";").strip()
+        for field in DESCRIPTION_FIELDS
+    ]
+    while values and not values[-1]:
+        values.pop()
+    return ", ".join(values)
+
+
+def leading_attributes(
+    partial: str, fields: Tuple[str, ...] = LEADING_FIELDS
+) -> Optional[Dict[str, str]]:
+    """Return the leading attributes of a streaming description once final.
+
+    A value is final once a separator follows it, since later tokens can only
+    extend the text after it.
+
+    Args:
+        partial (str): Description text received so far.
+        fields (Tuple[str, ...]): Leading fields that must be complete.
+
+    Returns:
+        Optional[Dict[str, str]]: The completed fields, or None while any of
+        them may still change.
+    """
+    complete = re.split(r"[,\n]", partial)[:-1]
+    attributes = parse_description(", ".join(complete))
+    if not all(attributes.get(field) for field in fields):
+        return None
+    return {field: attributes[field] for field in fields}
+
+
+class TitleIndex:
+    def __init__(self, titles: List[str]):
+        """Inverted token index over product titles.
+
+        Args:
+            titles (List[str]): Product names, indexed by position.
+        """
+        self.size = len(titles)
+        self.postings: Dict[str, Set[int]] = defaultdict(set)
+        for doc_id, title in enumerate(titles):
+            for token in tokenize(title or ""):
+                self.postings[token].add(doc_id)
+
+    def score(self, attributes: Dict[str, str]) -> List[float]:
+        """Score every title against the parsed description.
+
+        Each attribute contributes the weighted fraction of its tokens found in
+        a title. Scores are normalized to [0, 1] by the weight of attributes
+        that occur in at least one title, and titles naming the opposite gender
+        are penalized.
+
+        Args:
+            attributes (Dict[str, str]): Output of ``parse_description``.
+
+        Returns:
+            List[float]: Score per title, in index order.
+        """
+        scores = [0.0] * self.size
+        attainable = 0.0
+        for field, weight in FIELD_WEIGHTS.items():
+            tokens = set(tokenize(attributes.get(field, "")))
+            # Attributes no title mentions (e.g. lining) cannot separate products.
+            if not any(token in self.postings for token in tokens):
+                continue
+            attainable += weight
+            per_token = weight / len(tokens)
+            for token in tokens:
+                for doc_id in self.postings.get(token, ()):
+                    scores[doc_id] += per_token
+        if attainable:
+            scores = [score / attainable for score in scores]
+
+        gender = GENDER_TOKENS.get(
+            next(iter(tokenize(attributes.get("gender", ""))), ""), ""
+        )
+        opposite = {"men": "women", "women": "men"}.get(gender)
+        if opposite:
+            for doc_id in self.postings.get(opposite, ()):
+                if doc_id not in self.postings.get(gender, ()):
+                    scores[doc_id] *= GENDER_MISMATCH_PENALTY
+        return scores
+
+
+class TextPrefilter:
+    def __init__(self, min_score: float = 0.3, min_keep: int = 8):
+        """Drop products whose titles clearly do not match the description.
+
+        Args:
+            min_score (float): Products scoring below this are skipped.
+                Defaults to 0.3.
+            min_keep (int): Always keep at least this many of the best
+                products. Defaults to 8.
+        """
+        self.min_score = min_score
+        self.min_keep = min_keep
+
+    def filter(
+        self, products: List[Dict[str, Any]], attributes: Dict[str, str]
+    ) -> List[Dict[str, Any]]:
+        """Score products by title and return those worth downloading.
+
+        Every product gets a ``text_score``. Products without a usable name
+        are kept, since there is nothing to judge them by.
+
+        Args:
+            products (List[Dict[str, Any]]): Scraped products with a ``name``.
+            attributes (Dict[str, str]): Output of ``parse_description``.
+
+        Returns:
+            List[Dict[str, Any]]: Kept products, in their original order.
+        """
+        if not products or not attributes:
+            return products
+
+        named = [
+            product.get("name") not in (None, "", "No name available")
+            for product in products
+        ]
+        scores = TitleIndex([product.get("name") or "" for product in products]).score(
+            attributes
+        )
+        for product, score, has_name in zip(products, scores, named):
+            product["text_score"] = round(score, 4) if has_name else None
+
+        ranked = sorted(
+            (index for index, has_name in enumerate(named) if has_name),
+            key=lambda index: scores[index],
+            reverse=True,
+        )
+        keep = set(ranked[: self.min_keep])
+        keep.update(index for index in ranked if scores[index] >= self.min_score)
+        keep.update(index for index, has_name in enumerate(named) if not has_name)
+
+        kept = [product for index, product in enumerate(products) if index in keep]
+        TEXT_PREFILTER_PRODUCTS.inc(len(kept), outcome="kept")
+        TEXT_PREFILTER_PRODUCTS.inc(len(products) - len(kept), outcome="skipped")
+        logger.info("Title prefilter kept %s of %s products.", len(kept), len(products))
+        return kept
+
+
+def combine_scores(
+    results: List[Dict[str, Any]], text_weight: float
+) -> List[Dict[str, Any]]:
+    """Blend visual and title scores into ``score`` and re-sort.
+
+    Args:
+        results (List[Dict[str, Any]]): Items with ``cosine_similarity`` and
+            optionally ``text_score``.
+        text_weight (float): Weight of the title score in [0, 1].
+
+    Returns:
+        List[Dict[str, Any]]: Items sorted by the combined score.
+    """
+    for item in results:
+        text_score: Optional[float] = item.get("text_score")
+        if text_score is None:
+            item["score"] = item["cosine_similarity"]
+        else:
+            item["score"] = (1.0 - text_weight) * item[
+                "cosine_similarity"
+            ] + text_weight * text_score
+    return sorted(results, key=lambda item: item["score"], reverse=True)
@@ -0,0 +1,386 @@
+import asyncio
+import hashlib
+import io
+import logging
+import os
+import re
+import shutil
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from PIL import Image, ImageOps, features
+
+from utils.metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+THUMBNAIL_REQUESTS = REGISTRY.counter(
+    "stylefinder_thumbnail_requests_total",
+    "Thumbnail requests, by outcome (not_modified, hit, built, missing).",
+    labelnames=("outcome",),
+)
+THUMBNAIL_BUILD_SECONDS = REGISTRY.histogram(
+    "stylefinder_thumbnail_build_seconds",
+    "Time to decode, resize and encode one thumbnail.",
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0),
+)
+
+# Extension -> (PIL format, media type).
+FORMATS = {"webp": ("WEBP", "image/webp"), "jpg": ("JPEG", "image/jpeg")}
+# Thumbnails never change under a given name, so clients may keep them for a year.
+CACHE_CONTROL = "public, max-age=31536000, immutable"
+_NAME_RE = re.compile(r"([0-9a-f]{32})\.(webp|jpg)")
+# Staged sources whose build never ran (e.g. cancelled at shutdown) are
+# removed after this long.
+STALE_SOURCE_SECONDS = 3600
+
+
+def render_thumbnail(
+    source: Any, size: int = 320, extension: str = "webp", quality: int = 80
+) -> bytes:
+    """Decode an image and encode it as a thumbnail fitting in a square.
+
+    Args:
+        source (Any): Path or file object PIL can open.
+        size (int): Longest side of the thumbnail. Defaults to 320.
+        extension (str): "webp" or "jpg". Defaults to "webp".
+        quality (int): Encoder quality. Defaults to 80.
+
+    Returns:
+        bytes: Encoded thumbnail.
+    """
+    image_format = FORMATS[extension][0]
+    with Image.open(source) as image:
+        # JPEG draft mode decodes at a reduced scale, skipping most of the IDCT work.
+        image.draft("RGB", (size, size))
+        image = ImageOps.exif_transpose(image).convert("RGB")
+    image.thumbnail((size, size), Image.Resampling.LANCZOS, reducing_gap=2.0)
+    buffer = io.BytesIO()
+    if image_format == "WEBP":
+        image.save(buffer, format="WEBP", quality=quality, method=4)
+    else:
+        image.save(
+            buffer, format="JPEG", quality=quality, optimize=True, progressive=True
+        )
+    return buffer.getvalue()
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Evaluate an If-None-Match header against an ETag (weak comparison).
+
+    Args:
+        if_none_match (Optional[str]): Header value, possibly a list or "*".
+        etag (str): Current strong ETag, quoted.
+
+    Returns:
+        bool: True if the client's copy is current.
+    """
+    if not if_none_match:
+        return False
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in tags or etag in (tag.removeprefix("W/") for tag in tags)
+
+
+class ThumbnailService:
+    def __init__(
+        self,
+        thumbnail_dir: Path,
+        size: int = 320,
+        quality: int = 80,
+        extension: str = "webp",
+        max_workers: int = 2,
+        max_bytes: int = 256 * 1024 * 1024,
+    ):
+        """Serve small, content-addressed thumbnails of downloaded product images.
+
+        ``attach`` names each item's thumbnail after the hash of its source
+        image and the thumbnail settings, gives the item a ``thumbnail_url``
+        and starts building it in the worker pool. The source is hard-linked
+        (or copied) into ``thumbnail_dir/sources`` before ``attach`` returns,
+        so cleaning the per-request image directory, even while builds are
+        queued, cannot lose it; it is removed once the thumbnail is built.
+        Stored thumbnails never change, so they carry a strong ETag derived
+        from their name. The least recently served thumbnails are deleted
+        once the store exceeds ``max_bytes``.
+
+        Args:
+            thumbnail_dir (Path): Directory the thumbnails are stored in.
+            size (int): Longest side in pixels. Defaults to 320.
+            quality (int): Encoder quality. Defaults to 80.
+            extension (str): Format of the advertised URL, "webp" or "jpg";
+                falls back to "jpg" when Pillow lacks WebP. Defaults to "webp".
+            max_workers (int): Threads building thumbnails. Defaults to 2.
+            max_bytes (int): Size limit of the stored thumbnails.
+                Defaults to 256 MiB.
+        """
+        if extension == "webp" and not features.check("webp"):
+            logger.warning("Pillow has no WebP support, serving JPEG thumbnails.")
+            extension = "jpg"
+        if extension not in FORMATS:
+            raise ValueError(f"Unsupported thumbnail format: {extension}")
+        self.thumbnail_dir = Path(thumbnail_dir)
+        self.source_dir = self.thumbnail_dir / "sources"
+        self.source_dir.mkdir(parents=True, exist_ok=True)
+        self.size = size
+        self.quality = quality
+        self.extension = extension
+        self.max_bytes = max_bytes
+        # Bytes written since the store was last pruned.
+        self._written = 0
+        self._pending: Dict[Tuple[str, str], asyncio.Future] = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="thumbnail"
+        )
+        self._executor.submit(self.prune)
+
+    @staticmethod
+    def parse_name(name: str) -> Optional[Tuple[str, str]]:
+        """Split a thumbnail file name into its id and extension, or None."""
+        match = _NAME_RE.fullmatch(name)
+        return (match.group(1), match.group(2)) if match else None
+
+    @staticmethod
+    def etag(thumbnail_id: str, extension: str) -> str:
+        return f'"{thumbnail_id}.{extension}"'
+
+    @staticmethod
+    def media_type(extension: str) -> str:
+        return FORMATS[extension][1]
+
+    def path(self, thumbnail_id: str, extension: str) -> Path:
+        return self.thumbnail_dir / thumbnail_id[:2] / f"{thumbnail_id}.{extension}"
+
+    def _identify(self, file_path: str) -> Optional[str]:
+        digest = hashlib.sha256(f"{self.size}:{self.quality}:".encode())
+        try:
+            with open(file_path, "rb") as source:
+                while chunk := source.read(256 * 1024):
+                    digest.update(chunk)
+        except OSError as e:
+            logger.warning("Cannot read %s for a thumbnail: %s", file_path, e)
+            return None
+        return digest.hexdigest()[:32]
+
+    def source_path(self, thumbnail_id: str) -> Path:
+        return self.source_dir / thumbnail_id
+
+    def _stage(self, file_path: str, thumbnail_id: str) -> bool:
+        """Link the source next to the store so the build outlives the download."""
+        staged = self.source_path(thumbnail_id)
+        if staged.exists():
+            # Same id, same content.
+            return True
+        temporary = staged.with_name(f".{thumbnail_id}.{threading.get_ident()}.tmp")
+        try:
+            try:
+                os.link(file_path, temporary)
+            except OSError:
+                shutil.copyfile(file_path, temporary)
+            os.replace(temporary, staged)
+        except OSError as e:
+            logger.warning("Cannot stage %s for a thumbnail: %s", file_path, e)
+            return False
+        finally:
+            # rename() leaves both names when they link to the same file.
+            temporary.unlink(missing_ok=True)
+        return True
+
+    def _prepare(self, file_paths: List[Optional[str]]) -> List[Optional[str]]:
+        thumbnail_ids = []
+        for file_path in file_paths:
+            thumbnail_id = self._identify(file_path) if file_path else None
+            if (
+                thumbnail_id is not None
+                and not self.path(thumbnail_id, self.extension).exists()
+                and not self._stage(file_path, thumbnail_id)
+            ):
+                thumbnail_id = None
+            thumbnail_ids.append(thumbnail_id)
+        return thumbnail_ids
+
+    def _build(self, thumbnail_id: str, extension: str) -> Path:
+        target = self.path(thumbnail_id, extension)
+        staged = self.source_path(thumbnail_id)
+        try:
+            if target.exists():
+                return target
+            source = staged
+            if not source.exists():
+                # Derive other formats from a stored thumbnail.
+                stored = [
+                    self.path(thumbnail_id, other)
+                    for other in FORMATS
+                    if other != extension and self.path(thumbnail_id, other).exists()
+                ]
+                if not stored:
+                    raise FileNotFoundError(f"No source for thumbnail {thumbnail_id}")
+                source = stored[0]
+
+            start = time.perf_counter()
+            data = render_thumbnail(source, self.size, extension, self.quality)
+            THUMBNAIL_BUILD_SECONDS.observe(time.perf_counter() - start)
+            target.parent.mkdir(exist_ok=True)
+            temporary = target.with_name(f".{target.name}.{threading.get_ident()}.tmp")
+            temporary.write_bytes(data)
+            os.replace(temporary, target)
+        finally:
+            # The advertised format is built from the staged source; other
+            # formats can be derived from it later.
+            if extension == self.extension:
+                staged.unlink(missing_ok=True)
+
+        with self._lock:
+            self._written += len(data)
+            due = self._written > self.max_bytes // 20
+            if due:
+                self._written = 0
+        if due:
+            self.prune(keep=target)
+        return target
+
+    def prune(self, keep: Optional[Path] = None) -> None:
+        """Delete the least recently served thumbnails beyond ``max_bytes``.
+
+        Staged sources and temporary files older than an hour, left behind by
+        builds that never ran, are removed too.
+
+        Args:
+            keep (Optional[Path]): Thumbnail about to be served, never deleted.
+        """
+        now = time.time()
+        thumbnails = []
+        total = 0
+        for path in self.thumbnail_dir.glob("*/*"):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            if path.parent == self.source_dir or path.name.startswith("."):
+                # Hard links keep the download's mtime; ctime is the link time.
+                if now - stat.st_ctime > STALE_SOURCE_SECONDS:
+                    path.unlink(missing_ok=True)
+                continue
+            thumbnails.append((stat.st_mtime, stat.st_size, path))
+            total += stat.st_size
+        if total <= self.max_bytes:
+            return
+        removed = 0
+        for _, size, path in sorted(thumbnails):
+            if path == keep:
+                continue
+            path.unlink(missing_ok=True)
+            total -= size
+            removed += 1
+            if total <= self.max_bytes * 0.9:
+                break
+        logger.info("Pruned %s thumbnails, %.1f MB remain.", removed, total / 1e6)
+
+    def _schedule(self, thumbnail_id: str, extension: str) -> asyncio.Future:
+        key = (thumbnail_id, extension)
+        future = self._pending.get(key)
+        if future is None:
+            loop = asyncio.get_running_loop()
+            future = loop.run_in_executor(
+                self._executor, self._build, thumbnail_id, extension
+            )
+            self._pending[key] = future
+            future.add_done_callback(lambda _: self._pending.pop(key, None))
+        return future
+
+    async def attach(self, items: List[Dict[str, Any]]) -> None:
+        """Give items a ``thumbnail_url`` and start building their thumbnails.
+
+        Sources are staged before this returns, so the downloaded images may
+        be deleted afterwards. Items whose image cannot be read or staged
+        keep only their ``image_url``.
+
+        Args:
+            items (List[Dict[str, Any]]): Results with a ``local_image_path``.
+        """
+        # Not on the build pool: the response must not wait behind queued builds.
+        thumbnail_ids = await asyncio.to_thread(
+            self._prepare, [item.get("local_image_path") for item in items]
+        )
+        for item, thumbnail_id in zip(items, thumbnail_ids):
+            if thumbnail_id is None:
+                continue
+            item["thumbnail_url"] = f"/thumbnails/{thumbnail_id}.{self.extension}"
+            if not self.path(thumbnail_id, self.extension).exists():
+                future = self._schedule(thumbnail_id, self.extension)
+                # Failures surface when the thumbnail is requested; builds
+                # cancelled at shutdown are simply dropped.
+                future.add_done_callback(
+                    lambda done: done.cancelled() or done.exception()
+                )
+
+    def ensure(self, thumbnail_id: str, extension: str) -> bool:
+        """Return whether a thumbnail is stored or can be built.
+
+        A missing thumbnail with a source is scheduled for building without
+        waiting for it, so a revalidated client's next full request finds it.
+
+        Args:
+            thumbnail_id (str): Id from the thumbnail URL.
+            extension (str): "webp" or "jpg".
+
+        Returns:
+            bool: False if there is neither the thumbnail nor a source for it.
+        """
+        target = self.path(thumbnail_id, extension)
+        if target.exists():
+            try:
+                os.utime(target)
+            except OSError:
+                pass
+            return True
+        if (thumbnail_id, extension) in self._pending:
+            return True
+        if not self.source_path(thumbnail_id).exists() and not any(
+            self.path(thumbnail_id, other).exists() for other in FORMATS
+        ):
+            return False
+        future = self._schedule(thumbnail_id, extension)
+        # Nobody awaits this build; a failure only surfaces on the next get().
+        future.add_done_callback(lambda done: done.cancelled() or done.exception())
+        return True
+
+    async def get(self, thumbnail_id: str, extension: str) -> Optional[Path]:
+        """Return the stored thumbnail, waiting for or starting its build.
+
+        Args:
+            thumbnail_id (str): Id from the thumbnail URL.
+            extension (str): "webp" or "jpg".
+
+        Returns:
+            Optional[Path]: Thumbnail file, or None if it cannot be built.
+        """
+        target = self.path(thumbnail_id, extension)
+        if target.exists():
+            THUMBNAIL_REQUESTS.inc(outcome="hit")
+            try:
+                # Pruning removes the least recently served thumbnails first.
+                os.utime(target)
+            except OSError:
+                pass
+            return target
+        try:
+            await self._schedule(thumbnail_id, extension)
+        except FileNotFoundError:
+            THUMBNAIL_REQUESTS.inc(outcome="missing")
+            return None
+        except Exception as e:
+            logger.warning(
+                "Building thumbnail %s.%s failed: %s", thumbnail_id, extension, e
+            )
+            THUMBNAIL_REQUESTS.inc(outcome="missing")
+            return None
+        THUMBNAIL_REQUESTS.inc(outcome="built")
+        return target
+
+    def close(self) -> None:
+        """Stop the worker pool."""
+        self._executor.shutdown(wait=False, cancel_futures=True)
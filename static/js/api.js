@@ -18,6 +18,30 @@ class ApiService {
         console.log('Parsed API Response:', data); // Debugging log
         return data; // Return the full response object
     }
+
+    async getResultsPage(resultSetId, cursor) {
+        const response = await fetch(
+            `${this.baseUrl}/results/${resultSetId}?cursor=${encodeURIComponent(cursor)}`
+        );
+
+        if (!response.ok) {
+            throw new Error('Failed to load more results');
+        }
+
+        return response.json();
+    }
+
+    async moreLikeThis(resultSetId, index) {
+        const response = await fetch(`${this.baseUrl}/results/${resultSetId}/similar/${index}`, {
+            method: 'POST'
+        });
+
+        if (!response.ok) {
+            throw new Error('Failed to find similar items');
+        }
+
+        return response.json();
+    }
     
     
 }
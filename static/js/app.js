@@ -2,7 +2,7 @@
 document.addEventListener('DOMContentLoaded', () => {
     const imageUpload = new ImageUpload();
     const apiService = new ApiService();
-    const resultsHandler = new ResultsHandler();
+    const resultsHandler = new ResultsHandler(apiService);
 
     const form = document.getElementById('uploadForm');
     const garmentType = document.getElementById('garmentType');
@@ -1,11 +1,22 @@
 class ResultsHandler {
-    constructor() {
+    constructor(apiService = new ApiService()) {
+        this.apiService = apiService;
         this.resultsSection = document.getElementById('resultsSection');
         this.resultsGrid = document.getElementById('resultsGrid');
+        this.loadMoreButton = document.createElement('button');
+        this.loadMoreButton.type = 'button';
+        this.loadMoreButton.className = 'load-more';
+        this.loadMoreButton.textContent = 'Load more';
+        this.loadMoreButton.hidden = true;
+        this.loadMoreButton.addEventListener('click', () => this.loadMore());
+        this.resultsSection.appendChild(this.loadMoreButton);
+        this.resultSetId = null;
+        this.nextCursor = null;
+        this.shown = 0;
     }
 
     displayResults(response) {
-        const { data: { description, results } } = response;
+        const { data: { results } } = response;
 
         if (!Array.isArray(results)) {
             console.error('Expected results to be an array:', results);
@@ -14,38 +25,75 @@ class ResultsHandler {
 
         this.resultsSection.hidden = false;
         this.resultsGrid.innerHTML = '';
+        this.shown = 0;
+        this.appendPage(response.data);
+    }
 
-
+    appendPage({ result_set_id, results, next_cursor }) {
+        this.resultSetId = result_set_id;
+        this.nextCursor = next_cursor;
 
         results.forEach(result => {
-            const card = this.createResultCard(result);
+            const card = this.createResultCard(result, this.shown);
             this.resultsGrid.appendChild(card);
+            this.shown += 1;
         });
+
+        this.loadMoreButton.hidden = !this.nextCursor;
     }
 
-    createResultCard(result) {
+    async loadMore() {
+        if (!this.resultSetId || !this.nextCursor) return;
+
+        this.loadMoreButton.disabled = true;
+        try {
+            const response = await this.apiService.getResultsPage(this.resultSetId, this.nextCursor);
+            this.appendPage(response.data);
+        } catch (error) {
+            console.error('Error loading more results:', error);
+            alert('Results have expired. Please search again.');
+        } finally {
+            this.loadMoreButton.disabled = false;
+        }
+    }
+
+    async showSimilar(index) {
+        try {
+            const response = await this.apiService.moreLikeThis(this.resultSetId, index);
+            this.displayResults(response);
+            this.resultsSection.scrollIntoView({ behavior: 'smooth' });
+        } catch (error) {
+            console.error('Error finding similar items:', error);
+            alert('Results have expired. Please search again.');
+        }
+    }
+
+    createResultCard(result, index) {
         const similarityPercentage = (result.cosine_similarity * 100).toFixed(1);
         const name = result.name || 'No name available';
         const price = result.price || 'Price not available';
         const rating = result.rating ? `⭐ ${result.rating}` : '';
+        const offers = Array.isArray(result.offers) ? result.offers.length : 1;
     
         const card = document.createElement('div');
         card.className = 'result-card';
     
         card.innerHTML = `
             <div class="result-image-container">
-                <img src="${result.image_url}" alt="${name}" class="result-image" loading="lazy">
+                <img src="${result.thumbnail_url || result.image_url}" alt="${name}" class="result-image" loading="lazy" decoding="async">
             </div>
             <div class="result-info">
                 <h3 class="product-name">${name}</h3>
                 <p class="product-price">${price}</p>
                 ${rating ? `<p class="product-rating">${rating}</p>` : ''}
+                ${offers > 1 ? `<p class="product-offers">Available from ${offers} listings</p>` : ''}
                 <p class="similarity-score">
                     <svg xmlns="http://www.w3.org/2000/svg" width="16" height="16" viewBox="0 0 24 24" fill="none" stroke="currentColor" stroke-width="2" stroke-linecap="round" stroke-linejoin="round">
                         <path d="m6 9 6 6 6-6"/>
                     </svg>
                     ${similarityPercentage}% Match
                 </p>
+                <button type="button" class="more-like-this">More like this</button>
                 <a href="${result.product_url}" target="_blank" class="view-product">
                     View Product
                     <svg xmlns="http://www.w3.org/2000/svg" width="16" height="16" viewBox="0 0 24 24" fill="none" stroke="currentColor" stroke-width="2" stroke-linecap="round" stroke-linejoin="round">
@@ -56,6 +104,12 @@ class ResultsHandler {
                 </a>
             </div>
         `;
+        const image = card.querySelector('.result-image');
+        if (result.thumbnail_url && result.image_url) {
+            // Thumbnails can be missing (pruned or failed builds); show the original instead.
+            image.addEventListener('error', () => { image.src = result.image_url; }, { once: true });
+        }
+        card.querySelector('.more-like-this').addEventListener('click', () => this.showSimilar(index));
     
         return card;
     }
@@ -64,5 +118,8 @@ class ResultsHandler {
     clear() {
         this.resultsSection.hidden = true;
         this.resultsGrid.innerHTML = '';
+        this.loadMoreButton.hidden = true;
+        this.resultSetId = null;
+        this.nextCursor = null;
     }
 }
\ No newline at end of file
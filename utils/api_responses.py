@@ -1,32 +1,238 @@
-from fastapi.responses import JSONResponse
+import brotli
+from fastapi import Request
+from fastapi.responses import JSONResponse, Response
+import gzip
 import logging
-from typing import Any, Dict
+import numpy as np
+import orjson
+from typing import Any, Dict, Optional, Sequence
+from utils.metrics import REGISTRY, track_stage
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+RESPONSE_BYTES = REGISTRY.counter(
+    "stylefinder_response_bytes_total",
+    "Bytes of encoded success responses sent, by content encoding.",
+    labelnames=("encoding",),
+)
+
+# q-value given to identity when Accept-Encoding rates neither it nor "*".
+IDENTITY_QUALITY = 0.001
+
+# Result fields holding similarity scores, rounded on the wire.
+SCORE_FIELDS = ("cosine_similarity", "score", "text_score")
+
+
+class ResponseEncoder:
+    def __init__(
+        self,
+        score_decimals: Optional[int] = 4,
+        min_compress_bytes: int = 1024,
+        gzip_level: int = 5,
+        brotli_quality: int = 4,
+    ):
+        """Encode success responses compactly.
+
+        Bodies are serialized with orjson (UTF-8, no whitespace), scores of
+        result items are rounded to ``score_decimals``, clients may ask for a
+        subset of the result fields, and bodies of at least
+        ``min_compress_bytes`` are compressed with brotli or gzip, whichever
+        the client rates highest (brotli on a tie).
+
+        Args:
+            score_decimals (Optional[int]): Decimals kept in scores; None keeps
+                full precision. Defaults to 4.
+            min_compress_bytes (int): Smallest body that is compressed.
+                Defaults to 1024.
+            gzip_level (int): gzip compression level. Defaults to 5.
+            brotli_quality (int): brotli quality; low values suit dynamic
+                content. Defaults to 4.
+        """
+        self.score_decimals = score_decimals
+        self.min_compress_bytes = min_compress_bytes
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self.encodings = ("br", "gzip")
+
+    @staticmethod
+    def parse_fields(value: Optional[str]) -> Optional[Sequence[str]]:
+        """Parse a comma-separated ``fields`` parameter; None or empty means all."""
+        fields = [field.strip() for field in (value or "").split(",")]
+        return [field for field in fields if field] or None
+
+    def _shape_item(
+        self, item: Dict[str, Any], fields: Optional[Sequence[str]]
+    ) -> Dict[str, Any]:
+        # Stored result sets are shared, so items are copied, never modified.
+        if fields is not None:
+            item = {key: item[key] for key in fields if key in item}
+        if self.score_decimals is None:
+            return item
+        rounded = {
+            key: round(float(item[key]), self.score_decimals)
+            for key in SCORE_FIELDS
+            if isinstance(item.get(key), (float, np.floating))
+        }
+        return {**item, **rounded} if rounded else item
+
+    def _shape(self, data: Any, fields: Optional[Sequence[str]]) -> Any:
+        if isinstance(data, dict):
+            shaped = {}
+            for key, value in data.items():
+                if key == "results" and isinstance(value, list):
+                    shaped[key] = [self._shape_item(item, fields) for item in value]
+                elif key == "seed" and isinstance(value, dict):
+                    shaped[key] = self._shape_item(value, fields)
+                else:
+                    shaped[key] = self._shape(value, fields)
+            return shaped
+        if isinstance(data, list):
+            return [self._shape(value, fields) for value in data]
+        return data
+
+    def choose_encoding(
+        self, accept_encoding: Optional[str], compress: bool = True
+    ) -> Optional[str]:
+        """Pick the content encoding from an Accept-Encoding header, or None.
+
+        The accepted coding with the highest q-value wins; the order of
+        ``encodings``, then identity, only breaks ties. Identity stays
+        acceptable unless the header refuses it with ``identity;q=0`` or
+        ``*;q=0``, in which case even a body the server would not compress is
+        compressed.
+
+        Args:
+            accept_encoding (Optional[str]): Accept-Encoding header of the request.
+            compress (bool): Whether the body is worth compressing; when not,
+                it is sent uncompressed unless identity is refused. Defaults
+                to True.
+
+        Returns:
+            Optional[str]: "br" or "gzip", or None for an uncompressed body.
+        """
+        if not accept_encoding:
+            return None
+        accepted = {}
+        for part in accept_encoding.split(","):
+            name, *params = part.split(";")
+            quality = 1.0
+            for param in params:
+                key, _, value = param.strip().partition("=")
+                if key.strip().lower() == "q":
+                    try:
+                        quality = float(value)
+                    except ValueError:
+                        quality = 0.0
+            if name.strip():
+                accepted[name.strip().lower()] = quality
+        wildcard = accepted.get("*")
+        qualities = {
+            encoding: accepted.get(encoding, wildcard or 0.0)
+            for encoding in self.encodings
+        }
+        # Identity left unrated is acceptable, but below any rated coding.
+        qualities["identity"] = accepted.get(
+            "identity", IDENTITY_QUALITY if wildcard is None else wildcard
+        )
+        if not compress and qualities["identity"] > 0:
+            return None
+        preference = (*self.encodings, "identity")
+        best = max(
+            preference,
+            key=lambda encoding: (qualities[encoding], -preference.index(encoding)),
+        )
+        if best == "identity" or qualities[best] <= 0:
+            # Nothing the client accepts; an uncompressed body is the fallback.
+            return None
+        return best
+
+    def encode(
+        self,
+        data: Dict[str, Any],
+        status_code: int = 200,
+        accept_encoding: Optional[str] = None,
+        fields: Optional[Sequence[str]] = None,
+    ) -> Response:
+        """Build a compact success response.
+
+        Args:
+            data (Dict[str, Any]): Data to include in the response.
+            status_code (int): HTTP status code for the response (default: 200).
+            accept_encoding (Optional[str]): Accept-Encoding header of the request.
+            fields (Optional[Sequence[str]]): Result item fields to return;
+                None returns them all.
+
+        Returns:
+            Response: The encoded response.
+        """
+        with track_stage("serialize"):
+            body = orjson.dumps(
+                {"success": True, "data": self._shape(data, fields)},
+                option=orjson.OPT_SERIALIZE_NUMPY,
+            )
+        headers = {"Vary": "Accept-Encoding"}
+        encoding = self.choose_encoding(
+            accept_encoding, compress=len(body) >= self.min_compress_bytes
+        )
+        if encoding is not None:
+            with track_stage("compress"):
+                if encoding == "br":
+                    body = brotli.compress(body, quality=self.brotli_quality)
+                else:
+                    body = gzip.compress(body, compresslevel=self.gzip_level, mtime=0)
+            headers["Content-Encoding"] = encoding
+        RESPONSE_BYTES.inc(len(body), encoding=encoding or "identity")
+        return Response(
+            content=body,
+            status_code=status_code,
+            media_type="application/json",
+            headers=headers,
+        )
+
+    def respond(
+        self, request: Request, data: Dict[str, Any], status_code: int = 200
+    ) -> Response:
+        """Encode ``data`` for a request, honouring Accept-Encoding and ?fields=."""
+        return self.encode(
+            data,
+            status_code,
+            accept_encoding=request.headers.get("accept-encoding"),
+            fields=self.parse_fields(request.query_params.get("fields")),
+        )
+
 
 class APIResponse:
     @staticmethod
-    def success_response(data: Dict[str, Any], status_code: int = 200) -> JSONResponse:
+    def success_response(
+        data: Dict[str, Any],
+        status_code: int = 200,
+        request: Optional[Request] = None,
+        encoder: Optional[ResponseEncoder] = None,
+    ) -> Response:
         """
         Return a standardized success JSON response.
 
         Args:
             data (Dict[str, Any]): Data to include in the response.
             status_code (int): HTTP status code for the response (default: 200).
+            request (Optional[Request]): Request being answered; with ``encoder``
+                its Accept-Encoding and ``fields`` parameter shape the response.
+            encoder (Optional[ResponseEncoder]): Compact encoder to use instead
+                of the plain ``JSONResponse``.
 
         Returns:
-            JSONResponse: The JSON response object.
+            Response: The JSON response object.
         """
         try:
-            logger.info(f"Generating success response with status {status_code}.")
-            return JSONResponse(
-                content={"success": True, "data": data}, status_code=status_code
-            )
+            logger.debug("Generating success response with status %s.", status_code)
+            if encoder is not None and request is not None:
+                return encoder.respond(request, data, status_code)
+            with track_stage("serialize"):
+                return JSONResponse(
+                    content={"success": True, "data": data}, status_code=status_code
+                )
         except Exception as e:
-            logger.error(f"Error generating success response: {e}")
+            logger.error("Error generating success response: %s", e)
             raise RuntimeError(f"Error generating success response: {e}")
 
     @staticmethod
@@ -43,11 +249,11 @@ class APIResponse:
         """
         try:
             logger.info(
-                f"Generating error response with status {status_code}: {message}"
+                "Generating error response with status %s: %s", status_code, message
             )
             return JSONResponse(
                 content={"success": False, "error": message}, status_code=status_code
             )
         except Exception as e:
-            logger.error(f"Error generating error response: {e}")
+            logger.error("Error generating error response: %s", e)
             raise RuntimeError(f"Error generating error response: {e}")
@@ -0,0 +1,318 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Dict, Optional
+
+import aiohttp
+
+from utils.metrics import REGISTRY, record_cache_lookup
+
+logger = logging.getLogger(__name__)
+
+DOWNLOAD_CACHE_BYTES = REGISTRY.gauge(
+    "stylefinder_download_cache_bytes",
+    "Bytes of image content held by the download cache.",
+)
+DOWNLOAD_BYTES = REGISTRY.counter(
+    "stylefinder_download_bytes_total",
+    "Image bytes received from retailers (revalidations and cache hits add none).",
+)
+
+
+@dataclass
+class DownloadEntry:
+    url: str
+    digest: str
+    size: int
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    # Last time the origin confirmed the content, for the freshness window.
+    validated_at: float = 0.0
+
+
+def _write_atomic(path: Path, data: bytes) -> None:
+    temporary = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}")
+    temporary.write_bytes(data)
+    os.replace(temporary, path)
+
+
+class DownloadCache:
+    def __init__(
+        self,
+        cache_dir: Path,
+        max_bytes: int = 512 * 1024 * 1024,
+        fresh_seconds: float = 3600.0,
+    ):
+        """Cache downloaded product images by URL, revalidating with conditional GETs.
+
+        Content is stored once per SHA-256 under ``cache_dir/blobs``, so a
+        product image served under several URLs takes space once; each URL
+        has a small metadata file under ``cache_dir/urls`` with the digest,
+        ETag and Last-Modified. Within ``fresh_seconds`` of the last
+        validation the cached bytes are used without a request; after that
+        the URL is revalidated with ``If-None-Match`` / ``If-Modified-Since``
+        and a 304 costs no body. URLs are evicted least recently used first
+        once the blobs exceed ``max_bytes``.
+
+        Files are placed at the caller's path as hard links to the blob
+        (copies across file systems), so the per-request directories can
+        still be cleaned freely.
+
+        Args:
+            cache_dir (Path): Root of the cache.
+            max_bytes (int): Byte budget of the stored blobs. Defaults to 512 MiB.
+            fresh_seconds (float): Time after a validation during which the
+                origin is not asked again. Defaults to 1 h.
+        """
+        self.root = Path(cache_dir)
+        self.blob_dir = self.root / "blobs"
+        self.url_dir = self.root / "urls"
+        self.blob_dir.mkdir(parents=True, exist_ok=True)
+        self.url_dir.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.fresh_seconds = fresh_seconds
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, DownloadEntry]" = OrderedDict()
+        # Blob digest -> number of URLs referencing it.
+        self._references: Dict[str, int] = {}
+        self._blob_sizes: Dict[str, int] = {}
+        self.total_bytes = 0
+        self._load()
+        DOWNLOAD_CACHE_BYTES.set_function(lambda: self.total_bytes)
+
+    @staticmethod
+    def _url_key(url: str) -> str:
+        return hashlib.sha1(url.encode("utf-8")).hexdigest()
+
+    def _meta_path(self, url: str) -> Path:
+        return self.url_dir / f"{self._url_key(url)}.json"
+
+    def blob_path(self, digest: str) -> Path:
+        return self.blob_dir / digest[:2] / digest
+
+    def _load(self) -> None:
+        """Rebuild the index from disk, least recently used first."""
+        metas = []
+        for path in self.url_dir.glob("*.json"):
+            try:
+                metas.append((path.stat().st_mtime, json.loads(path.read_text())))
+            except Exception as e:
+                logger.warning(
+                    "Ignoring unreadable download cache entry %s: %s", path, e
+                )
+                path.unlink(missing_ok=True)
+        for _, data in sorted(metas, key=lambda meta: meta[0]):
+            entry = DownloadEntry(**data)
+            if self.blob_path(entry.digest).exists():
+                self._add(entry)
+        if self._entries:
+            logger.info(
+                "Download cache holds %s URLs in %.1f MB.",
+                len(self._entries),
+                self.total_bytes / 1e6,
+            )
+
+    def _add(self, entry: DownloadEntry) -> None:
+        previous = self._entries.pop(entry.url, None)
+        if previous is not None:
+            self._release(previous.digest)
+        self._entries[entry.url] = entry
+        if self._references.get(entry.digest, 0) == 0:
+            self._blob_sizes[entry.digest] = entry.size
+            self.total_bytes += entry.size
+        self._references[entry.digest] = self._references.get(entry.digest, 0) + 1
+
+    def _release(self, digest: str) -> Optional[str]:
+        """Drop one reference to a blob; return the digest if it became unused."""
+        self._references[digest] -= 1
+        if self._references[digest] > 0:
+            return None
+        del self._references[digest]
+        self.total_bytes -= self._blob_sizes.pop(digest)
+        return digest
+
+    def _evict(self) -> None:
+        unused = []
+        with self._lock:
+            while self.total_bytes > self.max_bytes and len(self._entries) > 1:
+                url, entry = self._entries.popitem(last=False)
+                self._meta_path(url).unlink(missing_ok=True)
+                digest = self._release(entry.digest)
+                if digest is not None:
+                    unused.append(digest)
+        for digest in unused:
+            self.blob_path(digest).unlink(missing_ok=True)
+
+    def lookup(self, url: str) -> Optional[DownloadEntry]:
+        """Return the entry of a URL whose blob is still on disk, or None."""
+        with self._lock:
+            entry = self._entries.get(url)
+            if entry is not None:
+                self._entries.move_to_end(url)
+        if entry is None or not self.blob_path(entry.digest).exists():
+            return None
+        return entry
+
+    def _save_meta(self, entry: DownloadEntry) -> None:
+        _write_atomic(self._meta_path(entry.url), json.dumps(asdict(entry)).encode())
+
+    def store(
+        self, url: str, data: bytes, etag: Optional[str], last_modified: Optional[str]
+    ) -> DownloadEntry:
+        """Store downloaded content for a URL and evict over the byte budget.
+
+        Args:
+            url (str): URL the content was downloaded from.
+            data (bytes): Response body.
+            etag (Optional[str]): ETag response header.
+            last_modified (Optional[str]): Last-Modified response header.
+
+        Returns:
+            DownloadEntry: Entry of the URL.
+        """
+        digest = hashlib.sha256(data).hexdigest()
+        blob = self.blob_path(digest)
+        if not blob.exists():
+            blob.parent.mkdir(exist_ok=True)
+            _write_atomic(blob, data)
+        entry = DownloadEntry(
+            url=url,
+            digest=digest,
+            size=len(data),
+            etag=etag,
+            last_modified=last_modified,
+            validated_at=time.time(),
+        )
+        self._save_meta(entry)
+        with self._lock:
+            self._add(entry)
+        self._evict()
+        return entry
+
+    def revalidated(
+        self, entry: DownloadEntry, etag: Optional[str], last_modified: Optional[str]
+    ) -> None:
+        """Record that the origin answered 304 for an entry.
+
+        The validation time is kept in memory only; after a restart an entry
+        is simply revalidated once more.
+        """
+        entry.validated_at = time.time()
+        if (etag or entry.etag, last_modified or entry.last_modified) != (
+            entry.etag,
+            entry.last_modified,
+        ):
+            entry.etag = etag or entry.etag
+            entry.last_modified = last_modified or entry.last_modified
+            self._save_meta(entry)
+
+    def place(self, entry: DownloadEntry, save_path: Path) -> None:
+        """Put the content of an entry at ``save_path``.
+
+        Raises:
+            FileNotFoundError: If the blob was evicted in the meantime.
+        """
+        save_path = Path(save_path)
+        save_path.unlink(missing_ok=True)
+        try:
+            os.link(self.blob_path(entry.digest), save_path)
+        except OSError:
+            shutil.copyfile(self.blob_path(entry.digest), save_path)
+
+    def _save(
+        self,
+        url: str,
+        data: bytes,
+        etag: Optional[str],
+        last_modified: Optional[str],
+        save_path: Path,
+        cache: bool,
+    ) -> None:
+        if cache:
+            try:
+                self.place(self.store(url, data, etag, last_modified), save_path)
+                return
+            except FileNotFoundError:
+                # Evicted by a concurrent store before it could be placed.
+                pass
+        with open(save_path, "wb") as file:
+            file.write(data)
+
+    async def _download(
+        self,
+        session: aiohttp.ClientSession,
+        url: str,
+        save_path: Path,
+        entry: Optional[DownloadEntry],
+    ) -> Optional[str]:
+        headers = {}
+        if entry is not None:
+            if entry.etag:
+                headers["If-None-Match"] = entry.etag
+            if entry.last_modified:
+                headers["If-Modified-Since"] = entry.last_modified
+
+        async with session.get(url, headers=headers) as response:
+            etag = response.headers.get("ETag")
+            last_modified = response.headers.get("Last-Modified")
+            if response.status == 304 and entry is not None:
+                try:
+                    await asyncio.to_thread(self.place, entry, save_path)
+                except FileNotFoundError:
+                    # The blob was evicted while revalidating; fetch it again.
+                    return None
+                record_cache_lookup("download", hit=True)
+                self.revalidated(entry, etag, last_modified)
+                return "not_modified"
+            record_cache_lookup("download", hit=False)
+            if response.status != 200:
+                return "http_error"
+            data = await response.read()
+        DOWNLOAD_BYTES.inc(len(data))
+        cache = "no-store" not in response.headers.get("Cache-Control", "")
+        await asyncio.to_thread(
+            self._save, url, data, etag, last_modified, save_path, cache
+        )
+        return "ok"
+
+    async def fetch(
+        self, session: aiohttp.ClientSession, url: str, save_path: Path
+    ) -> str:
+        """Save the image at ``url`` to ``save_path``, from the cache where possible.
+
+        Disk work runs in a worker thread. If a concurrent eviction removes
+        the blob of an entry before it is placed, the image is downloaded
+        again instead.
+
+        Args:
+            session (aiohttp.ClientSession): Session used for requests.
+            url (str): URL of the image.
+            save_path (Path): Destination file.
+
+        Raises:
+            aiohttp.ClientError: If the request fails.
+
+        Returns:
+            str: "cached" (fresh, no request), "not_modified" (revalidated),
+            "ok" (downloaded) or "http_error" (nothing saved).
+        """
+        entry = self.lookup(url)
+        if entry is not None and time.time() - entry.validated_at < self.fresh_seconds:
+            try:
+                await asyncio.to_thread(self.place, entry, save_path)
+                record_cache_lookup("download", hit=True)
+                return "cached"
+            except FileNotFoundError:
+                entry = None
+        status = await self._download(session, url, save_path, entry)
+        if status is None:
+            status = await self._download(session, url, save_path, None)
+        return status
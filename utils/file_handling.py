@@ -1,14 +1,21 @@
 import aiofiles
+import aiohttp
 import requests
 from pathlib import Path
 from fastapi import UploadFile
 import os
+import re
+import shutil
+import time
 import logging
+from uuid import uuid4
+from utils.download_cache import DownloadCache
+from utils.metrics import IMAGE_DOWNLOAD_DURATION, IMAGE_DOWNLOADS, record_stage
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+REQUEST_DIRECTORY_RE = re.compile(r"[0-9a-f]{32}")
+
 
 class FileHandler:
     @staticmethod
@@ -28,15 +35,18 @@ class FileHandler:
             async with aiofiles.open(file_path, "wb") as buffer:
                 content = await file.read()
                 await buffer.write(content)
-            logger.info(f"File saved successfully: {file_path}")
+            logger.info("File saved successfully: %s", file_path)
             return str(file_path)
         except Exception as e:
-            logger.error(f"Error saving file: {e}")
+            logger.error("Error saving file: %s", e)
             raise RuntimeError(f"Error saving file: {e}")
 
     @staticmethod
     async def save_image_from_url(
-        image_url: str, save_path: str, file_name: str = None
+        image_url: str,
+        save_path: str,
+        file_name: str = None,
+        download_cache: DownloadCache = None,
     ) -> str:
         """
         Download and save an image from a URL asynchronously to local storage.
@@ -45,10 +55,14 @@ class FileHandler:
             image_url (str): URL of the image to download.
             save_path (str): Directory path to save the image.
             file_name (str, optional): Name of the saved file (default: derived from the URL).
+            download_cache (DownloadCache, optional): Cache to serve or revalidate the
+                image from instead of downloading it in full.
 
         Returns:
             str: Full path of the saved image.
         """
+        start = time.perf_counter()
+        outcome = "error"
         try:
             # Create the save directory if it doesn't exist
             os.makedirs(save_path, exist_ok=True)
@@ -59,24 +73,42 @@ class FileHandler:
 
             full_save_path = os.path.join(save_path, file_name)
 
+            if download_cache is not None:
+                async with aiohttp.ClientSession() as session:
+                    outcome = await download_cache.fetch(
+                        session, image_url, Path(full_save_path)
+                    )
+                if outcome == "http_error":
+                    raise RuntimeError("Failed to download image.")
+                logger.debug("Image saved: %s (%s)", full_save_path, outcome)
+                return full_save_path
+
             # Download the image synchronously (requests is not async)
             async with aiofiles.open(full_save_path, "wb") as file:
                 response = requests.get(image_url, stream=True)
                 if response.status_code == 200:
                     for chunk in response.iter_content(1024):
                         await file.write(chunk)
-                    logger.info(f"Image saved: {full_save_path}")
+                    outcome = "ok"
+                    logger.debug("Image saved: %s", full_save_path)
                     return full_save_path
                 else:
+                    outcome = "http_error"
                     logger.error(
-                        f"Failed to download image. HTTP status code: {response.status_code}"
+                        "Failed to download image. HTTP status code: %s",
+                        response.status_code,
                     )
                     raise RuntimeError(
                         f"Failed to download image: {response.status_code}"
                     )
         except Exception as e:
-            logger.error(f"An error occurred while downloading the image: {e}")
+            logger.error("An error occurred while downloading the image: %s", e)
             raise RuntimeError(f"Error downloading image: {e}")
+        finally:
+            elapsed = time.perf_counter() - start
+            IMAGE_DOWNLOAD_DURATION.observe(elapsed, source="direct")
+            IMAGE_DOWNLOADS.inc(source="direct", outcome=outcome)
+            record_stage("image_download", elapsed)
 
     @staticmethod
     def clean_directory(directory: Path) -> None:
@@ -91,14 +123,90 @@ class FileHandler:
         """
         try:
             if directory.exists() and directory.is_dir():
+                deleted = 0
                 for file in directory.iterdir():
                     if file.is_file():
                         file.unlink()
-                        logger.info(f"Deleted file: {file}")
+                        deleted += 1
+                logger.debug("Deleted %s files from %s", deleted, directory)
             else:
                 logger.warning(
-                    f"Directory does not exist or is not a directory: {directory}"
+                    "Directory does not exist or is not a directory: %s", directory
                 )
         except Exception as e:
-            logger.error(f"Error cleaning directory {directory}: {e}")
+            logger.error("Error cleaning directory %s: %s", directory, e)
             raise RuntimeError(f"Error cleaning directory: {e}")
+
+    @staticmethod
+    def new_request_directory_name() -> str:
+        """
+        Return a fresh name for a request directory.
+        """
+        return uuid4().hex
+
+    @staticmethod
+    def create_request_directory(root: Path, name: str) -> Path:
+        """
+        Create a subdirectory of ``root`` holding one request's files.
+
+        Concurrent requests each get their own directory, so none of them
+        deletes files another one is still using.
+
+        Args:
+            root (Path): Shared parent directory (e.g. uploads).
+            name (str): Unique name of the request.
+
+        Returns:
+            Path: The new directory.
+        """
+        try:
+            directory = root / name
+            directory.mkdir(parents=True)
+            return directory
+        except Exception as e:
+            logger.error("Error creating directory in %s: %s", root, e)
+            raise RuntimeError(f"Error creating directory: {e}")
+
+    @staticmethod
+    def remove_directory(directory: Path) -> None:
+        """
+        Delete a request directory and everything in it.
+
+        Args:
+            directory (Path): Directory to delete.
+
+        Returns:
+            None
+        """
+        shutil.rmtree(directory, ignore_errors=True)
+        logger.debug("Removed %s", directory)
+
+    @staticmethod
+    def remove_stale_directories(root: Path, max_age_seconds: float) -> int:
+        """
+        Delete request directories left behind by a process that stopped mid-request.
+
+        Only directories named by ``new_request_directory_name`` are touched.
+
+        Args:
+            root (Path): Shared parent directory.
+            max_age_seconds (float): Age after which a directory is stale.
+
+        Returns:
+            int: Number of directories deleted.
+        """
+        removed = 0
+        now = time.time()
+        for directory in root.iterdir():
+            if not REQUEST_DIRECTORY_RE.fullmatch(directory.name):
+                continue
+            try:
+                if (
+                    directory.is_dir()
+                    and now - directory.stat().st_mtime > max_age_seconds
+                ):
+                    shutil.rmtree(directory, ignore_errors=True)
+                    removed += 1
+            except OSError as e:
+                logger.warning("Cannot check request directory %s: %s", directory, e)
+        return removed
@@ -0,0 +1,185 @@
+import asyncio
+import hashlib
+import io
+import logging
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, BinaryIO, Optional, Tuple, Union
+
+import aiofiles
+import numpy as np
+from fastapi import UploadFile
+from PIL import Image, ImageOps
+
+from utils.metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+INGEST_BYTES = REGISTRY.histogram(
+    "stylefinder_ingest_bytes",
+    "Size of uploaded images and of the re-encoded copy sent for description.",
+    labelnames=("kind",),
+    buckets=(
+        32_000,
+        64_000,
+        128_000,
+        256_000,
+        512_000,
+        1_000_000,
+        2_000_000,
+        4_000_000,
+        8_000_000,
+        16_000_000,
+    ),
+)
+
+CHUNK_SIZE = 256 * 1024
+# GPT-4o scales high-detail images to fit 2048x2048 and then to a 768 px short
+# side, so anything larger is only extra payload.
+DESCRIPTION_SHORT_SIDE = 768
+DESCRIPTION_LONG_SIDE = 2048
+DESCRIPTION_JPEG_QUALITY = 85
+
+
+class UploadTooLargeError(ValueError):
+    """Raised when an upload exceeds the configured size limit."""
+
+
+@dataclass
+class IngestedUpload:
+    file_path: str
+    sha256: str
+    size: int
+    width: int
+    height: int
+    description_jpeg: bytes
+    crop: Optional[np.ndarray]
+
+
+def _fit(width: int, height: int, short_side: int, long_side: int) -> float:
+    return min(1.0, long_side / max(width, height), short_side / min(width, height))
+
+
+def normalize_image(
+    data: Union[bytes, BinaryIO],
+    preprocessor: Any = None,
+    short_side: int = DESCRIPTION_SHORT_SIDE,
+    long_side: int = DESCRIPTION_LONG_SIDE,
+    quality: int = DESCRIPTION_JPEG_QUALITY,
+) -> Tuple[Image.Image, bytes, Optional[np.ndarray]]:
+    """Decode an upload once and derive everything the pipeline needs from it.
+
+    Args:
+        data (Union[bytes, BinaryIO]): Raw uploaded bytes, or a file object
+            holding them, in any format PIL can read.
+        preprocessor (Any): FastImagePreprocessor producing the embedding
+            crop; skipped when None.
+        short_side (int): Short side limit of the description copy.
+        long_side (int): Long side limit of the description copy.
+        quality (int): JPEG quality of the description copy.
+
+    Raises:
+        ValueError: If the data is not a readable image.
+
+    Returns:
+        Tuple[Image.Image, bytes, Optional[np.ndarray]]: Upright RGB image,
+        JPEG bytes for the description model and the embedding crop.
+    """
+    try:
+        image = Image.open(io.BytesIO(data) if isinstance(data, bytes) else data)
+        image.load()
+    except Exception as e:
+        raise ValueError(f"Unreadable image: {e}")
+    # Phone photos are often stored sideways with an EXIF rotation flag.
+    image = ImageOps.exif_transpose(image).convert("RGB")
+
+    scale = _fit(image.width, image.height, short_side, long_side)
+    resized = image
+    if scale < 1.0:
+        resized = image.resize(
+            (round(image.width * scale), round(image.height * scale)),
+            Image.Resampling.LANCZOS,
+            reducing_gap=3.0,
+        )
+    buffer = io.BytesIO()
+    resized.save(buffer, format="JPEG", quality=quality, optimize=True)
+
+    crop = preprocessor.load(image) if preprocessor is not None else None
+    return image, buffer.getvalue(), crop
+
+
+async def ingest_upload(
+    file: UploadFile,
+    upload_dir: Path,
+    max_bytes: int,
+    preprocessor: Any = None,
+    chunk_size: int = CHUNK_SIZE,
+) -> IngestedUpload:
+    """Read an upload into memory and normalize it for both model paths.
+
+    By the time the route runs, Starlette has already spooled the body, so
+    oversized requests are meant to be refused from their Content-Length
+    beforehand; here the file is read in chunks, hashed and rejected once it
+    exceeds ``max_bytes``, which also covers bodies sent without a length.
+    It is then decoded once, turned upright using its EXIF orientation, and
+    saved as the downscaled JPEG sent for description, which also serves as
+    the query image for the prefilter.
+
+    Args:
+        file (UploadFile): The uploaded file.
+        upload_dir (Path): Directory to save the normalized image.
+        max_bytes (int): Largest accepted upload.
+        preprocessor (Any): FastImagePreprocessor producing the embedding
+            crop; skipped when None.
+        chunk_size (int): Bytes read per chunk.
+
+    Raises:
+        UploadTooLargeError: If the upload exceeds ``max_bytes``.
+        ValueError: If the upload is empty or not a readable image.
+
+    Returns:
+        IngestedUpload: Saved path, hash, original size and model inputs.
+    """
+    digest = hashlib.sha256()
+    buffer = io.BytesIO()
+    size = 0
+    while chunk := await file.read(chunk_size):
+        size += len(chunk)
+        if size > max_bytes:
+            raise UploadTooLargeError(
+                f"Upload exceeds the {max_bytes / (1024 * 1024):g} MB limit."
+            )
+        digest.update(chunk)
+        buffer.write(chunk)
+    if not size:
+        raise ValueError("Upload is empty.")
+
+    buffer.seek(0)
+    image, description_jpeg, crop = await asyncio.to_thread(
+        normalize_image, buffer, preprocessor
+    )
+    sha256 = digest.hexdigest()
+    file_path = upload_dir / f"{sha256[:16]}.jpg"
+    async with aiofiles.open(file_path, "wb") as output:
+        await output.write(description_jpeg)
+
+    INGEST_BYTES.observe(size, kind="upload")
+    INGEST_BYTES.observe(len(description_jpeg), kind="description")
+    logger.info(
+        "Upload ingested: %s (%s bytes, %sx%s) -> %s (%s bytes)",
+        file.filename,
+        size,
+        image.width,
+        image.height,
+        file_path,
+        len(description_jpeg),
+    )
+    return IngestedUpload(
+        file_path=str(file_path),
+        sha256=sha256,
+        size=size,
+        width=image.width,
+        height=image.height,
+        description_jpeg=description_jpeg,
+        crop=crop,
+    )
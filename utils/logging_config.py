@@ -0,0 +1,172 @@
+import atexit
+import json
+import logging
+import logging.handlers
+import queue
+import sys
+import threading
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional, Tuple
+from uuid import uuid4
+
+# Id of the request being handled, attached to every record logged for it.
+_request_id: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+
+# Attributes every LogRecord has; anything else was passed through ``extra``.
+_RECORD_ATTRIBUTES = frozenset(
+    logging.LogRecord("", 0, "", 0, "", (), None).__dict__
+) | {"message", "asctime", "request_id", "sampled_every"}
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+def new_request_id(request_id: Optional[str] = None) -> str:
+    """Set the id of the current request, generating one if none is given.
+
+    Args:
+        request_id (Optional[str]): Id received from the client, if any.
+
+    Returns:
+        str: Id now attached to records logged in this context.
+    """
+    request_id = (request_id or "")[:64] or uuid4().hex
+    _request_id.set(request_id)
+    return request_id
+
+
+def current_request_id() -> Optional[str]:
+    return _request_id.get()
+
+
+class JSONFormatter(logging.Formatter):
+    """Format records as one JSON object per line.
+
+    Fields passed through ``extra`` are included as top-level keys.
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        payload: Dict[str, Any] = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(
+                timespec="milliseconds"
+            ),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        if getattr(record, "request_id", None):
+            payload["request_id"] = record.request_id
+        if getattr(record, "sampled_every", None):
+            payload["sampled_every"] = record.sampled_every
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRIBUTES and not key.startswith("_"):
+                payload[key] = value
+        if record.exc_info:
+            payload["exception"] = self.formatException(record.exc_info)
+        return json.dumps(payload, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    """Human-readable format with the request id, for local runs."""
+
+    def __init__(self):
+        super().__init__(
+            "%(asctime)s %(levelname)s %(name)s [%(request_id)s] %(message)s"
+        )
+
+    def format(self, record: logging.LogRecord) -> str:
+        if not getattr(record, "request_id", None):
+            record.request_id = "-"
+        return super().format(record)
+
+
+class ContextFilter(logging.Filter):
+    """Attach the request id and keep only a sample of DEBUG records.
+
+    Runs in the calling thread, before the record is queued, so the request
+    id is read from the right context. Per-item DEBUG events (one per image
+    or candidate) pass once every ``debug_sample_every`` records per call
+    site; the kept record carries ``sampled_every``.
+
+    Args:
+        debug_sample_every (int): Keep one in this many DEBUG records of each
+            message. 1 keeps them all.
+    """
+
+    def __init__(self, debug_sample_every: int = 1):
+        super().__init__()
+        self.debug_sample_every = max(1, debug_sample_every)
+        self._counts: Dict[Tuple[str, int], int] = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = _request_id.get()
+        if record.levelno > logging.DEBUG or self.debug_sample_every == 1:
+            return True
+        key = (record.pathname, record.lineno)
+        with self._lock:
+            count = self._counts.get(key, 0)
+            self._counts[key] = count + 1
+        if count % self.debug_sample_every:
+            return False
+        record.sampled_every = self.debug_sample_every
+        return True
+
+
+class _LocalQueueHandler(logging.handlers.QueueHandler):
+    """Enqueue records as they are; the queue never leaves the process, so
+    there is no need to format them up front for pickling."""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+def _stop_listener() -> None:
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def configure_logging(
+    level: str = "INFO", json_format: bool = True, debug_sample_every: int = 1
+) -> logging.handlers.QueueListener:
+    """Route all logging through a queue drained by a background thread.
+
+    Callers, including the event loop and inference threads, only enqueue
+    the record; a ``QueueListener`` thread formats it (so %-style arguments
+    are merged there) and writes it to stderr. Calling this again replaces
+    the previous setup.
+
+    Args:
+        level (str): Root log level. Defaults to "INFO".
+        json_format (bool): Write JSON lines rather than text. Defaults to True.
+        debug_sample_every (int): Keep one in this many DEBUG records of each
+            message. Defaults to 1.
+
+    Returns:
+        logging.handlers.QueueListener: The started listener.
+    """
+    global _listener
+    if _listener is None:
+        atexit.register(_stop_listener)
+    else:
+        _listener.stop()
+
+    stream = logging.StreamHandler(sys.stderr)
+    stream.setFormatter(JSONFormatter() if json_format else TextFormatter())
+    records: queue.SimpleQueue = queue.SimpleQueue()
+    handler = _LocalQueueHandler(records)
+    handler.addFilter(ContextFilter(debug_sample_every))
+
+    root = logging.getLogger()
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+    root.addHandler(handler)
+    root.setLevel(level.upper())
+
+    _listener = logging.handlers.QueueListener(
+        records, stream, respect_handler_level=True
+    )
+    _listener.start()
+    return _listener
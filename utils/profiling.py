@@ -0,0 +1,188 @@
+import cProfile
+import json
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from pathlib import Path
+from typing import Dict, List, Optional
+from uuid import uuid4
+import logging
+
+logger = logging.getLogger(__name__)
+
+PROFILE_SUFFIXES = (".prof", ".collapsed", ".json")
+
+# tracemalloc and the sampler are process-wide, so only one request is
+# profiled at a time.
+_profiling_lock = threading.Lock()
+
+
+class _StackSampler(threading.Thread):
+    def __init__(self, interval: float):
+        """Sample the Python stacks of every thread at a fixed interval.
+
+        Args:
+            interval (float): Seconds between samples.
+        """
+        super().__init__(name="profile-sampler", daemon=True)
+        self.interval = interval
+        self.samples: Counter = Counter()
+        self._stop_event = threading.Event()
+
+    def run(self) -> None:
+        own_id = threading.get_ident()
+        while not self._stop_event.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(
+                        f"{code.co_name} ({Path(code.co_filename).name}:{code.co_firstlineno})"
+                    )
+                    frame = frame.f_back
+                stack.append(names.get(thread_id, str(thread_id)))
+                self.samples[";".join(reversed(stack))] += 1
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        self.join()
+
+
+class RequestProfiler:
+    def __init__(self, output_dir: Path, sample_interval: float = 0.005):
+        """Profile a single request.
+
+        The event loop thread is traced with cProfile, while a sampling thread
+        records the stacks of all threads (including the inference executor)
+        in the collapsed format understood by flamegraph tools. Peak memory is
+        tracked with tracemalloc.
+
+        Args:
+            output_dir (Path): Directory the profile files are written to.
+            sample_interval (float): Seconds between stack samples. Defaults to 5 ms.
+        """
+        self.output_dir = output_dir
+        self.sample_interval = sample_interval
+        self.profile_id = f"{time.strftime('%Y%m%dT%H%M%S')}-{uuid4().hex[:8]}"
+        self._profile = cProfile.Profile()
+        self._sampler: Optional[_StackSampler] = None
+        self._started_tracemalloc = False
+        self._start_time = 0.0
+
+    @staticmethod
+    def try_acquire() -> bool:
+        """Reserve the process-wide profiling slot without blocking."""
+        return _profiling_lock.acquire(blocking=False)
+
+    def start(self) -> None:
+        """Start tracing. Must be called from the event loop thread."""
+        try:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                self._started_tracemalloc = True
+            tracemalloc.reset_peak()
+            self._sampler = _StackSampler(self.sample_interval)
+            self._sampler.start()
+        except Exception:
+            if self._started_tracemalloc:
+                tracemalloc.stop()
+            _profiling_lock.release()
+            raise
+        self._start_time = time.perf_counter()
+        self._profile.enable()
+
+    def stop(self, path: str) -> Dict[str, object]:
+        """Stop tracing, write the profile files and release the profiling slot.
+
+        Args:
+            path (str): Request path, stored in the summary.
+
+        Returns:
+            Dict[str, object]: Summary of the profile, also written as JSON.
+        """
+        try:
+            self._profile.disable()
+            duration = time.perf_counter() - self._start_time
+            self._sampler.stop()
+            _, peak = tracemalloc.get_traced_memory()
+            if self._started_tracemalloc:
+                tracemalloc.stop()
+
+            self.output_dir.mkdir(parents=True, exist_ok=True)
+            base = self.output_dir / self.profile_id
+            self._profile.dump_stats(str(base) + ".prof")
+            with open(str(base) + ".collapsed", "w", encoding="utf-8") as file:
+                for stack, count in self._sampler.samples.most_common():
+                    file.write(f"{stack} {count}\n")
+
+            summary = {
+                "profile_id": self.profile_id,
+                "path": path,
+                "duration_seconds": round(duration, 4),
+                "peak_memory_bytes": peak,
+                "samples": sum(self._sampler.samples.values()),
+                "files": [self.profile_id + suffix for suffix in PROFILE_SUFFIXES],
+            }
+            with open(str(base) + ".json", "w", encoding="utf-8") as file:
+                json.dump(summary, file)
+            logger.info("Request profile saved: %s", base)
+            return summary
+        finally:
+            _profiling_lock.release()
+
+
+def list_profiles(output_dir: Path) -> List[Dict[str, object]]:
+    """List saved profile summaries, newest first.
+
+    Args:
+        output_dir (Path): Directory holding the profile files.
+
+    Returns:
+        List[Dict[str, object]]: Profile summaries.
+    """
+    if not output_dir.is_dir():
+        return []
+    summaries = []
+    for summary_file in sorted(output_dir.glob("*.json"), reverse=True):
+        try:
+            with open(summary_file, encoding="utf-8") as file:
+                summaries.append(json.load(file))
+        except Exception as e:
+            logger.warning(
+                "Skipping unreadable profile summary %s: %s", summary_file, e
+            )
+    return summaries
+
+
+def resolve_profile_file(output_dir: Path, file_name: str) -> Optional[Path]:
+    """Resolve a downloadable profile file, rejecting anything outside output_dir.
+
+    Args:
+        output_dir (Path): Directory holding the profile files.
+        file_name (str): Requested file name.
+
+    Returns:
+        Optional[Path]: The file path, or None if it is not a known profile file.
+    """
+    if Path(file_name).name != file_name or not file_name.endswith(PROFILE_SUFFIXES):
+        return None
+    file_path = output_dir / file_name
+    return file_path if file_path.is_file() else None
+
+
+def prune_profiles(output_dir: Path, keep: int) -> None:
+    """Delete all but the newest ``keep`` profiles.
+
+    Args:
+        output_dir (Path): Directory holding the profile files.
+        keep (int): Number of profiles to retain.
+    """
+    summaries = sorted(output_dir.glob("*.json"), reverse=True)
+    for summary_file in summaries[keep:]:
+        for suffix in PROFILE_SUFFIXES:
+            summary_file.with_suffix(suffix).unlink(missing_ok=True)
@@ -0,0 +1,282 @@
+import gzip
+import json
+import logging
+import os
+import queue
+import shutil
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+from utils.logging_config import current_request_id
+from utils.metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+RESULT_LOG_RECORDS = REGISTRY.counter(
+    "stylefinder_result_log_records_total",
+    "Scrape result records handed to the result log, by outcome (written, dropped).",
+    labelnames=("outcome",),
+)
+RESULT_LOG_QUEUE = REGISTRY.gauge(
+    "stylefinder_result_log_queue_depth",
+    "Scrape result records waiting to be written.",
+)
+RESULT_LOG_FSYNC_SECONDS = REGISTRY.histogram(
+    "stylefinder_result_log_fsync_seconds",
+    "Time to flush and fsync one batch of result records.",
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5),
+)
+
+_STOP = object()
+# Fields that only make sense within the request that produced them.
+_EPHEMERAL_FIELDS = ("local_image_path",)
+
+
+def _segment_pid(path: Path) -> Optional[int]:
+    try:
+        return int(path.name.split(".")[0].rsplit("-", 1)[1])
+    except (IndexError, ValueError):
+        return None
+
+
+def _process_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class ResultLog:
+    def __init__(
+        self,
+        log_dir: Path,
+        max_queue: int = 1024,
+        segment_bytes: int = 16 * 1024 * 1024,
+        max_segments: int = 64,
+        fsync_interval: float = 1.0,
+        fsync_records: int = 256,
+    ):
+        """Append scrape results to rotated, compressed JSONL segments.
+
+        ``append`` only snapshots the products and puts one record on a
+        bounded queue; a writer thread batches records into the active
+        segment and fsyncs once per ``fsync_records`` records or
+        ``fsync_interval`` seconds. Segments are gzip-compressed when they
+        reach ``segment_bytes`` and only the newest ``max_segments`` are
+        kept. When the queue is full, records are dropped and counted
+        rather than slowing the request down.
+
+        Args:
+            log_dir (Path): Directory of the segments.
+            max_queue (int): Records buffered before new ones are dropped.
+                Defaults to 1024.
+            segment_bytes (int): Size at which a segment is rotated.
+                Defaults to 16 MiB.
+            max_segments (int): Compressed segments kept. Defaults to 64.
+            fsync_interval (float): Longest time written records stay
+                unsynced, in seconds. Defaults to 1.
+            fsync_records (int): Records written between fsyncs. Defaults to 256.
+        """
+        self.log_dir = Path(log_dir)
+        self.log_dir.mkdir(parents=True, exist_ok=True)
+        self.segment_bytes = segment_bytes
+        self.max_segments = max_segments
+        self.fsync_interval = fsync_interval
+        self.fsync_records = fsync_records
+        self._queue: queue.Queue = queue.Queue(maxsize=max_queue)
+        self._thread: Optional[threading.Thread] = None
+        self._file = None
+        self._segment: Optional[Path] = None
+        RESULT_LOG_QUEUE.set_function(self._queue.qsize)
+
+    def append(
+        self, source: str, search_term: str, products: List[Dict[str, Any]]
+    ) -> bool:
+        """Queue the products of one search for writing.
+
+        Args:
+            source (str): Retailer the products come from.
+            search_term (str): Query that found them.
+            products (List[Dict[str, Any]]): Scraped products.
+
+        Returns:
+            bool: False if the record was dropped because the queue is full.
+        """
+        record = {
+            "time": time.time(),
+            "source": source,
+            "query": search_term,
+            "request_id": current_request_id(),
+            # Callers keep annotating the products, so store copies.
+            "products": [
+                {
+                    key: value
+                    for key, value in product.items()
+                    if key not in _EPHEMERAL_FIELDS
+                }
+                for product in products
+            ],
+        }
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            RESULT_LOG_RECORDS.inc(outcome="dropped")
+            return False
+        return True
+
+    def start(self) -> None:
+        """Start the writer thread; segments left by stopped processes are compressed."""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        for path in sorted(self.log_dir.glob("results-*.jsonl")):
+            pid = _segment_pid(path)
+            if pid is None or pid == os.getpid() or not _process_alive(pid):
+                self._compress(path)
+        self._thread = threading.Thread(
+            target=self._run, name="result-log", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """Write what is queued, fsync and stop the writer thread."""
+        if self._thread is None:
+            return
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+        self._thread = None
+
+    def _open_segment(self) -> None:
+        self._segment = self.log_dir / f"results-{time.time_ns()}-{os.getpid()}.jsonl"
+        self._file = open(self._segment, "ab")
+
+    def _sync(self) -> None:
+        start = time.perf_counter()
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        RESULT_LOG_FSYNC_SECONDS.observe(time.perf_counter() - start)
+
+    def _rotate(self) -> None:
+        self._sync()
+        self._file.close()
+        self._file = None
+        self._compress(self._segment)
+        self._prune()
+
+    def _compress(self, path: Path) -> None:
+        target = path.with_name(path.name + ".gz")
+        try:
+            with open(path, "rb") as source, gzip.open(target, "wb") as compressed:
+                shutil.copyfileobj(source, compressed)
+            path.unlink()
+        except OSError as e:
+            logger.warning("Could not compress result segment %s: %s", path, e)
+
+    def _prune(self) -> None:
+        segments = sorted(self.log_dir.glob("results-*.jsonl.gz"))
+        for path in segments[: max(0, len(segments) - self.max_segments)]:
+            path.unlink(missing_ok=True)
+
+    def _run(self) -> None:
+        unsynced = 0
+        last_sync = time.monotonic()
+        stopping = False
+        while not stopping:
+            try:
+                batch = [self._queue.get(timeout=self.fsync_interval)]
+            except queue.Empty:
+                batch = []
+            while batch and len(batch) < self.fsync_records:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            if _STOP in batch:
+                stopping = True
+                batch = [record for record in batch if record is not _STOP]
+
+            try:
+                if batch:
+                    if self._file is None:
+                        self._open_segment()
+                    self._file.write(
+                        b"".join(
+                            json.dumps(record, separators=(",", ":")).encode() + b"\n"
+                            for record in batch
+                        )
+                    )
+                    unsynced += len(batch)
+                    RESULT_LOG_RECORDS.inc(len(batch), outcome="written")
+                due = time.monotonic() - last_sync >= self.fsync_interval
+                if unsynced and (unsynced >= self.fsync_records or due or stopping):
+                    self._sync()
+                    unsynced = 0
+                    last_sync = time.monotonic()
+                if self._file is not None and self._file.tell() >= self.segment_bytes:
+                    self._rotate()
+            except Exception as e:
+                logger.error("Writing scrape results failed: %s", e)
+
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+def read_results(
+    log_dir: Path, since: Optional[float] = None, source: Optional[str] = None
+) -> Iterator[Dict[str, Any]]:
+    """Yield logged scrape results, oldest first.
+
+    Reads compressed and active segments alike; a line cut short by a crash
+    is skipped.
+
+    Args:
+        log_dir (Path): Directory of the segments.
+        since (Optional[float]): Only records from this Unix time on.
+        source (Optional[str]): Only records from this retailer.
+
+    Yields:
+        Dict[str, Any]: Records with time, source, query, request_id and products.
+    """
+    segments = sorted(
+        Path(log_dir).glob("results-*.jsonl*"),
+        key=lambda path: int(path.name.split("-")[1]),
+    )
+    for path in segments:
+        opener = gzip.open if path.suffix == ".gz" else open
+        try:
+            with opener(path, "rt", encoding="utf-8") as lines:
+                for line in lines:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue
+                    if since is not None and record["time"] < since:
+                        continue
+                    if source is not None and record["source"] != source:
+                        continue
+                    yield record
+        except (OSError, EOFError) as e:
+            logger.warning("Skipping unreadable result segment %s: %s", path, e)
+
+
+def popular_queries(
+    log_dir: Path, limit: int = 20, since: Optional[float] = None
+) -> List[str]:
+    """Return the most frequently scraped queries, e.g. to warm the caches.
+
+    Args:
+        log_dir (Path): Directory of the segments.
+        limit (int): Number of queries. Defaults to 20.
+        since (Optional[float]): Only count records from this Unix time on.
+
+    Returns:
+        List[str]: Queries, most frequent first.
+    """
+    counts = Counter(record["query"] for record in read_results(log_dir, since))
+    return [query for query, _ in counts.most_common(limit)]